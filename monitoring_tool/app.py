@@ -1,21 +1,89 @@
 from __future__ import annotations
 
-from flask import Flask, redirect, render_template, request, flash, url_for, jsonify
-
-from monitoring_tool import config, db
-from monitoring_tool.services import email_service, monitoring_service, process_service, report_service
+import time
+from datetime import datetime
+
+from flask import Flask, Response, g, redirect, render_template, request, flash, url_for, jsonify, make_response, session
+
+from monitoring_tool import config, cron, db, metrics
+from monitoring_tool.services import (
+    alert_service,
+    coordinator_service,
+    email_service,
+    export_service,
+    monitoring_service,
+    process_service,
+    query_service,
+    report_service,
+    retention_service,
+    stream_service,
+    watcher_service,
+    worker_service,
+)
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
     app.secret_key = config.FLASK_SECRET
     db.ensure_schema()
-    monitoring_service.start_scheduler()
+    if config.EMBEDDED_WORKER:
+        # The watcher follows the scheduler's leases so coordinated web
+        # processes do not all check the same folder.
+        coordinator = coordinator_service.Coordinator() if config.SCHEDULER_COORDINATION else None
+        monitoring_service.start_scheduler(coordinator=coordinator)
+        retention_service.start_retention_job()
+        watcher_service.start_watcher(coordinator=coordinator)
+        email_service.start_email_worker()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop("request_started", None)
+        if started is not None and request.endpoint:
+            metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint)
+        return response
 
     @app.route("/")
     def index():
         return redirect(url_for("reports"))
 
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        # Gauges that describe current state are refreshed on each scrape.
+        metrics.PROCESS_STATUS.replace(
+            {(status,): total for status, total in report_service.status_counts().items()}
+        )
+        metrics.QUEUE_DEPTH.set(email_service.queue_depth(), queue="email")
+        metrics.QUEUE_DEPTH.set(alert_service.pending_count(), queue="alerts")
+        pool = db.pool_stats()
+        metrics.DB_POOL.set(pool["in_use"], state="in_use")
+        metrics.DB_POOL.set(pool["idle"], state="idle")
+        # Schedulers in the worker service publish their timings through
+        # heartbeats, since only the web app serves /metrics.
+        workers = worker_service.list_workers()
+        metrics.WORKER_UP.replace(
+            {(worker["worker_id"], worker["role"]): int(worker["healthy"]) for worker in workers}
+        )
+        metrics.WORKER_LAST_CYCLE_SECONDS.replace(
+            {
+                (worker["worker_id"], worker["role"]): worker["last_cycle_seconds"]
+                for worker in workers
+                if worker["last_cycle_seconds"] is not None
+            }
+        )
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+    @app.route("/workers", methods=["GET"])
+    def workers():
+        return render_template(
+            "workers.html",
+            workers=worker_service.list_workers(),
+            heartbeat_seconds=config.WORKER_HEARTBEAT_SECONDS,
+        )
+
     @app.route("/recipients", methods=["GET", "POST"])
     def recipients():
         if request.method == "POST":
@@ -61,6 +129,12 @@ def create_app() -> Flask:
             check_uc4_file = request.form.get("check_uc4_file") == "on"
             scheduled_time = request.form.get("scheduled_time", "").strip()
             check_query = request.form.get("check_query", "").strip()
+            check_assertion = request.form.get("check_assertion", "").strip()
+            marker_max_age_hours = request.form.get("marker_max_age_hours", "").strip()
+            marker_fresh_since_schedule = request.form.get("marker_fresh_since_schedule") == "on"
+            parse_marker_content = request.form.get("parse_marker_content") == "on"
+            check_interval_seconds = request.form.get("check_interval_seconds", "").strip()
+            cron_schedule = request.form.get("cron_schedule", "").strip()
             existing_tags = set(process_service.list_tags())
 
             if not tag_name or not folder_path:
@@ -71,12 +145,44 @@ def create_app() -> Flask:
                 flash(f"Unknown tag {tag_name}. Add it on the Configure page first.", "error")
                 return redirect(url_for("folders"))
 
+            try:
+                max_age_hours = float(marker_max_age_hours) if marker_max_age_hours else None
+            except ValueError:
+                flash("Marker max age must be a number of hours.", "error")
+                return redirect(url_for("folders"))
+
+            try:
+                interval_seconds = int(check_interval_seconds) if check_interval_seconds else None
+            except ValueError:
+                flash("Check interval must be a whole number of seconds.", "error")
+                return redirect(url_for("folders"))
+
+            if cron_schedule:
+                try:
+                    cron.parse(cron_schedule)
+                except ValueError as exc:
+                    flash(str(exc), "error")
+                    return redirect(url_for("folders"))
+
+            if check_assertion:
+                try:
+                    query_service.parse_assertion(check_assertion)
+                except ValueError as exc:
+                    flash(str(exc), "error")
+                    return redirect(url_for("folders"))
+
             process_service.set_folder(
                 tag_name=tag_name,
                 folder_path=folder_path,
                 check_uc4_file=check_uc4_file,
                 scheduled_time=scheduled_time or None,
                 check_query=check_query or None,
+                marker_max_age_hours=max_age_hours,
+                marker_fresh_since_schedule=marker_fresh_since_schedule,
+                parse_marker_content=parse_marker_content,
+                check_interval_seconds=interval_seconds,
+                cron_schedule=cron_schedule or None,
+                check_assertion=check_assertion or None,
             )
             flash(f"Saved folder for {tag_name}.", "success")
             return redirect(url_for("folders"))
@@ -104,9 +210,36 @@ def create_app() -> Flask:
 
     @app.route("/reports", methods=["GET"])
     def reports():
-        processes = process_service.list_processes()
-        report_rows = report_service.list_process_reports(processes)
-        return render_template("reports.html", report_rows=report_rows)
+        generation, report_rows = report_service.list_cached_process_reports()
+        etag = f"reports-{generation}"
+        # Pending flash messages are rendered into the page, so never answer
+        # with a cached copy while one is waiting.
+        has_flashes = bool(session.get("_flashes"))
+        if not has_flashes and request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            # The page's stream starts after the newest run it shows.
+            stream_after = max((row["run_id"] or 0 for row in report_rows), default=0)
+            response = make_response(
+                render_template("reports.html", report_rows=report_rows, stream_after=stream_after)
+            )
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    @app.route("/reports/stream", methods=["GET"])
+    def reports_stream():
+        after_run_id = request.headers.get("Last-Event-ID", type=int)
+        if after_run_id is None:
+            after_run_id = request.args.get("after", type=int)
+        if after_run_id is None:
+            after_run_id = report_service.latest_run_id()
+
+        response = Response(stream_service.report_events(after_run_id), content_type="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the stream.
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
 
     @app.route("/reports/run-checks", methods=["POST"])
     def run_all_checks():
@@ -139,8 +272,7 @@ def create_app() -> Flask:
 
     @app.route("/reports/notify", methods=["GET", "POST"])
     def notify_report():
-        processes = process_service.list_processes()
-        report_rows = report_service.list_process_reports(processes)
+        _, report_rows = report_service.list_cached_process_reports()
         failed = [row for row in report_rows if row["status"] == "Failed"]
         recipients_list = process_service.list_recipients()
         selected_recipients = recipients_list
@@ -173,25 +305,17 @@ def create_app() -> Flask:
                     message=message,
                 )
             
-            smtp_host = config.SMTP_HOST
-            smtp_port = config.SMTP_PORT
-            sender = config.SMTP_SENDER
             subject = "MonitoringTool Failure Report"
             body = f"{message}\n\n{_format_failure_email(failed)}"
 
+            # Delivery happens on the background email worker so a slow
+            # relay never holds up the request.
             try:
-                email_service.send_failure_email(
-                    smtp_host=smtp_host,
-                    smtp_port=smtp_port,
-                    sender=sender,
-                    recipients=selected_recipients,
-                    subject=subject,
-                    body=body,
-                )
-                flash("Notification email sent.", "success")
+                email_service.queue_email(selected_recipients, subject, body)
+                flash("Notification email queued for delivery.", "success")
                 return redirect(url_for("reports"))
             except Exception as exc:  # noqa: BLE001
-                flash(f"Failed to send email: {exc}", "error")
+                flash(f"Failed to queue email: {exc}", "error")
 
 
         return render_template(
@@ -199,11 +323,179 @@ def create_app() -> Flask:
             recipients=recipients_list,
             selected_recipients=selected_recipients,
             message=message,
+            deliveries=email_service.list_deliveries(),
+        )
+
+    @app.route("/api/reports", methods=["GET"])
+    def api_reports():
+        try:
+            limit = _parse_limit(request.args.get("limit"))
+            fields = _parse_fields(request.args.get("fields"), REPORT_FIELDS)
+            since = _parse_time(request.args.get("since"))
+            until = _parse_time(request.args.get("until"))
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        status = request.args.get("status", "").strip()
+        tag_prefix = request.args.get("tag_prefix", "").strip()
+        cursor = request.args.get("cursor", "").strip()
+        _, report_rows = report_service.list_cached_process_reports()
+
+        items = []
+        next_cursor = None
+        for row in report_rows:
+            if cursor and row["tag_name"] <= cursor:
+                continue
+            if status and row["status"] != status:
+                continue
+            if tag_prefix and not row["tag_name"].startswith(tag_prefix):
+                continue
+            # Processes whose checks keep repeating the latest run still
+            # count as checked in the window.
+            if since and (row["last_verified_time"] or "") < since:
+                continue
+            if until and (row["last_verified_time"] or "") >= until:
+                continue
+            if len(items) == limit:
+                next_cursor = items[-1]["tag_name"]
+                break
+            items.append(row)
+
+        return jsonify({"items": [_select_fields(row, fields) for row in items], "next_cursor": next_cursor})
+
+    @app.route("/api/runs", methods=["GET"])
+    def api_runs():
+        try:
+            limit = _parse_limit(request.args.get("limit"))
+            fields = _parse_fields(request.args.get("fields"), RUN_FIELDS)
+            before_id = _parse_cursor(request.args.get("cursor"))
+            runs = report_service.list_runs(
+                tag_prefix=request.args.get("tag_prefix", "").strip() or None,
+                status=request.args.get("status", "").strip() or None,
+                since=_parse_time(request.args.get("since")),
+                until=_parse_time(request.args.get("until")),
+                before_id=before_id,
+                limit=limit + 1,
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        return jsonify(_page(runs, limit, fields))
+
+    @app.route("/api/fatal-events", methods=["GET"])
+    def api_fatal_events():
+        try:
+            limit = _parse_limit(request.args.get("limit"))
+            fields = _parse_fields(request.args.get("fields"), FATAL_EVENT_FIELDS)
+            before_id = _parse_cursor(request.args.get("cursor"))
+            events = report_service.list_fatal_event_page(
+                tag_prefix=request.args.get("tag_prefix", "").strip() or None,
+                since=_parse_time(request.args.get("since")),
+                until=_parse_time(request.args.get("until")),
+                before_id=before_id,
+                limit=limit + 1,
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        return jsonify(_page(events, limit, fields))
+
+    @app.route("/export/<table>", methods=["GET"])
+    def export_history(table: str):
+        exporters = {"runs": export_service.export_runs, "fatal-events": export_service.export_fatal_events}
+        export_format = request.args.get("format", "csv").strip().lower()
+        if table not in exporters:
+            return jsonify({"error": f"Unknown export {table}"}), 404
+        if export_format not in export_service.EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(export_service.EXPORT_FORMATS)}"}), 400
+
+        try:
+            chunks = exporters[table](
+                export_format,
+                tag_prefix=request.args.get("tag_prefix", "").strip() or None,
+                since=_parse_time(request.args.get("since")),
+                until=_parse_time(request.args.get("until")),
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        filename = f"{table.replace('-', '_')}.{export_format}"
+        return Response(
+            chunks,
+            mimetype=export_service.MIMETYPES[export_format],
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
     return app
 
 
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+REPORT_FIELDS = (
+    "tag_name",
+    "folder_path",
+    "status",
+    "reasons",
+    "uc4_status",
+    "last_run_time",
+    "last_verified_time",
+    "fatal_events",
+    "fatal_event_count",
+)
+RUN_FIELDS = ("id", "tag_name", "run_time", "status", "reasons", "uc4_status", "check_type")
+FATAL_EVENT_FIELDS = ("id", "tag_name", "event_time", "description")
+
+
+def _parse_limit(value: str | None) -> int:
+    if not value:
+        return API_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    if not 1 <= limit <= API_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {API_MAX_LIMIT}")
+    return limit
+
+
+def _parse_fields(value: str | None, allowed: tuple[str, ...]) -> tuple[str, ...]:
+    if not value:
+        return allowed
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def _parse_time(value: str | None) -> str | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}") from None
+    return parsed.replace(tzinfo=None, microsecond=0).isoformat(sep=" ")
+
+
+def _parse_cursor(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("cursor must be an integer") from None
+
+
+def _select_fields(item: dict, fields: tuple[str, ...]) -> dict:
+    return {field: item[field] for field in fields}
+
+
+def _page(items: list[dict], limit: int, fields: tuple[str, ...]) -> dict:
+    # Callers fetch one extra row to learn whether another page exists.
+    next_cursor = str(items[limit - 1]["id"]) if len(items) > limit else None
+    return {"items": [_select_fields(item, fields) for item in items[:limit]], "next_cursor": next_cursor}
+
 
 def _format_failure_email(failed: list[dict]) -> str:
     if not failed:
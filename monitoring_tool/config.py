@@ -13,9 +13,105 @@ SCHEMA_PATH = Path(os.getenv("MONITORING_SCHEMA_PATH", BASE_DIR / "scripts" / "s
 SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
 SMTP_SENDER = os.getenv("SMTP_SENDER", "monitoring@example.com")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+# Background email delivery. Queued messages are sent over one SMTP
+# connection per batch and retried with exponential backoff.
+EMAIL_BATCH_SIZE = max(1, int(os.getenv("MONITORING_EMAIL_BATCH_SIZE", "50")))
+EMAIL_MAX_ATTEMPTS = max(1, int(os.getenv("MONITORING_EMAIL_MAX_ATTEMPTS", "5")))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("MONITORING_EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("MONITORING_EMAIL_RETRY_MAX_SECONDS", "3600"))
+# An idle SMTP connection is closed after this long rather than left for the
+# relay to drop.
+EMAIL_IDLE_SECONDS = float(os.getenv("MONITORING_EMAIL_IDLE_SECONDS", "60"))
+
+# Automatic emails when a process turns Failed or recovers. Transitions
+# within the digest window are sent together as one email.
+ALERTS_ENABLED = os.getenv("MONITORING_ALERTS", "off").strip().lower() in {"1", "on", "true", "yes"}
+ALERT_DIGEST_WINDOW_SECONDS = float(os.getenv("MONITORING_ALERT_DIGEST_WINDOW_SECONDS", "60"))
 
 FLASK_SECRET = os.getenv("FLASK_SECRET", "monitoring-tool-secret")
 
 # Optional SQL Server connection used by scheduled check queries.
 SQLSERVER_CONNECTION_STRING = os.getenv("MONITORING_SQLSERVER_CONNECTION_STRING", "").strip()
 SQLSERVER_QUERY_TIMEOUT_SECONDS = int(os.getenv("MONITORING_SQLSERVER_QUERY_TIMEOUT_SECONDS", "30"))
+# Connections are pooled and reused across checks; ones idle for longer than
+# the health check window are pinged before reuse.
+SQLSERVER_POOL_SIZE = max(1, int(os.getenv("MONITORING_SQLSERVER_POOL_SIZE", "16")))
+SQLSERVER_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("MONITORING_SQLSERVER_POOL_HEALTH_CHECK_SECONDS", "30"))
+# Identical check queries run once per cycle; a TTL also shares results
+# across cycles and watcher checks. 0 limits sharing to a single cycle.
+QUERY_CACHE_TTL_SECONDS = max(0.0, float(os.getenv("MONITORING_QUERY_CACHE_TTL_SECONDS", "0")))
+
+# Worker pool used by the monitoring cycle. A value of 1 runs checks sequentially.
+CHECK_MAX_WORKERS = max(1, int(os.getenv("MONITORING_CHECK_MAX_WORKERS", "8")))
+CHECK_TIMEOUT_SECONDS = float(os.getenv("MONITORING_CHECK_TIMEOUT_SECONDS", "120"))
+# Incremental runs: a check whose outcome (status, reasons, UC4 status and
+# marker modification time) repeats the last one recorded only updates
+# process_status.verified_at instead of adding a process_runs row.
+INCREMENTAL_RUNS = os.getenv("MONITORING_INCREMENTAL_RUNS", "off").strip().lower() in {"1", "on", "true", "yes"}
+# Runs recorded during a monitoring cycle are written in batches of this size.
+RUN_BATCH_SIZE = max(1, int(os.getenv("MONITORING_RUN_BATCH_SIZE", "1000")))
+
+# SQLite connection pool shared by the scheduler and web request threads.
+DB_POOL_SIZE = max(1, int(os.getenv("MONITORING_DB_POOL_SIZE", "8")))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("MONITORING_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS = os.getenv("MONITORING_DB_SYNCHRONOUS", "NORMAL").strip().upper()
+if DB_SYNCHRONOUS not in {"OFF", "NORMAL", "FULL", "EXTRA"}:
+    DB_SYNCHRONOUS = "NORMAL"
+
+# /reports/stream pushes changed report rows. Runs recorded in this process
+# are sent at once; ones from separate workers are polled for.
+REPORT_STREAM_POLL_SECONDS = max(0.1, float(os.getenv("MONITORING_REPORT_STREAM_POLL_SECONDS", "2")))
+REPORT_STREAM_KEEPALIVE_SECONDS = max(1.0, float(os.getenv("MONITORING_REPORT_STREAM_KEEPALIVE_SECONDS", "15")))
+# Streams are closed after this long and the browser reconnects, so a request
+# thread is never held indefinitely.
+REPORT_STREAM_MAX_SECONDS = float(os.getenv("MONITORING_REPORT_STREAM_MAX_SECONDS", "300"))
+
+# Most recent fatal events shown per process on the reports page.
+REPORT_FATAL_EVENTS_PER_TAG = max(1, int(os.getenv("MONITORING_REPORT_FATAL_EVENTS_PER_TAG", "5")))
+
+# process_runs retention. Runs older than the window are rolled up into
+# process_run_daily and removed; 0 keeps raw history forever.
+HISTORY_RETENTION_DAYS = max(0, int(os.getenv("MONITORING_HISTORY_RETENTION_DAYS", "0")))
+HISTORY_ARCHIVE_DIR = os.getenv("MONITORING_HISTORY_ARCHIVE_DIR", "").strip()
+RETENTION_INTERVAL_SECONDS = int(os.getenv("MONITORING_RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = max(1, int(os.getenv("MONITORING_RETENTION_BATCH_SIZE", "5000")))
+RETENTION_VACUUM_PAGES = max(0, int(os.getenv("MONITORING_RETENTION_VACUUM_PAGES", "2000")))
+
+# Optional marker watcher: off, auto (inotify with polling for network mounts),
+# inotify or poll.
+WATCH_MODE = os.getenv("MONITORING_WATCH_MODE", "off").strip().lower()
+WATCH_POLL_SECONDS = float(os.getenv("MONITORING_WATCH_POLL_SECONDS", "15"))
+WATCH_REFRESH_SECONDS = float(os.getenv("MONITORING_WATCH_REFRESH_SECONDS", "60"))
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("MONITORING_WATCH_DEBOUNCE_SECONDS", "0.2"))
+
+# Folder listings are shared by processes pointing at the same directory for
+# this long within a cycle.
+FOLDER_SCAN_TTL_SECONDS = float(os.getenv("MONITORING_FOLDER_SCAN_TTL_SECONDS", "10"))
+# Only the head of a marker file is read when parsing its content.
+MARKER_CONTENT_MAX_BYTES = int(os.getenv("MONITORING_MARKER_CONTENT_MAX_BYTES", "65536"))
+
+# Per-process scheduler. Processes without their own interval or cron schedule
+# are checked every SCHEDULER_DEFAULT_INTERVAL_SECONDS.
+SCHEDULER_DEFAULT_INTERVAL_SECONDS = int(os.getenv("MONITORING_SCHEDULER_INTERVAL_SECONDS", "600"))
+SCHEDULER_MIN_INTERVAL_SECONDS = int(os.getenv("MONITORING_SCHEDULER_MIN_INTERVAL_SECONDS", "10"))
+SCHEDULER_REFRESH_SECONDS = float(os.getenv("MONITORING_SCHEDULER_REFRESH_SECONDS", "60"))
+SCHEDULER_JITTER_SECONDS = float(os.getenv("MONITORING_SCHEDULER_JITTER_SECONDS", "15"))
+
+# The web app runs the scheduler and background jobs (email delivery,
+# retention, watcher) itself unless this is off; run them with
+# `python -m monitoring_tool.worker` instead.
+EMBEDDED_WORKER = os.getenv("MONITORING_EMBEDDED_WORKER", "on").strip().lower() in {"1", "on", "true", "yes"}
+# Schedulers record a heartbeat this often; one silent for three intervals
+# is shown as down.
+WORKER_HEARTBEAT_SECONDS = max(1.0, float(os.getenv("MONITORING_WORKER_HEARTBEAT_SECONDS", "15")))
+
+# Sharded scheduling. With coordination on, every scheduler (embedded in the
+# web app or started with `python -m monitoring_tool.worker`) renews a lease
+# and checks only the processes the hash ring assigns to it.
+SCHEDULER_COORDINATION = os.getenv("MONITORING_SCHEDULER_COORDINATION", "off").strip().lower() in {"1", "on", "true", "yes"}
+WORKER_ID = os.getenv("MONITORING_WORKER_ID", "").strip()
+# A worker that has not renewed for this long is dropped and its processes
+# are reassigned. Leases are renewed every third of the window.
+WORKER_LEASE_SECONDS = max(3.0, float(os.getenv("MONITORING_WORKER_LEASE_SECONDS", "30")))
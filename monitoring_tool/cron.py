@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+_FIELD_RANGES = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate <= limit:
+            if candidate.month not in self.months:
+                candidate = _start_of_next_month(candidate)
+                continue
+            if not self._matches_day(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron schedule never fires: {self.expression}")
+
+    def _matches_day(self, moment: datetime) -> bool:
+        # Cron treats day-of-month and day-of-week as alternatives when both
+        # are restricted.
+        weekday = (moment.weekday() + 1) % 7
+        day_match = moment.day in self.days
+        weekday_match = weekday in self.weekdays
+        if self.any_day:
+            return weekday_match
+        if self.any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+
+def parse(expression: str) -> CronSchedule:
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError("Cron schedule must have five fields: minute hour day month weekday")
+
+    values = []
+    for text, (name, low, high) in zip(fields, _FIELD_RANGES):
+        values.append(_parse_field(text, name, low, high))
+    minutes, hours, days, months, weekdays = values
+    return CronSchedule(
+        expression=expression,
+        minutes=minutes,
+        hours=hours,
+        days=days,
+        months=months,
+        # Both 0 and 7 mean Sunday.
+        weekdays=frozenset(value % 7 for value in weekdays),
+        any_day=fields[2] == "*",
+        any_weekday=fields[4] == "*",
+    )
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        span, _, step_text = part.partition("/")
+        try:
+            step = int(step_text) if step_text else 1
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start_text, end_text = span.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = int(span)
+                end = high if step_text else start
+        except ValueError:
+            raise ValueError(f"Invalid cron {name} field: {text}") from None
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid cron {name} field: {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+def _start_of_next_month(moment: datetime) -> datetime:
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1, day=1, hour=0, minute=0)
+    return moment.replace(month=moment.month + 1, day=1, hour=0, minute=0)
@@ -1,79 +1,256 @@
 import sqlite3
-from typing import Iterable
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import ContextManager, Iterable, Iterator
 
-from monitoring_tool import config
+from monitoring_tool import config, metrics, migrations
 
 DB_PATH = config.DB_PATH
 
-SCHEMA_STATEMENTS = """
-CREATE TABLE IF NOT EXISTS processes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    tag_name TEXT NOT NULL UNIQUE,
-    folder_path TEXT NOT NULL,
-    check_uc4_file INTEGER NOT NULL DEFAULT 0,
-    scheduled_time TEXT,
-    check_query TEXT,
-    created_at TEXT NOT NULL DEFAULT (datetime('now'))
-);
-
-CREATE TABLE IF NOT EXISTS fatal_events (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    tag_name TEXT NOT NULL,
-    event_time TEXT NOT NULL DEFAULT (datetime('now')),
-    description TEXT NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS notification_recipients (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    email TEXT NOT NULL UNIQUE
-);
-
-CREATE TABLE IF NOT EXISTS process_runs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    tag_name TEXT NOT NULL,
-    run_time TEXT NOT NULL DEFAULT (datetime('now')),
-    status TEXT NOT NULL,
-    reasons TEXT NOT NULL,
-    uc4_status TEXT NOT NULL,
-    check_type TEXT NOT NULL
-);
-"""
+# Bumped whenever data shown on the reports page changes. Seeded from the clock
+# so values are not reused across restarts.
+_generation = time.time_ns()
+_generation_lock = threading.Lock()
+_generation_changed = threading.Condition(_generation_lock)
 
 
 def get_connection() -> sqlite3.Connection:
-    connection = sqlite3.connect(str(config.DB_PATH))
+    connection = sqlite3.connect(
+        str(config.DB_PATH),
+        timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+    )
     connection.row_factory = sqlite3.Row
+    if connection.execute("PRAGMA page_count").fetchone()[0] == 0:
+        # auto_vacuum can only be chosen before the first table is created;
+        # existing files are converted with a full VACUUM.
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT_MS)}")
+    connection.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
     return connection
 
 
+class ConnectionPool:
+    def __init__(self, path: Path, max_size: int) -> None:
+        self.path = path
+        self.max_size = max_size
+        self._condition = threading.Condition()
+        self._idle: list[sqlite3.Connection] = []
+        self._owners: dict[int, list] = {}
+        self._size = 0
+        self._closed = False
+        self._created = 0
+        self._acquired = 0
+        self._reused = 0
+        self._waits = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # A thread that already holds a connection gets the same one back, so
+        # nested helpers share its transaction instead of waiting on the pool.
+        thread_id = threading.get_ident()
+        owned = self._owners.get(thread_id)
+        if owned is not None:
+            owned[1] += 1
+            try:
+                yield owned[0]
+            finally:
+                owned[1] -= 1
+            return
+
+        connection = self._acquire()
+        self._owners[thread_id] = [connection, 1]
+        try:
+            yield connection
+        finally:
+            del self._owners[thread_id]
+            self._release(connection)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "path": str(self.path),
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                "created": self._created,
+                "acquired": self._acquired,
+                "reused": self._reused,
+                "waits": self._waits,
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + config.DB_BUSY_TIMEOUT_MS / 1000
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"Connection pool exhausted ({self.max_size} connections)")
+                self._waits += 1
+                self._condition.wait(remaining)
+
+            self._acquired += 1
+            if self._idle:
+                self._reused += 1
+                return self._idle.pop()
+            self._size += 1
+
+        try:
+            connection = get_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._created += 1
+        return connection
+
+    def _release(self, connection: sqlite3.Connection) -> None:
+        if connection.in_transaction:
+            connection.rollback()
+
+        with self._condition:
+            if not self._closed:
+                self._idle.append(connection)
+                self._condition.notify()
+                return
+            self._size -= 1
+        connection.close()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    path = Path(config.DB_PATH)
+    with _pool_lock:
+        if _pool is None or _pool.path != path:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(path, config.DB_POOL_SIZE)
+            bump_generation()
+        return _pool
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pooled_connection() -> ContextManager[sqlite3.Connection]:
+    return get_pool().connection()
+
+
+def data_generation() -> int:
+    return _generation
+
+
+def bump_generation() -> int:
+    global _generation
+    with _generation_changed:
+        _generation += 1
+        _generation_changed.notify_all()
+        return _generation
+
+
+def wait_for_generation(generation: int, timeout: float) -> int:
+    # Returns as soon as data changes in this process; changes made by other
+    # processes are only seen by polling after the timeout.
+    with _generation_changed:
+        _generation_changed.wait_for(lambda: _generation != generation, timeout)
+        return _generation
+
+
 def init_db() -> None:
     schema = config.SCHEMA_PATH.read_text(encoding="utf-8")
-    with get_connection() as connection:
+    with pooled_connection() as connection:
         connection.executescript(schema)
+        migrations.migrate(connection)
 
 
 def query_all(query: str, params: Iterable | None = None) -> list[sqlite3.Row]:
-    with get_connection() as connection:
+    with metrics.DB_QUERY_SECONDS.time(operation="query_all"), pooled_connection() as connection:
         cursor = connection.execute(query, params or [])
         return cursor.fetchall()
 
 
 def execute(query: str, params: Iterable | None = None) -> None:
-    with get_connection() as connection:
+    with metrics.DB_QUERY_SECONDS.time(operation="execute"), pooled_connection() as connection:
         connection.execute(query, params or [])
         connection.commit()
 
 
-def ensure_schema() -> None:
-    with get_connection() as connection:
-        connection.executescript(SCHEMA_STATEMENTS)
-        _ensure_column(connection, "processes", "scheduled_time", "TEXT")
-        _ensure_column(connection, "processes", "check_query", "TEXT")
+def iter_query(query: str, params: Iterable | None = None, chunk_size: int = 1000) -> Iterator[sqlite3.Row]:
+    # Rows are pulled from the cursor in chunks so large result sets are never
+    # held in memory. The pooled connection is kept until the iterator finishes
+    # or is closed.
+    with pooled_connection() as connection:
+        cursor = connection.execute(query, params or [])
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
 
-def _ensure_column(connection: sqlite3.Connection, table: str, column: str, definition: str) -> None:
-    cursor = connection.execute(f"PRAGMA table_info({table})")
-    columns = {row[1] for row in cursor.fetchall()}
-    if column not in columns:
-        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    with pooled_connection() as connection:
+        if connection.in_transaction:
+            yield connection
+            return
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except Exception:
+            connection.rollback()
+            raise
         connection.commit()
+
+
+def execute_many(query: str, seq_of_params: Iterable[Iterable]) -> None:
+    with metrics.DB_QUERY_SECONDS.time(operation="execute_many"), pooled_connection() as connection:
+        connection.executemany(query, seq_of_params)
+        connection.commit()
+
+
+def ensure_schema() -> None:
+    with pooled_connection() as connection:
+        # An up-to-date database is only read, so starting a web worker takes
+        # no write lock.
+        if migrations.current_version(connection) >= migrations.LATEST_VERSION:
+            return
+        migrations.migrate(connection)
+
+
+def schema_version() -> int:
+    with pooled_connection() as connection:
+        return migrations.current_version(connection)
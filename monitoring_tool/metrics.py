@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Prometheus-style metrics rendered in the text exposition format. Kept
+# dependency-free; observations are a lock and a bisect so they are cheap
+# enough for db.query_all.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CYCLE_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def replace(self, values: dict[tuple[str, ...], float]) -> None:
+        # Swaps in a full set of label values so ones that disappeared are
+        # no longer reported.
+        with self._lock:
+            self._values = dict(values)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (non-cumulative, last is +Inf), sum.
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _labels(self.labels + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    lines = []
+    for metric in list(REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+CYCLE_SECONDS = Histogram(
+    "monitoring_cycle_duration_seconds",
+    "Time to run one batch of checks.",
+    ("source",),
+    CYCLE_BUCKETS,
+)
+CYCLE_LAST_SECONDS = Gauge(
+    "monitoring_cycle_last_duration_seconds", "Duration of the most recent batch of checks.", ("source",)
+)
+SCHEDULER_INTERVAL_SECONDS = Gauge(
+    "monitoring_scheduler_interval_seconds", "Default interval between checks of a process."
+)
+CHECK_SECONDS = Histogram(
+    "monitoring_check_duration_seconds", "Latency of individual checks.", ("check_type",)
+)
+CHECKS_TIMED_OUT = Counter("monitoring_checks_timed_out_total", "Checks abandoned after the check timeout.")
+DB_QUERY_SECONDS = Histogram(
+    "monitoring_db_query_duration_seconds", "Latency of SQLite calls made through monitoring_tool.db.", ("operation",)
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "monitoring_http_request_duration_seconds", "Time to build a response, by endpoint.", ("endpoint",)
+)
+PROCESS_STATUS = Gauge("monitoring_process_status", "Processes by latest status.", ("status",))
+QUEUE_DEPTH = Gauge("monitoring_queue_depth", "Items waiting in background queues.", ("queue",))
+QUERY_CACHE_REQUESTS = Counter(
+    "monitoring_query_cache_requests_total", "Check query result lookups by outcome.", ("result",)
+)
+DB_POOL = Gauge("monitoring_db_pool_connections", "SQLite connection pool usage.", ("state",))
+WORKER_UP = Gauge("monitoring_worker_up", "1 while a scheduler's heartbeat is current.", ("worker_id", "role"))
+WORKER_LAST_CYCLE_SECONDS = Gauge(
+    "monitoring_worker_last_cycle_duration_seconds",
+    "Duration of each scheduler's most recent batch, from its heartbeat.",
+    ("worker_id", "role"),
+)
+RUNS_RECORDED = Counter(
+    "monitoring_runs_recorded_total", "Check outcomes by whether a run was written or only verified.", ("result",)
+)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _create_base_tables(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS processes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag_name TEXT NOT NULL UNIQUE,
+            folder_path TEXT NOT NULL,
+            check_uc4_file INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fatal_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag_name TEXT NOT NULL,
+            event_time TEXT NOT NULL DEFAULT (datetime('now')),
+            description TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notification_recipients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS process_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag_name TEXT NOT NULL,
+            run_time TEXT NOT NULL DEFAULT (datetime('now')),
+            status TEXT NOT NULL,
+            reasons TEXT NOT NULL,
+            uc4_status TEXT NOT NULL,
+            check_type TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _add_process_schedule_columns(connection: sqlite3.Connection) -> None:
+    add_column(connection, "processes", "scheduled_time", "TEXT")
+    add_column(connection, "processes", "check_query", "TEXT")
+
+
+def _add_history_indexes(connection: sqlite3.Connection) -> None:
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_process_runs_tag_id ON process_runs (tag_name, id)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_process_runs_tag_run_time ON process_runs (tag_name, run_time)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fatal_events_tag_time ON fatal_events (tag_name, event_time)"
+    )
+
+
+def _create_process_status(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS process_status (
+            tag_name TEXT PRIMARY KEY,
+            run_id INTEGER NOT NULL,
+            run_time TEXT NOT NULL,
+            status TEXT NOT NULL,
+            reasons TEXT NOT NULL,
+            uc4_status TEXT NOT NULL,
+            check_type TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO process_status "
+        "(tag_name, run_id, run_time, status, reasons, uc4_status, check_type) "
+        "SELECT tag_name, id, run_time, status, reasons, uc4_status, check_type FROM process_runs "
+        "WHERE id IN (SELECT MAX(id) FROM process_runs GROUP BY tag_name)"
+    )
+
+
+def _create_process_run_daily(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS process_run_daily (
+            tag_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            first_failure_time TEXT,
+            reasons TEXT NOT NULL DEFAULT '[]',
+            PRIMARY KEY (tag_name, day)
+        )
+        """
+    )
+
+
+def _add_marker_rule_columns(connection: sqlite3.Connection) -> None:
+    add_column(connection, "processes", "marker_max_age_hours", "REAL")
+    add_column(connection, "processes", "marker_fresh_since_schedule", "INTEGER NOT NULL DEFAULT 0")
+    add_column(connection, "processes", "parse_marker_content", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_schedule_columns(connection: sqlite3.Connection) -> None:
+    add_column(connection, "processes", "check_interval_seconds", "INTEGER")
+    add_column(connection, "processes", "cron_schedule", "TEXT")
+
+
+def _add_check_assertion_column(connection: sqlite3.Connection) -> None:
+    add_column(connection, "processes", "check_assertion", "TEXT")
+
+
+def _create_email_deliveries(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_deliveries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender TEXT NOT NULL,
+            recipients TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            next_attempt_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+        """
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_deliveries_due ON email_deliveries (status, next_attempt_at)"
+    )
+
+
+def _create_worker_leases(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS worker_leases (
+            worker_id TEXT PRIMARY KEY,
+            hostname TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            renewed_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS process_leases (
+            tag_name TEXT PRIMARY KEY,
+            worker_id TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_process_leases_worker ON process_leases (worker_id)")
+
+
+def _create_worker_heartbeats(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS worker_heartbeats (
+            worker_id TEXT PRIMARY KEY,
+            hostname TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            heartbeat_at TEXT NOT NULL,
+            processes INTEGER NOT NULL DEFAULT 0,
+            checks_run INTEGER NOT NULL DEFAULT 0,
+            last_cycle_at TEXT,
+            last_cycle_seconds REAL
+        )
+        """
+    )
+
+
+def _add_process_status_run_index(connection: sqlite3.Connection) -> None:
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_process_status_run_id ON process_status (run_id)")
+
+
+def _add_process_status_verified_at(connection: sqlite3.Connection) -> None:
+    add_column(connection, "process_status", "verified_at", "TEXT")
+    connection.execute("UPDATE process_status SET verified_at = run_time WHERE verified_at IS NULL")
+
+
+def _create_report_version(connection: sqlite3.Connection) -> None:
+    # Triggers count every change to the data shown on the reports page, so
+    # web processes notice writes made by workers and other processes.
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS report_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), "
+        "version INTEGER NOT NULL)"
+    )
+    connection.execute("INSERT OR IGNORE INTO report_version (id, version) VALUES (1, 0)")
+    for table in ("processes", "process_status", "fatal_events"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            connection.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_report_version "
+                f"AFTER {event} ON {table} "
+                "BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END"
+            )
+
+
+def _add_history_page_indexes(connection: sqlite3.Connection) -> None:
+    # History API pages are newest first. With a status or tag the page is
+    # read in id order straight from the index; since/until only read the
+    # matching time range.
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_process_runs_status_id ON process_runs (status, id)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_fatal_events_tag_id ON fatal_events (tag_name, id)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_fatal_events_time_id ON fatal_events (event_time, id)")
+
+
+MIGRATIONS = [
+    Migration(1, "create base tables", _create_base_tables),
+    Migration(2, "add process schedule columns", _add_process_schedule_columns),
+    Migration(3, "add history indexes", _add_history_indexes),
+    Migration(4, "create process status", _create_process_status),
+    Migration(5, "create process run daily rollup", _create_process_run_daily),
+    Migration(6, "add marker rule columns", _add_marker_rule_columns),
+    Migration(7, "add per-process schedule columns", _add_schedule_columns),
+    Migration(8, "add check assertion column", _add_check_assertion_column),
+    Migration(9, "create email deliveries", _create_email_deliveries),
+    Migration(10, "create worker leases", _create_worker_leases),
+    Migration(11, "create worker heartbeats", _create_worker_heartbeats),
+    Migration(12, "add process status run index", _add_process_status_run_index),
+    Migration(13, "add process status verified time", _add_process_status_verified_at),
+    Migration(14, "create report version", _create_report_version),
+    Migration(15, "add history page indexes", _add_history_page_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def add_column(connection: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def current_version(connection: sqlite3.Connection) -> int:
+    _ensure_version_table(connection)
+    row = connection.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    _ensure_version_table(connection)
+    for migration in MIGRATIONS:
+        # BEGIN IMMEDIATE serializes concurrent migrators; the version is
+        # re-read under the write lock so each migration is applied once.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(connection) < migration.version:
+                migration.apply(connection)
+                connection.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                    [migration.version, migration.name],
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return current_version(connection)
+
+
+def _ensure_version_table(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied_at TEXT NOT NULL DEFAULT (datetime('now')))"
+    )
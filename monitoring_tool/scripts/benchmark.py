@@ -0,0 +1,293 @@
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+from unittest.mock import patch
+
+from monitoring_tool import config, db
+from monitoring_tool.services import monitoring_service, process_service, report_service
+
+DEFAULT_BASELINE = config.REPO_ROOT / "benchmarks" / "baseline.json"
+INSERT_CHUNK = 10_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the monitoring cycle, report building and DB paths against a synthetic fleet."
+    )
+    parser.add_argument("--processes", type=int, default=1000, help="Processes (and marker folders) to create.")
+    parser.add_argument("--runs", type=int, default=100_000, help="Historical process_runs rows to generate.")
+    parser.add_argument("--fatal-events", type=int, default=10_000, help="Historical fatal_events rows to generate.")
+    parser.add_argument("--record-runs", type=int, default=2000, help="Runs written by the record_run benchmarks.")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each benchmark is run; the median is kept.")
+    parser.add_argument("--workdir", help="Build the fleet here instead of a temporary folder.")
+    parser.add_argument("--output", help="Write results as JSON to this file. Defaults to stdout.")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown versus the baseline median before the run fails (0.25 = 25%%).",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        processes=args.processes,
+        runs=args.runs,
+        fatal_events=args.fatal_events,
+        record_runs=args.record_runs,
+        repeat=args.repeat,
+        workdir=args.workdir,
+    )
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline to {baseline_path}", file=sys.stderr)
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        results["comparison"] = compare(results, baseline, args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    regressions = [name for name, row in results.get("comparison", {}).items() if row["regressed"]]
+    for name in regressions:
+        row = results["comparison"][name]
+        print(f"REGRESSION {name}: {row['baseline']:.4f}s -> {row['current']:.4f}s ({row['ratio']:.2f}x)", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+def run_benchmarks(
+    processes: int,
+    runs: int,
+    fatal_events: int,
+    record_runs: int,
+    repeat: int = 3,
+    workdir: str | None = None,
+) -> dict:
+    with _workspace(workdir) as root:
+        started = time.perf_counter()
+        tags = build_fleet(root, processes, runs, fatal_events)
+        setup_seconds = time.perf_counter() - started
+
+        results = {
+            "run_monitoring_cycle": _measure(repeat, monitoring_service.run_monitoring_cycle, processes),
+            "run_monitoring_cycle_incremental": _measure_incremental_cycle(repeat, processes),
+            "list_process_reports": _measure(
+                repeat, lambda: report_service.list_process_reports(process_service.list_processes()), processes
+            ),
+            "reports_route": _measure_reports_route(repeat, processes),
+            "record_run": _measure(repeat, lambda: _record_runs(tags, record_runs, batched=False), record_runs),
+            "record_run_batched": _measure(repeat, lambda: _record_runs(tags, record_runs, batched=True), record_runs),
+        }
+
+    return {
+        "meta": {
+            "processes": processes,
+            "runs": runs,
+            "fatal_events": fatal_events,
+            "record_runs": record_runs,
+            "repeat": repeat,
+            "setup_seconds": round(setup_seconds, 3),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "created_at": datetime.now().replace(microsecond=0).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    comparison = {}
+    if any(results["meta"].get(key) != baseline.get("meta", {}).get(key) for key in ("processes", "runs", "fatal_events")):
+        # Numbers from a differently sized fleet are not comparable.
+        return comparison
+
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        ratio = current["median"] / previous["median"] if previous["median"] else 1.0
+        comparison[name] = {
+            "baseline": previous["median"],
+            "current": current["median"],
+            "ratio": round(ratio, 3),
+            "regressed": ratio > 1 + tolerance,
+        }
+    return comparison
+
+
+def build_fleet(root: Path, processes: int, runs: int, fatal_events: int) -> list[str]:
+    # Deterministic mix: most folders healthy, some failing, some missing and
+    # a share with UC4 and local SQLite query checks.
+    rng = random.Random(42)
+    now = datetime.now()
+    tags = [f"bench-{index:06d}" for index in range(processes)]
+    rows = []
+    for index, tag_name in enumerate(tags):
+        folder = root / "folders" / f"{index // 1000:03d}" / tag_name
+        roll = rng.random()
+        if roll < 0.95:
+            folder.mkdir(parents=True)
+            (folder / ("failure.flag" if roll < 0.1 else "success.flag")).write_text("exit_code=0\n")
+            if index % 4 == 0:
+                (folder / "uc4.flag").touch()
+        check_query = f"SELECT id FROM processes WHERE tag_name = '{tag_name}'" if index % 10 == 0 else None
+        rows.append((tag_name, str(folder), int(index % 4 == 0), check_query))
+
+    db.execute_many(
+        "INSERT INTO processes (tag_name, folder_path, check_uc4_file, check_query) VALUES (?, ?, ?, ?)", rows
+    )
+
+    start = now - timedelta(days=30)
+    step = timedelta(days=30) / max(1, runs)
+    _insert_chunked(
+        "INSERT INTO process_runs (tag_name, run_time, status, reasons, uc4_status, check_type) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                tags[index % processes],
+                _format_time(start + step * index),
+                "Failed" if rng.random() < 0.1 else "Success",
+                '["Missing success marker: success.flag"]' if index % 10 == 0 else "[]",
+                "OK",
+                "filesystem",
+            )
+            for index in range(runs)
+        ),
+    )
+    _insert_chunked(
+        "INSERT INTO fatal_events (tag_name, event_time, description) VALUES (?, ?, ?)",
+        (
+            (rng.choice(tags), _format_time(start + timedelta(seconds=rng.randrange(30 * 86400))), "Synthetic fatal event")
+            for _ in range(fatal_events)
+        ),
+    )
+    db.execute(
+        "INSERT OR REPLACE INTO process_status (tag_name, run_id, run_time, status, reasons, uc4_status, check_type) "
+        "SELECT tag_name, id, run_time, status, reasons, uc4_status, check_type FROM process_runs "
+        "WHERE id IN (SELECT MAX(id) FROM process_runs GROUP BY tag_name)"
+    )
+    db.bump_generation()
+    return tags
+
+
+@contextmanager
+def _workspace(workdir: str | None) -> Iterator[Path]:
+    temporary = None if workdir else tempfile.TemporaryDirectory(prefix="monitoring-bench-")
+    root = Path(workdir or temporary.name)
+    root.mkdir(parents=True, exist_ok=True)
+    db_path = root / "benchmark.db"
+    if db_path.exists():
+        raise SystemExit(f"{db_path} already exists; use an empty --workdir")
+
+    # Everything runs against a throwaway database; the configured one is
+    # never opened.
+    try:
+        with patch.object(config, "DB_PATH", db_path), patch.object(config, "ALERTS_ENABLED", False):
+            db.init_db()
+            try:
+                yield root
+            finally:
+                db.close_pool()
+    finally:
+        if temporary is not None:
+            temporary.cleanup()
+
+
+def _measure(repeat: int, func: Callable[[], object], operations: int) -> dict:
+    timings = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return _summary(timings, operations)
+
+
+def _measure_incremental_cycle(repeat: int, operations: int) -> dict:
+    with patch.object(config, "INCREMENTAL_RUNS", True):
+        # The first cycle records every process; the timed ones are the
+        # steady state where nothing changed.
+        monitoring_service.run_monitoring_cycle()
+        return _measure(repeat, monitoring_service.run_monitoring_cycle, operations)
+
+
+def _measure_reports_route(repeat: int, operations: int) -> dict:
+    from monitoring_tool.app import create_app
+
+    with patch("monitoring_tool.app.monitoring_service.start_scheduler"), patch(
+        "monitoring_tool.app.retention_service.start_retention_job"
+    ), patch("monitoring_tool.app.watcher_service.start_watcher"), patch(
+        "monitoring_tool.app.email_service.start_email_worker"
+    ):
+        client = create_app().test_client()
+
+    def render() -> None:
+        # Bumping the generation makes every request rebuild its rows, as
+        # the first request after a cycle does.
+        db.bump_generation()
+        response = client.get("/reports")
+        if response.status_code != 200:
+            raise RuntimeError(f"/reports returned {response.status_code}")
+
+    return _measure(repeat, render, operations)
+
+
+def _record_runs(tags: list[str], count: int, batched: bool) -> None:
+    run_time = _format_time(datetime.now())
+
+    def write() -> None:
+        for index in range(count):
+            report_service.record_run(tags[index % len(tags)], "Success", [], "OK", "filesystem", run_time)
+
+    if batched:
+        with report_service.batch_runs():
+            write()
+    else:
+        write()
+
+
+def _insert_chunked(query: str, rows: Iterator[tuple]) -> None:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK:
+            db.execute_many(query, chunk)
+            chunk = []
+    if chunk:
+        db.execute_many(query, chunk)
+
+
+def _summary(timings: list[float], operations: int) -> dict:
+    median = statistics.median(timings)
+    return {
+        "median": round(median, 6),
+        "min": round(min(timings), 6),
+        "max": round(max(timings), 6),
+        "operations": operations,
+        "ops_per_second": round(operations / median, 1) if median else None,
+    }
+
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
+
+
+if __name__ == "__main__":
+    main()
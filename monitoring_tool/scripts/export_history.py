@@ -0,0 +1,37 @@
+import argparse
+import sys
+from datetime import datetime
+
+from monitoring_tool import db
+from monitoring_tool.services import export_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream process_runs or fatal_events history as CSV or NDJSON.")
+    parser.add_argument("table", choices=["runs", "fatal-events"])
+    parser.add_argument("--format", choices=export_service.EXPORT_FORMATS, default="csv")
+    parser.add_argument("--tag-prefix", help="Only export tags starting with this prefix.")
+    parser.add_argument("--since", type=_timestamp, help="Inclusive start time (ISO format).")
+    parser.add_argument("--until", type=_timestamp, help="Exclusive end time (ISO format).")
+    parser.add_argument("--output", help="File to write to. Defaults to stdout.")
+    args = parser.parse_args()
+
+    db.ensure_schema()
+    exporter = export_service.export_runs if args.table == "runs" else export_service.export_fatal_events
+    chunks = exporter(args.format, tag_prefix=args.tag_prefix, since=args.since, until=args.until)
+
+    if not args.output:
+        sys.stdout.writelines(chunks)
+        return
+
+    with open(args.output, "w", encoding="utf-8", newline="") as output:
+        output.writelines(chunks)
+    print("Exported", args.table, "to", args.output, file=sys.stderr)
+
+
+def _timestamp(value: str) -> str:
+    return datetime.fromisoformat(value).replace(microsecond=0).isoformat(sep=" ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+
+from monitoring_tool import config, db
+from monitoring_tool.services import retention_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Roll up and prune old process_runs history.")
+    parser.add_argument("--days", type=int, help="Keep raw runs newer than this many days.")
+    parser.add_argument("--archive-dir", help="Write pruned runs to a gzipped NDJSON file in this folder.")
+    parser.add_argument("--no-archive", action="store_true", help="Do not archive pruned runs.")
+    parser.add_argument("--batch-size", type=int, help="Runs pruned per transaction.")
+    parser.add_argument(
+        "--vacuum-full",
+        action="store_true",
+        help="Rewrite the database once so freed pages can be reclaimed incrementally.",
+    )
+    args = parser.parse_args()
+    if args.days is None and config.HISTORY_RETENTION_DAYS <= 0:
+        parser.error("--days is required when MONITORING_HISTORY_RETENTION_DAYS is not set")
+    if args.days is not None and args.days <= 0:
+        parser.error("--days must be at least 1")
+
+    db.ensure_schema()
+    if args.vacuum_full:
+        retention_service.enable_incremental_vacuum()
+
+    result = retention_service.prune_history(
+        retention_days=args.days,
+        archive_dir="" if args.no_archive else args.archive_dir,
+        batch_size=args.batch_size,
+    )
+    print(f"Pruned {result.pruned_runs} runs older than {result.cutoff} into {result.rolled_up_days} daily summaries.")
+    if result.archive_path:
+        print("Archived pruned runs to", result.archive_path)
+    print(f"Reclaimed {result.vacuumed_pages} free pages.")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,12 @@ CREATE TABLE IF NOT EXISTS processes (
     check_uc4_file INTEGER NOT NULL DEFAULT 0,
     scheduled_time TEXT,
     check_query TEXT,
+    marker_max_age_hours REAL,
+    marker_fresh_since_schedule INTEGER NOT NULL DEFAULT 0,
+    parse_marker_content INTEGER NOT NULL DEFAULT 0,
+    check_interval_seconds INTEGER,
+    cron_schedule TEXT,
+    check_assertion TEXT,
     created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
@@ -15,6 +21,10 @@ CREATE TABLE IF NOT EXISTS fatal_events (
     description TEXT NOT NULL
 );
 
+CREATE INDEX IF NOT EXISTS idx_fatal_events_tag_time ON fatal_events (tag_name, event_time);
+CREATE INDEX IF NOT EXISTS idx_fatal_events_tag_id ON fatal_events (tag_name, id);
+CREATE INDEX IF NOT EXISTS idx_fatal_events_time_id ON fatal_events (event_time, id);
+
 CREATE TABLE IF NOT EXISTS notification_recipients (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     email TEXT NOT NULL UNIQUE
@@ -29,3 +39,111 @@ CREATE TABLE IF NOT EXISTS process_runs (
     uc4_status TEXT NOT NULL,
     check_type TEXT NOT NULL
 );
+
+CREATE INDEX IF NOT EXISTS idx_process_runs_tag_id ON process_runs (tag_name, id);
+CREATE INDEX IF NOT EXISTS idx_process_runs_tag_run_time ON process_runs (tag_name, run_time);
+CREATE INDEX IF NOT EXISTS idx_process_runs_status_id ON process_runs (status, id);
+
+CREATE TABLE IF NOT EXISTS process_status (
+    tag_name TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    run_time TEXT NOT NULL,
+    status TEXT NOT NULL,
+    reasons TEXT NOT NULL,
+    uc4_status TEXT NOT NULL,
+    check_type TEXT NOT NULL,
+    verified_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_process_status_run_id ON process_status (run_id);
+
+CREATE TABLE IF NOT EXISTS process_run_daily (
+    tag_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    first_failure_time TEXT,
+    reasons TEXT NOT NULL DEFAULT '[]',
+    PRIMARY KEY (tag_name, day)
+);
+
+CREATE TABLE IF NOT EXISTS email_deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    next_attempt_at TEXT NOT NULL,
+    sent_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_deliveries_due ON email_deliveries (status, next_attempt_at);
+
+CREATE TABLE IF NOT EXISTS worker_leases (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    renewed_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS process_leases (
+    tag_name TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_process_leases_worker ON process_leases (worker_id);
+
+CREATE TABLE IF NOT EXISTS worker_heartbeats (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    heartbeat_at TEXT NOT NULL,
+    processes INTEGER NOT NULL DEFAULT 0,
+    checks_run INTEGER NOT NULL DEFAULT 0,
+    last_cycle_at TEXT,
+    last_cycle_seconds REAL
+);
+
+CREATE TABLE IF NOT EXISTS report_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO report_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_processes_insert_report_version AFTER INSERT ON processes
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_processes_update_report_version AFTER UPDATE ON processes
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_processes_delete_report_version AFTER DELETE ON processes
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_process_status_insert_report_version AFTER INSERT ON process_status
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_process_status_update_report_version AFTER UPDATE ON process_status
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_process_status_delete_report_version AFTER DELETE ON process_status
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fatal_events_insert_report_version AFTER INSERT ON fatal_events
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fatal_events_update_report_version AFTER UPDATE ON fatal_events
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fatal_events_delete_report_version AFTER DELETE ON fatal_events
+BEGIN UPDATE report_version SET version = version + 1 WHERE id = 1; END;
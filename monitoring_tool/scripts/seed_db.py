@@ -1,4 +1,5 @@
 from monitoring_tool import db
+from monitoring_tool.services import report_service
 
 
 SAMPLE_EVENTS = [
@@ -10,10 +11,7 @@ SAMPLE_EVENTS = [
 def main() -> None:
     db.init_db()
     for tag_name, description in SAMPLE_EVENTS:
-        db.execute(
-            "INSERT INTO fatal_events (tag_name, description) VALUES (?, ?)",
-            [tag_name, description],
-        )
+        report_service.add_fatal_event(tag_name, description)
     print("Inserted sample fatal events.")
 
 
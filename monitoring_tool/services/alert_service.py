@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable
+
+from monitoring_tool import config
+from monitoring_tool.services import email_service, process_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Transition:
+    tag_name: str
+    previous: str | None
+    status: str
+    run_time: str
+    reasons: list[str] = field(default_factory=list)
+
+
+# Transitions waiting for the digest window to close, keyed by tag. The
+# first entry's previous status is kept so a flap inside the window cancels out.
+_pending: dict[str, Transition] = {}
+_flush_timer: threading.Timer | None = None
+_lock = threading.RLock()
+
+
+def previous_statuses(connection: sqlite3.Connection, tag_names: Iterable[str]) -> dict[str, str]:
+    # Read inside the transaction that records the runs, so these are the
+    # statuses being replaced whichever process wrote them.
+    if not config.ALERTS_ENABLED:
+        return {}
+    rows = connection.execute(
+        "SELECT tag_name, status FROM process_status WHERE tag_name IN (SELECT value FROM json_each(?))",
+        [json.dumps(sorted(set(tag_names)))],
+    )
+    return {tag_name: status for tag_name, status in rows}
+
+
+def observe(runs: list[tuple], previous_status: dict[str, str]) -> list[Transition]:
+    # runs are process_runs insert parameters:
+    # (tag_name, run_time, status, reasons_json, uc4_status, check_type).
+    if not config.ALERTS_ENABLED:
+        return []
+
+    last_status = dict(previous_status)
+    transitions = []
+    with _lock:
+        for tag_name, run_time, status, reasons, *_ in runs:
+            previous = last_status.get(tag_name)
+            last_status[tag_name] = status
+            if status == previous or (previous is None and status != "Failed"):
+                continue
+            transitions.append(
+                Transition(tag_name, previous, status, run_time or _format_time(datetime.now()), json.loads(reasons))
+            )
+
+        for transition in transitions:
+            earlier = _pending.get(transition.tag_name)
+            if earlier is not None:
+                if _net_status(earlier.previous) == _net_status(transition.status):
+                    del _pending[transition.tag_name]
+                    continue
+                transition = Transition(
+                    transition.tag_name, earlier.previous, transition.status, transition.run_time, transition.reasons
+                )
+            _pending[transition.tag_name] = transition
+
+        if _pending:
+            _schedule_flush()
+    return transitions
+
+
+def flush() -> int:
+    global _flush_timer
+    with _lock:
+        transitions = sorted(_pending.values(), key=lambda transition: transition.tag_name)
+        _pending.clear()
+        _flush_timer = None
+    if not transitions:
+        return 0
+
+    recipients = process_service.list_recipients()
+    if not recipients:
+        logger.info("Dropping %s alert(s): no recipients configured", len(transitions))
+        return 0
+
+    subject, body = format_digest(transitions)
+    email_service.queue_email(recipients, subject, body)
+    return len(transitions)
+
+
+def pending_count() -> int:
+    return len(_pending)
+
+
+def format_digest(transitions: list[Transition]) -> tuple[str, str]:
+    failed = [transition for transition in transitions if transition.status == "Failed"]
+    recovered = [transition for transition in transitions if transition.status != "Failed"]
+
+    if len(transitions) == 1:
+        transition = transitions[0]
+        verb = "failed" if failed else "recovered"
+        subject = f"MonitoringTool: {transition.tag_name} {verb}"
+    else:
+        parts = []
+        if failed:
+            parts.append(f"{len(failed)} failed")
+        if recovered:
+            parts.append(f"{len(recovered)} recovered")
+        subject = f"MonitoringTool: {', '.join(parts)}"
+
+    lines = []
+    if failed:
+        lines.append("The following processes failed:")
+        for transition in failed:
+            lines.append(f"- {transition.tag_name} at {transition.run_time}:")
+            for reason in transition.reasons:
+                lines.append(f"  * {reason}")
+    if recovered:
+        if lines:
+            lines.append("")
+        lines.append("The following processes recovered:")
+        for transition in recovered:
+            lines.append(f"- {transition.tag_name} at {transition.run_time}")
+    return subject, "\n".join(lines)
+
+
+def reset() -> None:
+    global _flush_timer
+    with _lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+        _flush_timer = None
+        _pending.clear()
+
+
+def _schedule_flush() -> None:
+    # The first transition opens the digest window; everything that arrives
+    # before it closes goes out in the same email.
+    global _flush_timer
+    if _flush_timer is not None:
+        return
+    _flush_timer = threading.Timer(config.ALERT_DIGEST_WINDOW_SECONDS, _flush_quietly)
+    _flush_timer.daemon = True
+    _flush_timer.start()
+
+
+def _flush_quietly() -> None:
+    try:
+        flush()
+    except Exception:  # noqa: BLE001
+        logger.exception("Sending alert digest failed")
+
+
+def _net_status(status: str | None) -> str:
+    # A tag with no history counts as healthy, so failing and recovering
+    # inside one window leaves nothing to report.
+    return "Failed" if status == "Failed" else "Success"
+
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
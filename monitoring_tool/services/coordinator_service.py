@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from monitoring_tool import config, db
+from monitoring_tool.services import process_service
+
+logger = logging.getLogger(__name__)
+
+# Virtual nodes per worker on the hash ring; more points give a more even
+# split and move fewer processes when a worker joins or leaves.
+RING_REPLICAS = 64
+
+# A lease held by another live worker is only taken over once it has expired,
+# so a process is never owned by two workers at the same time.
+_CLAIM_LEASE = (
+    "INSERT INTO process_leases (tag_name, worker_id, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(tag_name) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at "
+    "WHERE process_leases.worker_id = excluded.worker_id OR process_leases.expires_at <= ?"
+)
+
+
+class HashRing:
+    def __init__(self, members: Iterable[str], replicas: int = RING_REPLICAS) -> None:
+        points = sorted((_hash(f"{member}#{index}"), member) for member in set(members) for index in range(replicas))
+        self._keys = [key for key, _ in points]
+        self._members = [member for _, member in points]
+
+    def owner(self, key: str) -> str | None:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._members[index]
+
+
+class Coordinator:
+    def __init__(self, worker_id: str | None = None, lease_seconds: float | None = None) -> None:
+        self.worker_id = worker_id or config.WORKER_ID or default_worker_id()
+        self.lease_seconds = config.WORKER_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.members: list[str] = []
+        # Bumped whenever the owned set changes so the scheduler knows to resync.
+        self.version = 0
+        self._owned: frozenset[str] = frozenset()
+        self._valid_until = datetime.min
+        self._started_at = _format_time(_utc_now())
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def renew_seconds(self) -> float:
+        return self.lease_seconds / 3
+
+    def owned(self, now: datetime | None = None) -> frozenset[str]:
+        # Once the leases could have expired (renewals failing), nothing is
+        # owned until the next successful renewal.
+        with self._lock:
+            if (now or _utc_now()) >= self._valid_until:
+                return frozenset()
+            return self._owned
+
+    def renew(self, tag_names: Iterable[str], now: datetime | None = None) -> frozenset[str]:
+        current_time = now or _utc_now()
+        now_text = _format_time(current_time)
+        expires_at = _format_time(current_time + timedelta(seconds=self.lease_seconds))
+        tags = set(tag_names)
+
+        with db.transaction() as connection:
+            connection.execute(
+                "INSERT INTO worker_leases (worker_id, hostname, pid, started_at, renewed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET renewed_at = excluded.renewed_at, expires_at = excluded.expires_at",
+                [self.worker_id, socket.gethostname(), os.getpid(), self._started_at, now_text, expires_at],
+            )
+            # Workers that stopped renewing drop out of the ring; their process
+            # leases become claimable as they expire.
+            connection.execute("DELETE FROM worker_leases WHERE expires_at <= ?", [now_text])
+            connection.execute("DELETE FROM process_leases WHERE expires_at <= ?", [now_text])
+            members = [
+                row[0] for row in connection.execute("SELECT worker_id FROM worker_leases ORDER BY worker_id")
+            ]
+
+            ring = HashRing(members)
+            wanted = {tag_name for tag_name in tags if ring.owner(tag_name) == self.worker_id}
+            held = {
+                row[0]
+                for row in connection.execute(
+                    "SELECT tag_name FROM process_leases WHERE worker_id = ?", [self.worker_id]
+                )
+            }
+            # Handing moved processes back first lets their new owner claim
+            # them on its next renewal instead of waiting for expiry.
+            connection.executemany(
+                "DELETE FROM process_leases WHERE tag_name = ? AND worker_id = ?",
+                [(tag_name, self.worker_id) for tag_name in held - wanted],
+            )
+            connection.executemany(
+                _CLAIM_LEASE, [(tag_name, self.worker_id, expires_at, now_text) for tag_name in wanted]
+            )
+            owned = frozenset(
+                row[0]
+                for row in connection.execute(
+                    "SELECT tag_name FROM process_leases WHERE worker_id = ?", [self.worker_id]
+                )
+            )
+
+        with self._lock:
+            if owned != self._owned:
+                self.version += 1
+            self._owned = owned
+            self._valid_until = current_time + timedelta(seconds=self.lease_seconds)
+            self.members = members
+        return owned
+
+    def release(self) -> None:
+        with db.transaction() as connection:
+            connection.execute("DELETE FROM process_leases WHERE worker_id = ?", [self.worker_id])
+            connection.execute("DELETE FROM worker_leases WHERE worker_id = ?", [self.worker_id])
+        with self._lock:
+            if self._owned:
+                self.version += 1
+            self._owned = frozenset()
+            self._valid_until = datetime.min
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._renew_quietly()
+        self._thread = threading.Thread(target=self._run, name="monitoring-coordinator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.release()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.renew_seconds):
+            self._renew_quietly()
+
+    def _renew_quietly(self) -> None:
+        try:
+            owned = self.renew(process_service.list_monitored_tags())
+        except Exception:  # noqa: BLE001
+            logger.exception("Renewing worker %s leases failed", self.worker_id)
+            return
+        logger.debug("Worker %s owns %s of the processes (%s workers)", self.worker_id, len(owned), len(self.members))
+
+
+def list_workers(now: datetime | None = None) -> list[dict]:
+    rows = db.query_all(
+        "SELECT w.worker_id, w.hostname, w.pid, w.started_at, w.renewed_at, w.expires_at, "
+        "COUNT(l.tag_name) AS leases "
+        "FROM worker_leases w LEFT JOIN process_leases l ON l.worker_id = w.worker_id "
+        "WHERE w.expires_at > ? GROUP BY w.worker_id ORDER BY w.worker_id",
+        [_format_time(now or _utc_now())],
+    )
+    return [dict(row) for row in rows]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _utc_now() -> datetime:
+    # Lease times are compared across hosts, so they are kept in UTC rather
+    # than each worker's local time, which differs by timezone and DST.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
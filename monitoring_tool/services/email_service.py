@@ -1,7 +1,26 @@
+from __future__ import annotations
+
+import json
+import logging
 import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
 from email.message import EmailMessage
 from typing import Iterable
 
+from monitoring_tool import config, db
+
+logger = logging.getLogger(__name__)
+
+# A claimed delivery is retried by another worker if it is not finished
+# within this window, e.g. because the process died mid-send.
+CLAIM_SECONDS = 600
+
+_worker_thread: threading.Thread | None = None
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+
 
 def send_failure_email(
     smtp_host: str,
@@ -11,11 +30,232 @@ def send_failure_email(
     subject: str,
     body: str,
 ) -> None:
+    message = _build_message(sender, list(recipients), subject, body)
+
+    with smtplib.SMTP(smtp_host, smtp_port) as smtp:
+        smtp.send_message(message)
+
+
+class SmtpConnection:
+    def __init__(self, host: str | None = None, port: int | None = None, timeout: float | None = None) -> None:
+        self.host = config.SMTP_HOST if host is None else host
+        self.port = config.SMTP_PORT if port is None else port
+        self.timeout = config.SMTP_TIMEOUT_SECONDS if timeout is None else timeout
+        self._smtp: smtplib.SMTP | None = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def send(self, message: EmailMessage) -> None:
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The relay dropped the kept-open connection; one fresh attempt.
+            self.close()
+            self._connect()
+            self._smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self._smtp is not None and time.monotonic() - self._last_used >= config.EMAIL_IDLE_SECONDS:
+            self.close()
+
+    def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _connect(self) -> None:
+        self._smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        self._last_used = time.monotonic()
+        self.connects += 1
+
+
+def queue_email(
+    recipients: Iterable[str],
+    subject: str,
+    body: str,
+    sender: str | None = None,
+    now: datetime | None = None,
+) -> int:
+    queued_at = _format_time(now or datetime.now())
+    with db.transaction() as connection:
+        cursor = connection.execute(
+            "INSERT INTO email_deliveries (sender, recipients, subject, body, created_at, next_attempt_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [sender or config.SMTP_SENDER, json.dumps(list(recipients)), subject, body, queued_at, queued_at],
+        )
+        delivery_id = cursor.lastrowid
+    _wake_event.set()
+    return delivery_id
+
+
+def deliver_pending(connection: SmtpConnection, now: datetime | None = None, limit: int | None = None) -> int:
+    current_time = now or datetime.now()
+    deliveries = _claim_due(current_time, config.EMAIL_BATCH_SIZE if limit is None else limit)
+    for index, delivery in enumerate(deliveries):
+        message = _build_message(
+            delivery["sender"], json.loads(delivery["recipients"]), delivery["subject"], delivery["body"]
+        )
+        try:
+            connection.send(message)
+        except Exception as exc:  # noqa: BLE001
+            if _is_connection_error(exc):
+                # The relay is unreachable; the rest of the batch would fail
+                # the same way, so it waits as long as this message without
+                # counting an attempt it never made.
+                connection.close()
+                next_attempt = _record_failure(delivery, exc, current_time)
+                _release(deliveries[index + 1:], next_attempt)
+                break
+            _record_failure(delivery, exc, current_time)
+            continue
+
+        db.execute(
+            "UPDATE email_deliveries SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL "
+            "WHERE id = ?",
+            [_format_time(datetime.now()), delivery["id"]],
+        )
+    return len(deliveries)
+
+
+def queue_depth() -> int:
+    rows = db.query_all("SELECT COUNT(*) AS total FROM email_deliveries WHERE status IN ('queued', 'sending')")
+    return rows[0]["total"]
+
+
+def list_deliveries(limit: int = 20) -> list[dict]:
+    rows = db.query_all(
+        "SELECT id, sender, recipients, subject, status, attempts, last_error, created_at, next_attempt_at, sent_at "
+        "FROM email_deliveries ORDER BY id DESC LIMIT ?",
+        [limit],
+    )
+    deliveries = []
+    for row in rows:
+        delivery = dict(row)
+        delivery["recipients"] = json.loads(delivery["recipients"])
+        deliveries.append(delivery)
+    return deliveries
+
+
+def start_email_worker() -> None:
+    global _worker_thread
+    if _worker_thread and _worker_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _worker_thread = threading.Thread(target=_run_email_worker, daemon=True)
+    _worker_thread.start()
+
+
+def stop_email_worker(timeout: float | None = None) -> None:
+    _stop_event.set()
+    _wake_event.set()
+    if _worker_thread and _worker_thread.is_alive():
+        _worker_thread.join(timeout)
+
+
+def _run_email_worker() -> None:
+    connection = SmtpConnection()
+    try:
+        while not _stop_event.is_set():
+            _wake_event.clear()
+            try:
+                processed = deliver_pending(connection)
+            except Exception:  # noqa: BLE001
+                logger.exception("Email delivery failed")
+                processed = 0
+            if processed >= config.EMAIL_BATCH_SIZE:
+                continue
+
+            connection.close_if_idle()
+            _wake_event.wait(_seconds_until_next_attempt())
+    finally:
+        connection.close()
+
+
+def _claim_due(current_time: datetime, limit: int) -> list[dict]:
+    now_text = _format_time(current_time)
+    with db.transaction() as connection:
+        rows = connection.execute(
+            "SELECT id, sender, recipients, subject, body, attempts FROM email_deliveries "
+            "WHERE status IN ('queued', 'sending') AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT ?",
+            [now_text, limit],
+        ).fetchall()
+        connection.executemany(
+            "UPDATE email_deliveries SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+            [(_format_time(current_time + timedelta(seconds=CLAIM_SECONDS)), row["id"]) for row in rows],
+        )
+    return [dict(row) for row in rows]
+
+
+def _release(deliveries: list[dict], next_attempt: datetime) -> None:
+    db.execute_many(
+        "UPDATE email_deliveries SET status = 'queued', next_attempt_at = ? WHERE id = ?",
+        [(_format_time(next_attempt), delivery["id"]) for delivery in deliveries],
+    )
+
+
+def _record_failure(delivery: dict, exc: Exception, current_time: datetime) -> datetime:
+    attempts = delivery["attempts"] + 1
+    if _is_permanent(exc) or attempts >= config.EMAIL_MAX_ATTEMPTS:
+        status, next_attempt = "failed", current_time
+    else:
+        delay = min(config.EMAIL_RETRY_MAX_SECONDS, config.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        status, next_attempt = "queued", current_time + timedelta(seconds=delay)
+
+    logger.warning("Email delivery %s attempt %s failed: %s", delivery["id"], attempts, exc)
+    db.execute(
+        "UPDATE email_deliveries SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+        [status, attempts, str(exc) or exc.__class__.__name__, _format_time(next_attempt), delivery["id"]],
+    )
+    return next_attempt
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    # SMTPException subclasses OSError, so replies about one message (such as
+    # refused recipients) are told apart from socket errors here.
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _is_permanent(exc: Exception) -> bool:
+    # 5xx replies will not succeed on retry.
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return (
+        isinstance(exc, smtplib.SMTPResponseException)
+        and not isinstance(exc, smtplib.SMTPConnectError)
+        and exc.smtp_code >= 500
+    )
+
+
+def _seconds_until_next_attempt() -> float:
+    rows = db.query_all(
+        "SELECT MIN(next_attempt_at) AS next_attempt_at FROM email_deliveries WHERE status IN ('queued', 'sending')"
+    )
+    next_attempt = rows[0]["next_attempt_at"] if rows else None
+    if next_attempt is None:
+        return config.EMAIL_IDLE_SECONDS
+    wait_seconds = (datetime.fromisoformat(next_attempt) - datetime.now()).total_seconds()
+    return max(0.5, min(config.EMAIL_IDLE_SECONDS, wait_seconds))
+
+
+def _build_message(sender: str, recipients: list[str], subject: str, body: str) -> EmailMessage:
     message = EmailMessage()
     message["From"] = sender
     message["To"] = ", ".join(recipients)
     message["Subject"] = subject
     message.set_content(body)
+    return message
 
-    with smtplib.SMTP(smtp_host, smtp_port) as smtp:
-        smtp.send_message(message)
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
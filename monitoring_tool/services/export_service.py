@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+from monitoring_tool.services import report_service
+
+EXPORT_FORMATS = ("csv", "ndjson")
+RUN_COLUMNS = ("id", "tag_name", "run_time", "status", "reasons", "uc4_status", "check_type")
+FATAL_EVENT_COLUMNS = ("id", "tag_name", "event_time", "description")
+
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_runs(
+    export_format: str,
+    tag_prefix: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> Iterator[str]:
+    rows = report_service.iter_runs(tag_prefix=tag_prefix, since=since, until=until)
+    if export_format == "ndjson":
+        rows = (dict(row, reasons=json.loads(row["reasons"] or "[]")) for row in rows)
+    return _serialize(rows, RUN_COLUMNS, export_format)
+
+
+def export_fatal_events(
+    export_format: str,
+    tag_prefix: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> Iterator[str]:
+    rows = report_service.iter_fatal_events(tag_prefix=tag_prefix, since=since, until=until)
+    return _serialize(rows, FATAL_EVENT_COLUMNS, export_format)
+
+
+def _serialize(rows: Iterable[dict], columns: tuple[str, ...], export_format: str) -> Iterator[str]:
+    if export_format == "csv":
+        return _to_csv(rows, columns)
+    if export_format == "ndjson":
+        return _to_ndjson(rows)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def _to_csv(rows: Iterable[dict], columns: tuple[str, ...], rows_per_chunk: int = 500) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if index % rows_per_chunk == 0:
+            yield _drain(buffer)
+    remaining = _drain(buffer)
+    if remaining:
+        yield remaining
+
+
+def _to_ndjson(rows: Iterable[dict], rows_per_chunk: int = 500) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row) + "\n")
+        if len(lines) == rows_per_chunk:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return value
@@ -1,41 +1,234 @@
-from dataclasses import dataclass
-from pathlib import Path
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from monitoring_tool import config
 
 
 SUCCESS_MARKER = "success.flag"
 FAILURE_MARKER = "failure.flag"
 UC4_MARKER = "uc4.flag"
+MARKERS = (SUCCESS_MARKER, FAILURE_MARKER, UC4_MARKER)
 
 
 @dataclass(frozen=True)
 class FileCheckResult:
     is_failed: bool
     reason: str | None
+    marker_mtime: float | None = None
+    exit_code: int | None = None
+    row_count: int | None = None
+
+
+@dataclass(frozen=True)
+class MarkerState:
+    mtime: float
+    size: int
+    inode: int
+
+
+@dataclass(frozen=True)
+class FolderSnapshot:
+    folder_path: str
+    exists: bool
+    markers: dict[str, MarkerState] = field(default_factory=dict)
+    scanned_at: float = 0.0
+
+    def has_marker(self, name: str) -> bool:
+        return name in self.markers
+
+
+@dataclass(frozen=True)
+class MarkerContent:
+    exit_code: int | None = None
+    row_count: int | None = None
+    values: dict[str, str] = field(default_factory=dict)
+
+
+EXIT_CODE_KEYS = ("exit_code", "exitcode", "return_code", "rc")
+ROW_COUNT_KEYS = ("row_count", "rowcount", "rows", "records")
+
+_snapshot_cache: dict[str, FolderSnapshot] = {}
+_scan_locks: dict[str, threading.Lock] = {}
+_cache_lock = threading.Lock()
+_content_cache: dict[str, tuple[MarkerState, MarkerContent]] = {}
+
+
+def scan_folder(folder_path: str) -> FolderSnapshot:
+    # One directory listing answers every marker question for the folder;
+    # only markers that are present are stat'ed for their mtime and size.
+    markers = {}
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.name in MARKERS:
+                    try:
+                        markers[entry.name] = _marker_state(entry.stat())
+                    except OSError:
+                        # Deleted since the listing, or unreadable: treat it as absent.
+                        continue
+                    if len(markers) == len(MARKERS):
+                        break
+    except (FileNotFoundError, NotADirectoryError):
+        return FolderSnapshot(folder_path, False, {}, time.monotonic())
+    except PermissionError:
+        # Listing is denied but the markers may still be reachable by name.
+        return _stat_markers(folder_path)
+
+    return FolderSnapshot(folder_path, True, markers, time.monotonic())
+
+
+def get_snapshot(folder_path: str, max_age: float | None = None) -> FolderSnapshot:
+    ttl = config.FOLDER_SCAN_TTL_SECONDS if max_age is None else max_age
+    snapshot = _snapshot_cache.get(folder_path)
+    if snapshot is not None and time.monotonic() - snapshot.scanned_at < ttl:
+        return snapshot
+
+    with _cache_lock:
+        scan_lock = _scan_locks.setdefault(folder_path, threading.Lock())
 
+    # Processes sharing a folder wait for one scan instead of each issuing their own.
+    with scan_lock:
+        snapshot = _snapshot_cache.get(folder_path)
+        if snapshot is not None and time.monotonic() - snapshot.scanned_at < ttl:
+            return snapshot
+        snapshot = scan_folder(folder_path)
+        _snapshot_cache[folder_path] = snapshot
+        return snapshot
 
-def evaluate_folder(folder_path: str) -> FileCheckResult:
-    folder = Path(folder_path)
-    if not folder.exists():
+
+def invalidate(folder_path: str | None = None) -> None:
+    with _cache_lock:
+        if folder_path is None:
+            _snapshot_cache.clear()
+            _scan_locks.clear()
+        else:
+            _snapshot_cache.pop(folder_path, None)
+
+
+def evaluate_folder(
+    folder_path: str,
+    max_age_hours: float | None = None,
+    fresh_after: datetime | None = None,
+    parse_content: bool = False,
+    now: datetime | None = None,
+) -> FileCheckResult:
+    snapshot = get_snapshot(folder_path)
+    if not snapshot.exists:
         return FileCheckResult(True, f"Folder missing: {folder_path}")
 
-    failure_file = folder / FAILURE_MARKER
-    if failure_file.exists():
-        return FileCheckResult(True, f"Failure marker found: {failure_file.name}")
+    if snapshot.has_marker(FAILURE_MARKER):
+        reason = f"Failure marker found: {FAILURE_MARKER}"
+        content = MarkerContent()
+        if parse_content:
+            content = read_marker_content(folder_path, FAILURE_MARKER, snapshot.markers[FAILURE_MARKER])
+            if content.exit_code is not None:
+                reason = f"{reason} (exit code {content.exit_code})"
+        return FileCheckResult(
+            True, reason, snapshot.markers[FAILURE_MARKER].mtime, content.exit_code, content.row_count
+        )
 
-    success_file = folder / SUCCESS_MARKER
-    if not success_file.exists():
-        return FileCheckResult(True, f"Missing success marker: {success_file.name}")
+    if not snapshot.has_marker(SUCCESS_MARKER):
+        return FileCheckResult(True, f"Missing success marker: {SUCCESS_MARKER}")
 
-    return FileCheckResult(False, None)
+    success = snapshot.markers[SUCCESS_MARKER]
+    modified = datetime.fromtimestamp(success.mtime)
+    current_time = now or datetime.now()
+    if max_age_hours is not None and current_time - modified > timedelta(hours=max_age_hours):
+        return FileCheckResult(
+            True,
+            f"Stale success marker: {SUCCESS_MARKER} last modified {_format_time(modified)}",
+            success.mtime,
+        )
+    if fresh_after is not None and modified < fresh_after:
+        return FileCheckResult(
+            True,
+            f"Stale success marker: {SUCCESS_MARKER} predates scheduled run at {_format_time(fresh_after)}",
+            success.mtime,
+        )
+
+    content = MarkerContent()
+    if parse_content:
+        content = read_marker_content(folder_path, SUCCESS_MARKER, success)
+        if content.exit_code not in (None, 0):
+            return FileCheckResult(
+                True,
+                f"Success marker reports exit code {content.exit_code}",
+                success.mtime,
+                content.exit_code,
+                content.row_count,
+            )
+
+    return FileCheckResult(False, None, success.mtime, content.exit_code, content.row_count)
 
 def evaluate_uc4_file(folder_path: str) -> FileCheckResult:
-    folder = Path(folder_path)
-    if not folder.exists():
+    snapshot = get_snapshot(folder_path)
+    if not snapshot.exists:
         return FileCheckResult(True, f"Folder missing: {folder_path}")
 
-    uc4_file = folder / UC4_MARKER
-    if not uc4_file.exists():
-        return FileCheckResult(True, f"Missing UC4 file: {uc4_file.name}")
+    if not snapshot.has_marker(UC4_MARKER):
+        return FileCheckResult(True, f"Missing UC4 file: {UC4_MARKER}")
 
     return FileCheckResult(False, None)
 
+
+def read_marker_content(folder_path: str, name: str, state: MarkerState) -> MarkerContent:
+    # Content is re-read only when the marker's mtime, size or inode changes.
+    path = os.path.join(folder_path, name)
+    cached = _content_cache.get(path)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+
+    try:
+        with open(path, "rb") as marker:
+            text = marker.read(config.MARKER_CONTENT_MAX_BYTES).decode("utf-8", errors="replace")
+    except OSError:
+        return MarkerContent()
+
+    content = parse_marker_content(text)
+    _content_cache[path] = (state, content)
+    return content
+
+
+def parse_marker_content(text: str) -> MarkerContent:
+    values = {}
+    for line in text.splitlines():
+        separator = "=" if "=" in line else ":"
+        key, found, value = line.partition(separator)
+        if found:
+            values[key.strip().lower()] = value.strip()
+
+    return MarkerContent(
+        exit_code=_first_int(values, EXIT_CODE_KEYS),
+        row_count=_first_int(values, ROW_COUNT_KEYS),
+        values=values,
+    )
+
+
+def _first_int(values: dict[str, str], keys: tuple[str, ...]) -> int | None:
+    for key in keys:
+        try:
+            return int(values[key])
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
+
+
+def _stat_markers(folder_path: str) -> FolderSnapshot:
+    markers = {}
+    for name in MARKERS:
+        try:
+            markers[name] = _marker_state(os.stat(os.path.join(folder_path, name)))
+        except OSError:
+            continue
+    return FolderSnapshot(folder_path, True, markers, time.monotonic())
+
+
+def _marker_state(stat: os.stat_result) -> MarkerState:
+    return MarkerState(stat.st_mtime, stat.st_size, stat.st_ino)
@@ -1,49 +1,465 @@
 from __future__ import annotations
 
+import heapq
+import itertools
+import logging
+import queue
+import random
 import threading
-from datetime import datetime
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator
 
-from monitoring_tool.services import filesystem_service, process_service, query_service, report_service
+from monitoring_tool import config, cron, metrics
+from monitoring_tool.services import (
+    coordinator_service,
+    filesystem_service,
+    process_service,
+    query_service,
+    report_service,
+    worker_service,
+)
+
+logger = logging.getLogger(__name__)
 
 _scheduler_thread: threading.Thread | None = None
 _stop_event = threading.Event()
 
+# When each tag's check query last ran, so the daily gate needs no query.
+_last_query_runs: dict[str, datetime | None] = {}
+# Incremental runs: the last outcome written per tag, and the newest
+# process_status run id already compared against it.
+_last_outcomes: dict[str, tuple] = {}
+_outcomes_run_id: int | None = None
+# Check pools by size, and the tags whose check is still running on one.
+_check_pools: dict[int, _CheckPool] = {}
+_in_flight: dict[str, Future] = {}
+_pool_lock = threading.Lock()
+
+
+class _CheckPool:
+    """A fixed set of daemon threads, so checks stuck on a dead mount never block exit."""
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, func, *args) -> Future:
+        future: Future = Future()
+        self._jobs.put((future, func, args))
+        if len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._work, name=f"monitoring-check-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return future
+
+    def _work(self) -> None:
+        while True:
+            future, func, args = self._jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args)
+            except BaseException as exc:  # noqa: BLE001
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+class CheckScheduler:
+    def __init__(self, default_interval_seconds: int, jitter_seconds: float | None = None) -> None:
+        self.default_interval_seconds = default_interval_seconds
+        self.jitter_seconds = config.SCHEDULER_JITTER_SECONDS if jitter_seconds is None else jitter_seconds
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._due: dict[str, datetime] = {}
+        self._processes: dict[str, dict] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def sync(self, processes: list[dict], now: datetime, last_runs: dict[str, datetime] | None = None) -> None:
+        current = {process["tag_name"]: process for process in processes}
+        for tag_name in set(self._processes) - set(current):
+            del self._processes[tag_name]
+            self._due.pop(tag_name, None)
 
-def start_scheduler(interval_seconds: int = 600) -> None:
+        for tag_name, process in current.items():
+            previous = self._processes.get(tag_name)
+            self._processes[tag_name] = process
+            if previous is None:
+                # Spread a fresh fleet over the jitter window instead of
+                # checking every folder in the same instant. A process taken
+                # over from another worker keeps its place in the interval.
+                due_at = now + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+                last_run = (last_runs or {}).get(tag_name)
+                if last_run is not None:
+                    due_at = max(due_at, self.next_run_time(process, last_run))
+                self._push(tag_name, due_at)
+            elif _schedule_key(previous) != _schedule_key(process):
+                self.reschedule(process, now)
+
+    def pop_due(self, now: datetime) -> list[dict]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, tag_name = heapq.heappop(self._heap)
+            if self._due.get(tag_name) != due_at:
+                continue
+            del self._due[tag_name]
+            due.append(self._processes[tag_name])
+        return due
+
+    def reschedule(self, process: dict, now: datetime) -> None:
+        if process["tag_name"] in self._processes:
+            self._push(process["tag_name"], self.next_run_time(process, now))
+
+    def next_run_time(self, process: dict, now: datetime) -> datetime:
+        schedule = (process.get("cron_schedule") or "").strip()
+        if schedule:
+            try:
+                return cron.parse(schedule).next_after(now) + timedelta(
+                    seconds=random.uniform(0, self.jitter_seconds)
+                )
+            except ValueError:
+                pass
+
+        interval = process.get("check_interval_seconds") or self.default_interval_seconds
+        interval = max(config.SCHEDULER_MIN_INTERVAL_SECONDS, int(interval))
+        jitter = random.uniform(0, min(self.jitter_seconds, interval * 0.1))
+        return now + timedelta(seconds=interval + jitter)
+
+    def seconds_until_next(self, now: datetime) -> float | None:
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    def _push(self, tag_name: str, due_at: datetime) -> None:
+        # Superseded heap entries are skipped lazily when popped.
+        self._due[tag_name] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._counter), tag_name))
+
+
+def start_scheduler(
+    interval_seconds: int | None = None,
+    coordinator: coordinator_service.Coordinator | None = None,
+) -> None:
     global _scheduler_thread
     if _scheduler_thread and _scheduler_thread.is_alive():
         return
 
+    if coordinator is None and config.SCHEDULER_COORDINATION:
+        coordinator = coordinator_service.Coordinator()
+    _stop_event.clear()
     _scheduler_thread = threading.Thread(
-        target=_run_scheduler, args=(interval_seconds,), daemon=True
+        target=run_scheduler, args=(interval_seconds, coordinator, "embedded"), daemon=True
     )
     _scheduler_thread.start()
 
 
-def _run_scheduler(interval_seconds: int) -> None:
+def stop_scheduler(timeout: float | None = None) -> None:
+    # Checks already running finish and are recorded before the loop exits.
+    _stop_event.set()
+    thread = _scheduler_thread
+    if thread and thread.is_alive() and thread is not threading.current_thread():
+        thread.join(timeout)
+
+
+def run_scheduler(
+    interval_seconds: int | None = None,
+    coordinator: coordinator_service.Coordinator | None = None,
+    role: str = "worker",
+) -> None:
+    interval = interval_seconds or config.SCHEDULER_DEFAULT_INTERVAL_SECONDS
+    metrics.SCHEDULER_INTERVAL_SECONDS.set(interval)
+    worker_id = coordinator.worker_id if coordinator else config.WORKER_ID or coordinator_service.default_worker_id()
+    heartbeat = worker_service.Heartbeat(worker_id, role)
+    try:
+        if coordinator is None:
+            _run_scheduler(interval, heartbeat=heartbeat)
+            return
+
+        coordinator.start()
+        try:
+            _run_scheduler(interval, coordinator, heartbeat)
+        finally:
+            coordinator.stop()
+    finally:
+        heartbeat.stopped()
+
+
+def _run_scheduler(
+    interval_seconds: int,
+    coordinator: coordinator_service.Coordinator | None = None,
+    heartbeat: worker_service.Heartbeat | None = None,
+) -> None:
+    scheduler = CheckScheduler(interval_seconds)
+    processes: list[dict] = []
+    synced_version = None
+    next_refresh = datetime.min
     while not _stop_event.is_set():
-        run_monitoring_cycle()
-        _stop_event.wait(interval_seconds)
+        now = datetime.now()
+        refresh = now >= next_refresh
+        try:
+            if refresh:
+                next_refresh = now + timedelta(seconds=config.SCHEDULER_REFRESH_SECONDS)
+                processes = process_service.list_processes()
+
+            if coordinator is None:
+                if refresh:
+                    scheduler.sync(processes, now)
+            elif refresh or coordinator.version != synced_version:
+                owned = coordinator.owned()
+                scheduler.sync(
+                    [process for process in processes if process["tag_name"] in owned],
+                    now,
+                    report_service.latest_run_times(),
+                )
+                synced_version = coordinator.version
+        except Exception:  # noqa: BLE001
+            # A failed refresh keeps the previous schedule until the next one.
+            logger.exception("Refreshing the check schedule failed")
+
+        due = scheduler.pop_due(now)
+        if due and coordinator is not None:
+            # Leases lost since the last sync are skipped, not dropped, so the
+            # process is picked up again if this worker gets it back.
+            owned = coordinator.owned()
+            for process in due:
+                if process["tag_name"] not in owned:
+                    scheduler.reschedule(process, now)
+            due = [process for process in due if process["tag_name"] in owned]
+        if due:
+            started = time.perf_counter()
+            try:
+                run_checks(due, now)
+            except Exception:  # noqa: BLE001
+                # The processes stay scheduled and are tried again next interval.
+                logger.exception("Scheduled checks failed for %s process(es)", len(due))
+            finished = datetime.now()
+            for process in due:
+                scheduler.reschedule(process, finished)
+            if heartbeat is not None:
+                heartbeat.cycle(finished, time.perf_counter() - started, len(due))
+
+        now = datetime.now()
+        if heartbeat is not None:
+            heartbeat.beat(len(scheduler), now)
+        wait_seconds = (next_refresh - now).total_seconds()
+        next_due = scheduler.seconds_until_next(now)
+        if next_due is not None:
+            wait_seconds = min(wait_seconds, next_due)
+        if coordinator is not None:
+            wait_seconds = min(wait_seconds, coordinator.renew_seconds)
+        if heartbeat is not None:
+            wait_seconds = min(wait_seconds, config.WORKER_HEARTBEAT_SECONDS)
+        _stop_event.wait(max(0.0, wait_seconds))
+
+
+def run_monitoring_cycle(
+    now: datetime | None = None,
+    force_run: bool = False,
+    max_workers: int | None = None,
+    check_timeout: float | None = None,
+    batch_writes: bool = True,
+) -> None:
+    with _timed_cycle("cycle"):
+        if batch_writes:
+            with report_service.batch_runs():
+                _run_cycle(now, force_run, max_workers, check_timeout)
+            return
+
+        _run_cycle(now, force_run, max_workers, check_timeout)
+
+
+def _run_cycle(
+    now: datetime | None,
+    force_run: bool,
+    max_workers: int | None,
+    check_timeout: float | None,
+) -> None:
+    current_time = now or datetime.now()
+    _run_checks(process_service.list_processes(), current_time, force_run, max_workers, check_timeout)
+
+
+def run_checks(processes: list[dict], now: datetime | None = None) -> None:
+    with _timed_cycle("scheduler"), report_service.batch_runs():
+        _run_checks(processes, now or datetime.now(), False, None, None)
+
+
+@contextmanager
+def _timed_cycle(source: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.CYCLE_SECONDS.observe(elapsed, source=source)
+        metrics.CYCLE_LAST_SECONDS.set(elapsed, source=source)
+
+
+def _run_checks(
+    processes: list[dict],
+    current_time: datetime,
+    force_run: bool,
+    max_workers: int | None,
+    check_timeout: float | None,
+) -> None:
+    filesystem_service.invalidate()
+    if config.INCREMENTAL_RUNS:
+        _refresh_outcomes()
+    jobs = [(process, _due_check_query(process, current_time, force_run)) for process in processes]
+    with query_service.cycle():
+        _dispatch_checks(jobs, current_time, max_workers, check_timeout)
 
 
-def run_monitoring_cycle(now: datetime | None = None, force_run: bool = False) -> None:
+def _dispatch_checks(
+    jobs: list[tuple[dict, str | None]],
+    current_time: datetime,
+    max_workers: int | None,
+    check_timeout: float | None,
+) -> None:
+    workers = config.CHECK_MAX_WORKERS if max_workers is None else max_workers
+    if max_workers is None and config.SQLSERVER_CONNECTION_STRING:
+        # Query checks mostly wait on the network, so let as many run at once
+        # as the SQL Server pool can serve.
+        query_jobs = sum(1 for _, check_query in jobs if check_query)
+        workers = max(workers, min(config.SQLSERVER_POOL_SIZE, query_jobs))
+    if workers <= 1:
+        for process, check_query in jobs:
+            try:
+                run = _evaluate_process(process, current_time, check_query)
+            except Exception as exc:  # noqa: BLE001
+                run = _failed_run(process, current_time, f"Check failed: {exc}")
+            _record_run(run)
+        return
+
+    timeout = config.CHECK_TIMEOUT_SECONDS if check_timeout is None else check_timeout
+    # Even a single check goes through the pool so the timeout applies.
+    for run in _evaluate_concurrently(jobs, current_time, workers, timeout):
+        _record_run(run)
+
+
+def check_process(process: dict, now: datetime | None = None) -> None:
     current_time = now or datetime.now()
-    processes = process_service.list_processes()
-    for process in processes:
-        tag_name = process["tag_name"]
-        scheduled_time = (process.get("scheduled_time") or "").strip()
-        check_query = (process.get("check_query") or "").strip()
+    _run_filesystem_check(process, current_time, _due_check_query(process, current_time, False))
+
+
+def _due_check_query(process: dict, current_time: datetime, force_run: bool) -> str | None:
+    scheduled_time = (process.get("scheduled_time") or "").strip()
+    check_query = (process.get("check_query") or "").strip()
+
+    should_run_query = bool(check_query)
+    if should_run_query and scheduled_time and not force_run:
+        should_run_query = _should_run_scheduled_check(process["tag_name"], scheduled_time, current_time)
+
+    return check_query if should_run_query else None
+
+
+def _evaluate_concurrently(
+    jobs: list[tuple[dict, str | None]],
+    current_time: datetime,
+    max_workers: int,
+    timeout: float,
+) -> Iterator[dict]:
+    futures: dict[Future, dict] = {}
+    deadline = time.monotonic() + timeout
+    for process, check_query in jobs:
+        future = _submit_check(max_workers, process, current_time, check_query)
+        if future is None:
+            # Resubmitting a hung check would only tie up another thread.
+            yield _failed_run(process, current_time, "Check still running from an earlier cycle")
+        else:
+            futures[future] = process
 
-        should_run_query = bool(check_query)
-        if should_run_query and scheduled_time and not force_run:
-            should_run_query = _should_run_scheduled_check(tag_name, scheduled_time, current_time)
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                yield future.result()
+            except Exception as exc:  # noqa: BLE001
+                yield _failed_run(futures[future], current_time, f"Check failed: {exc}")
+        if pending and time.monotonic() >= deadline:
+            # Queued checks are dropped; running ones stay in flight until they return.
+            for future in pending:
+                future.cancel()
+                metrics.CHECKS_TIMED_OUT.inc()
+                yield _failed_run(futures[future], current_time, f"Check timed out after {timeout:g} seconds")
+            return
 
-        _run_filesystem_check(process, current_time, check_query if should_run_query else None)
+
+def _submit_check(max_workers: int, process: dict, current_time: datetime, check_query: str | None) -> Future | None:
+    tag_name = process["tag_name"]
+    with _pool_lock:
+        if tag_name in _in_flight:
+            return None
+        pool = _check_pools.get(max_workers)
+        if pool is None:
+            pool = _check_pools[max_workers] = _CheckPool(max_workers)
+        future = pool.submit(_evaluate_process, process, current_time, check_query)
+        _in_flight[tag_name] = future
+    future.add_done_callback(lambda done: _finish_check(tag_name, done))
+    return future
+
+
+def _finish_check(tag_name: str, future: Future) -> None:
+    with _pool_lock:
+        if _in_flight.get(tag_name) is future:
+            del _in_flight[tag_name]
 
 
 def _run_filesystem_check(process: dict, current_time: datetime, check_query: str | None = None) -> None:
+    _record_run(_evaluate_process(process, current_time, check_query))
+
+
+def _record_run(run: dict) -> None:
+    marker_mtime = run.pop("marker_mtime", None)
+    if not config.INCREMENTAL_RUNS:
+        metrics.RUNS_RECORDED.inc(result="written")
+        report_service.record_run(**run)
+        return
+
+    tag_name = run["tag_name"]
+    outcome = (run["status"], tuple(run["reasons"]), run["uc4_status"], marker_mtime)
+    if _last_outcomes.get(tag_name) == outcome:
+        metrics.RUNS_RECORDED.inc(result="verified")
+        report_service.record_verified(tag_name, run["run_time"])
+        return
+
+    def remember() -> None:
+        _last_outcomes[tag_name] = outcome
+
+    # Transitions, and the first check of a tag by this process, are always
+    # written so the history keeps every change. The outcome is remembered
+    # only once committed, so a failed write is retried by the next check.
+    metrics.RUNS_RECORDED.inc(result="written")
+    report_service.record_run(**run, on_commit=remember)
+
+
+def _refresh_outcomes() -> None:
+    # Runs written since the last batch by anything else (another worker, a
+    # manual check in the web app) replace what is remembered for their tags.
+    global _outcomes_run_id
+    if _outcomes_run_id is None:
+        _outcomes_run_id = report_service.latest_run_id()
+        return
+
+    for run in report_service.list_latest_runs_after(_outcomes_run_id):
+        _outcomes_run_id = max(_outcomes_run_id, run["id"])
+        remembered = _last_outcomes.get(run["tag_name"])
+        if remembered is not None and remembered[:3] != (run["status"], tuple(run["reasons"]), run["uc4_status"]):
+            del _last_outcomes[run["tag_name"]]
+
+
+def _evaluate_process(process: dict, current_time: datetime, check_query: str | None = None) -> dict:
     tag_name = process["tag_name"]
-    file_check = filesystem_service.evaluate_folder(process["folder_path"])
+    with metrics.CHECK_SECONDS.time(check_type="filesystem"):
+        file_check = filesystem_service.evaluate_folder(process["folder_path"], **_marker_rules(process, current_time))
     uc4_check_enabled = bool(process.get("check_uc4_file"))
     uc4_check = None
     uc4_folder_missing = (
@@ -52,7 +468,8 @@ def _run_filesystem_check(process: dict, current_time: datetime, check_query: st
         and file_check.reason.startswith("Folder missing:")
     )
     if uc4_check_enabled and not uc4_folder_missing:
-        uc4_check = filesystem_service.evaluate_uc4_file(process["folder_path"])
+        with metrics.CHECK_SECONDS.time(check_type="uc4"):
+            uc4_check = filesystem_service.evaluate_uc4_file(process["folder_path"])
 
     reasons = []
     if file_check.is_failed:
@@ -61,7 +478,9 @@ def _run_filesystem_check(process: dict, current_time: datetime, check_query: st
         reasons.append(uc4_check.reason or "UC4 file check failed")
 
     if check_query:
-        query_result = query_service.evaluate_query(check_query)
+        _last_query_runs[tag_name] = current_time
+        with metrics.CHECK_SECONDS.time(check_type="query"):
+            query_result = query_service.evaluate_query(check_query, process.get("check_assertion"))
         if query_result.is_failed:
             reasons.append(query_result.reason or "Database query check failed")
 
@@ -75,14 +494,52 @@ def _run_filesystem_check(process: dict, current_time: datetime, check_query: st
         uc4_status = "OK"
 
     status = "Failed" if reasons else "Success"
-    report_service.record_run(
-        tag_name=tag_name,
-        status=status,
-        reasons=reasons,
-        uc4_status=uc4_status,
-        check_type="filesystem",
-        run_time=_format_run_time(current_time),
-    )
+    return {
+        "tag_name": tag_name,
+        "status": status,
+        "reasons": reasons,
+        "uc4_status": uc4_status,
+        "check_type": "filesystem",
+        "run_time": _format_run_time(current_time),
+        "marker_mtime": file_check.marker_mtime,
+    }
+
+
+def _marker_rules(process: dict, current_time: datetime) -> dict:
+    max_age_hours = process.get("marker_max_age_hours")
+    fresh_after = None
+    if process.get("marker_fresh_since_schedule"):
+        fresh_after = _last_scheduled_time((process.get("scheduled_time") or "").strip(), current_time)
+
+    return {
+        "max_age_hours": float(max_age_hours) if max_age_hours is not None else None,
+        "fresh_after": fresh_after,
+        "parse_content": bool(process.get("parse_marker_content")),
+        "now": current_time,
+    }
+
+
+def _last_scheduled_time(scheduled_time: str, now: datetime) -> datetime | None:
+    try:
+        scheduled = datetime.strptime(scheduled_time, "%H:%M").time()
+    except ValueError:
+        return None
+
+    occurrence = datetime.combine(now.date(), scheduled)
+    if occurrence > now:
+        occurrence -= timedelta(days=1)
+    return occurrence
+
+
+def _failed_run(process: dict, current_time: datetime, reason: str) -> dict:
+    return {
+        "tag_name": process["tag_name"],
+        "status": "Failed",
+        "reasons": [reason],
+        "uc4_status": "Not checked" if process.get("check_uc4_file") else "Not enabled",
+        "check_type": "filesystem",
+        "run_time": _format_run_time(current_time),
+    }
 
 
 def _should_run_scheduled_check(tag_name: str, scheduled_time: str, now: datetime) -> bool:
@@ -94,14 +551,18 @@ def _should_run_scheduled_check(tag_name: str, scheduled_time: str, now: datetim
     if now.time() < scheduled:
         return False
 
-    latest_run = report_service.get_latest_run(tag_name)
-    if latest_run and latest_run.get("run_time"):
-        last_run = datetime.fromisoformat(latest_run["run_time"])
-        if last_run.date() == now.date():
-            return False
+    if tag_name not in _last_query_runs:
+        # Seeded once from history; afterwards the scheduler's own record is used.
+        latest_run = report_service.get_latest_run(tag_name)
+        run_time = latest_run.get("run_time") if latest_run else None
+        _last_query_runs[tag_name] = datetime.fromisoformat(run_time) if run_time else None
+
+    last_run = _last_query_runs[tag_name]
+    return last_run is None or last_run < datetime.combine(now.date(), scheduled)
 
-    return True
 
+def _schedule_key(process: dict) -> tuple:
+    return (process.get("check_interval_seconds"), (process.get("cron_schedule") or "").strip())
 
 
 def _format_run_time(current_time: datetime) -> str:
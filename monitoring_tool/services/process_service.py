@@ -3,7 +3,9 @@ from monitoring_tool import db
 
 def list_processes() -> list[dict]:
     rows = db.query_all(
-        "SELECT id, tag_name, folder_path, check_uc4_file, scheduled_time, check_query "
+        "SELECT id, tag_name, folder_path, check_uc4_file, scheduled_time, check_query, "
+        "marker_max_age_hours, marker_fresh_since_schedule, parse_marker_content, "
+        "check_interval_seconds, cron_schedule, check_assertion "
         "FROM processes WHERE folder_path != '' ORDER BY tag_name"
     )
 
@@ -11,6 +13,11 @@ def list_processes() -> list[dict]:
 
 
     
+def list_monitored_tags() -> list[str]:
+    rows = db.query_all("SELECT tag_name FROM processes WHERE folder_path != ''")
+    return [row["tag_name"] for row in rows]
+
+
 def list_tags() -> list[str]:
     rows = db.query_all("SELECT tag_name FROM processes ORDER BY tag_name")
     return [row["tag_name"] for row in rows]
@@ -21,11 +28,14 @@ def add_tag(tag_name: str) -> None:
         "INSERT INTO processes (tag_name, folder_path, check_uc4_file) VALUES (?, '', 0)",
         [tag_name],
     )
+    db.bump_generation()
 
 
 def list_folder_configs() -> list[dict]:
     rows = db.query_all(
-        "SELECT tag_name, folder_path, check_uc4_file, scheduled_time, check_query "
+        "SELECT tag_name, folder_path, check_uc4_file, scheduled_time, check_query, "
+        "marker_max_age_hours, marker_fresh_since_schedule, parse_marker_content, "
+        "check_interval_seconds, cron_schedule, check_assertion "
         "FROM processes WHERE folder_path != '' ORDER BY tag_name"
     )
     return [dict(row) for row in rows]
@@ -37,20 +47,44 @@ def set_folder(
     check_uc4_file: bool,
     scheduled_time: str | None,
     check_query: str | None,
+    marker_max_age_hours: float | None = None,
+    marker_fresh_since_schedule: bool = False,
+    parse_marker_content: bool = False,
+    check_interval_seconds: int | None = None,
+    cron_schedule: str | None = None,
+    check_assertion: str | None = None,
 ) -> None:
     db.execute(
-        "UPDATE processes SET folder_path = ?, check_uc4_file = ?, scheduled_time = ?, check_query = ? "
+        "UPDATE processes SET folder_path = ?, check_uc4_file = ?, scheduled_time = ?, check_query = ?, "
+        "marker_max_age_hours = ?, marker_fresh_since_schedule = ?, parse_marker_content = ?, "
+        "check_interval_seconds = ?, cron_schedule = ?, check_assertion = ? "
         "WHERE tag_name = ?",
-        [folder_path, int(check_uc4_file), scheduled_time, check_query, tag_name],
+        [
+            folder_path,
+            int(check_uc4_file),
+            scheduled_time,
+            check_query,
+            marker_max_age_hours,
+            int(marker_fresh_since_schedule),
+            int(parse_marker_content),
+            check_interval_seconds,
+            cron_schedule,
+            check_assertion,
+            tag_name,
+        ],
     )
+    db.bump_generation()
 
 
 def clear_folder(tag_name: str) -> None:
     db.execute(
-        "UPDATE processes SET folder_path = '', check_uc4_file = 0, scheduled_time = NULL, check_query = NULL "
+        "UPDATE processes SET folder_path = '', check_uc4_file = 0, scheduled_time = NULL, check_query = NULL, "
+        "marker_max_age_hours = NULL, marker_fresh_since_schedule = 0, parse_marker_content = 0, "
+        "check_interval_seconds = NULL, cron_schedule = NULL, check_assertion = NULL "
         "WHERE tag_name = ?",
         [tag_name],
     )
+    db.bump_generation()
 
 def list_recipients() -> list[str]:
     rows = db.query_all("SELECT email FROM notification_recipients ORDER BY email")
@@ -66,4 +100,5 @@ def remove_recipient(email: str) -> None:
     
 def remove_tag(tag_name: str) -> None:
     db.execute("DELETE FROM processes WHERE tag_name = ?", [tag_name])
+    db.bump_generation()
 
@@ -1,6 +1,13 @@
+import operator
+import re
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
 
-from monitoring_tool import config, db
+from monitoring_tool import config, db, metrics
 
 
 @dataclass(frozen=True)
@@ -9,7 +16,264 @@ class QueryCheckResult:
     reason: str | None
 
 
-def evaluate_query(query: str) -> QueryCheckResult:
+@dataclass(frozen=True)
+class QueryAssertion:
+    subject: str
+    operator: str
+    threshold: float
+
+    def __str__(self) -> str:
+        if self == NO_ROWS:
+            return "no rows"
+        return f"{self.subject} {self.operator} {self.threshold:g}"
+
+    def rows_needed(self) -> int:
+        # Fetching stops once the count can no longer change the outcome;
+        # value checks only look at the first row.
+        if self.subject == "value":
+            return 1
+        if self.operator in (">=", "<"):
+            return int(self.threshold)
+        return int(self.threshold) + 1
+
+    def passes(self, actual: float) -> bool:
+        return _OPERATORS[self.operator](actual, self.threshold)
+
+
+_OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+_ASSERTION_PATTERN = re.compile(r"^(rows|value)\s*(==|=|!=|>=|<=|>|<)\s*(-?\d+(?:\.\d+)?)$")
+# String literals, quoted identifiers and line comments are kept as written
+# when whitespace is collapsed for the result cache key.
+_QUERY_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|--[^\n]*\n?|\s+")
+
+DEFAULT_ASSERTION = QueryAssertion("rows", ">=", 1)
+NO_ROWS = QueryAssertion("rows", "==", 0)
+# Rows are pulled from the cursor in chunks of at most this size.
+FETCH_CHUNK_SIZE = 500
+
+
+def parse_assertion(text: str | None) -> QueryAssertion:
+    normalized = " ".join((text or "").lower().split())
+    if not normalized:
+        return DEFAULT_ASSERTION
+    if normalized in ("no rows", "none"):
+        return NO_ROWS
+
+    match = _ASSERTION_PATTERN.match(normalized)
+    if match is None:
+        raise ValueError(
+            "Query assertion must look like 'rows >= 10', 'value < 5' or 'no rows'"
+        )
+    subject, op, number = match.groups()
+    threshold = float(number)
+    if subject == "rows" and (threshold < 0 or not threshold.is_integer()):
+        raise ValueError("Row count assertions need a whole, non-negative number")
+    return QueryAssertion(subject, op, threshold)
+
+
+class QueryPoolExhausted(RuntimeError):
+    pass
+
+
+class SqlServerPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int,
+        health_check_seconds: float | None = None,
+        acquire_timeout: float | None = None,
+    ) -> None:
+        self._connect = connect
+        self.max_size = max_size
+        self.health_check_seconds = (
+            config.SQLSERVER_POOL_HEALTH_CHECK_SECONDS if health_check_seconds is None else health_check_seconds
+        )
+        self.acquire_timeout = config.SQLSERVER_QUERY_TIMEOUT_SECONDS if acquire_timeout is None else acquire_timeout
+        self._condition = threading.Condition()
+        # Idle connections with the monotonic time they were returned.
+        self._idle: list[tuple[Any, float]] = []
+        self._size = 0
+        self._closed = False
+        self._created = 0
+        self._acquired = 0
+        self._reused = 0
+        self._discarded = 0
+        self._waits = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        connection = self._acquire()
+        healthy = True
+        try:
+            yield connection
+        except Exception:
+            # A failed query may just be bad SQL; only drop the connection if
+            # the server no longer answers on it.
+            healthy = _ping(connection)
+            raise
+        finally:
+            self._release(connection, healthy)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                "created": self._created,
+                "acquired": self._acquired,
+                "reused": self._reused,
+                "discarded": self._discarded,
+                "waits": self._waits,
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            _close_quietly(connection)
+
+    def _acquire(self) -> Any:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QueryPoolExhausted(f"SQL Server pool exhausted ({self.max_size} connections)")
+                    self._waits += 1
+                    self._condition.wait(remaining)
+
+                if not self._idle:
+                    self._size += 1
+                    break
+                connection, returned_at = self._idle.pop()
+
+            # Connections that sat idle may have been dropped by the server or
+            # a firewall; check them before handing them out.
+            if time.monotonic() - returned_at < self.health_check_seconds or _ping(connection):
+                with self._condition:
+                    self._acquired += 1
+                    self._reused += 1
+                return connection
+            self._discard(connection)
+
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._acquired += 1
+            self._created += 1
+        return connection
+
+    def _release(self, connection: Any, healthy: bool) -> None:
+        if not healthy:
+            self._discard(connection)
+            return
+
+        with self._condition:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+            self._size -= 1
+        _close_quietly(connection)
+
+    def _discard(self, connection: Any) -> None:
+        with self._condition:
+            self._size -= 1
+            self._discarded += 1
+            self._condition.notify()
+        _close_quietly(connection)
+
+
+_result_cache: dict[tuple[str, str, str], tuple[float, QueryCheckResult]] = {}
+_query_locks: dict[tuple[str, str, str], threading.Lock] = {}
+_cache_lock = threading.Lock()
+_cache_counters = {"hits": 0, "misses": 0}
+_cycle_started_at = 0.0
+_active_cycles = 0
+
+_pool: SqlServerPool | None = None
+_pool_key: str | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SqlServerPool:
+    global _pool, _pool_key
+    connection_string = config.SQLSERVER_CONNECTION_STRING
+    with _pool_lock:
+        if _pool is None or _pool_key != connection_string:
+            if _pool is not None:
+                _pool.close()
+            _pool = SqlServerPool(_connect_sqlserver, config.SQLSERVER_POOL_SIZE)
+            _pool_key = connection_string
+        return _pool
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+def close_pool() -> None:
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+        _pool_key = None
+
+
+@contextmanager
+def cycle() -> Iterator[None]:
+    # Identical queries inside a cycle share one execution; results from
+    # before the cycle are only reused while inside the TTL.
+    global _cycle_started_at, _active_cycles
+    with _cache_lock:
+        _cycle_started_at = time.monotonic()
+        _active_cycles += 1
+    try:
+        yield
+    finally:
+        with _cache_lock:
+            _active_cycles -= 1
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        return {"entries": len(_result_cache), **_cache_counters}
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _result_cache.clear()
+        _query_locks.clear()
+        for name in _cache_counters:
+            _cache_counters[name] = 0
+
+
+def _cache_query_text(query: str) -> str:
+    return _QUERY_TOKEN_PATTERN.sub(lambda match: " " if match.group().isspace() else match.group(), query)
+
+
+def evaluate_query(query: str, assertion: str | None = None) -> QueryCheckResult:
     normalized = query.strip()
     if not normalized:
         return QueryCheckResult(True, "Missing query for scheduled check")
@@ -18,30 +282,149 @@ def evaluate_query(query: str) -> QueryCheckResult:
         return QueryCheckResult(True, "Only SELECT queries are supported")
 
     try:
-        rows = _run_query(normalized)
+        expected = parse_assertion(assertion)
+    except ValueError as exc:
+        return QueryCheckResult(True, f"Invalid query assertion: {exc}")
+
+    key = (
+        config.SQLSERVER_CONNECTION_STRING or str(config.DB_PATH),
+        _cache_query_text(normalized),
+        str(expected),
+    )
+    result = _cached_result(key)
+    if result is not None:
+        return result
+
+    with _cache_lock:
+        query_lock = _query_locks.setdefault(key, threading.Lock())
+
+    # Processes sharing a query wait for one execution instead of each
+    # sending their own.
+    with query_lock:
+        result = _cached_result(key)
+        if result is not None:
+            return result
+
+        with _cache_lock:
+            _cache_counters["misses"] += 1
+        metrics.QUERY_CACHE_REQUESTS.inc(result="miss")
+        result = _execute_check(normalized, expected)
+        with _cache_lock:
+            _result_cache[key] = (time.monotonic(), result)
+        return result
+
+
+def _cached_result(key: tuple[str, str, str]) -> QueryCheckResult | None:
+    with _cache_lock:
+        cached = _result_cache.get(key)
+        if cached is None:
+            return None
+        cached_at, result = cached
+        in_cycle = _active_cycles > 0 and cached_at >= _cycle_started_at
+        if not in_cycle and time.monotonic() - cached_at >= config.QUERY_CACHE_TTL_SECONDS:
+            return None
+        _cache_counters["hits"] += 1
+    metrics.QUERY_CACHE_REQUESTS.inc(result="hit")
+    return result
+
+
+def _execute_check(query: str, assertion: QueryAssertion) -> QueryCheckResult:
+    chunk_size = max(1, min(FETCH_CHUNK_SIZE, assertion.rows_needed()))
+    rows = None
+    try:
+        rows = iter(_run_query(query, chunk_size))
+        return _check_rows(rows, assertion)
     except Exception as exc:  # noqa: BLE001
         return QueryCheckResult(True, f"Query failed: {exc}")
+    finally:
+        # Stop reading as soon as the assertion is decided; the rest of the
+        # result set is never fetched.
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
 
-    if not rows:
+
+def _check_rows(rows: Iterator, assertion: QueryAssertion) -> QueryCheckResult:
+    if assertion.subject == "value":
+        first = next(rows, None)
+        if first is None:
+            return QueryCheckResult(True, "Query returned no rows")
+        value = _first_column(first)
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return QueryCheckResult(True, f"Query value {value!r} is not a number")
+        if assertion.passes(number):
+            return QueryCheckResult(False, None)
+        return QueryCheckResult(True, f"Query value {value} failed assertion {assertion}")
+
+    limit = assertion.rows_needed()
+    count = sum(1 for _ in islice(rows, limit))
+    if assertion.passes(count):
+        return QueryCheckResult(False, None)
+    if count == 0 and assertion == DEFAULT_ASSERTION:
         return QueryCheckResult(True, "Query returned no rows")
+    if assertion == NO_ROWS:
+        return QueryCheckResult(True, "Query returned rows, expected none")
+    if count >= limit:
+        return QueryCheckResult(True, f"Query returned at least {limit} rows, expected {assertion}")
+    return QueryCheckResult(True, f"Query returned {count} rows, expected {assertion}")
 
-    return QueryCheckResult(False, None)
 
+def _first_column(row: Any) -> Any:
+    if isinstance(row, dict):
+        return next(iter(row.values()), None)
+    return row[0]
 
-def _run_query(query: str):
+
+def _run_query(query: str, chunk_size: int) -> Iterable:
     if config.SQLSERVER_CONNECTION_STRING:
-        return _query_sqlserver(query)
+        return _query_sqlserver(query, chunk_size)
+
+    return db.iter_query(query, chunk_size=chunk_size)
 
-    return db.query_all(query)
+
+def _query_sqlserver(query: str, chunk_size: int) -> Iterator:
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
 
-def _query_sqlserver(query: str):
+def _connect_sqlserver():
     import pyodbc
 
-    with pyodbc.connect(
+    connection = pyodbc.connect(
         config.SQLSERVER_CONNECTION_STRING,
         timeout=config.SQLSERVER_QUERY_TIMEOUT_SECONDS,
-    ) as connection:
+    )
+    # connect()'s timeout only covers the login; this one applies to each query.
+    connection.timeout = config.SQLSERVER_QUERY_TIMEOUT_SECONDS
+    return connection
+
+
+def _ping(connection: Any) -> bool:
+    try:
         cursor = connection.cursor()
-        cursor.execute(query)
-        return cursor.fetchmany(1)
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception:  # noqa: BLE001
+        return False
+    return True
+
+
+def _close_quietly(connection: Any) -> None:
+    try:
+        connection.close()
+    except Exception:  # noqa: BLE001
+        pass
@@ -1,8 +1,45 @@
 from __future__ import annotations
 
 import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator
 
-from monitoring_tool import db
+from monitoring_tool import config, db
+from monitoring_tool.services import alert_service, process_service
+
+_INSERT_RUN = (
+    "INSERT INTO process_runs (tag_name, run_time, status, reasons, uc4_status, check_type) "
+    "VALUES (?, COALESCE(?, datetime('now')), ?, ?, ?, ?)"
+)
+
+# Copies the newest run per tag written after the given id into process_status.
+# "+tag_name" keeps SQLite on the rowid range of the new runs; without
+# statistics it would otherwise scan the whole (tag_name, id) index.
+_UPSERT_STATUS = (
+    "INSERT INTO process_status (tag_name, run_id, run_time, status, reasons, uc4_status, check_type, verified_at) "
+    "SELECT tag_name, id, run_time, status, reasons, uc4_status, check_type, run_time FROM process_runs "
+    "WHERE id IN (SELECT MAX(id) FROM process_runs WHERE id > ? GROUP BY +tag_name) "
+    "ON CONFLICT (tag_name) DO UPDATE SET "
+    "run_id = excluded.run_id, run_time = excluded.run_time, status = excluded.status, "
+    "reasons = excluded.reasons, uc4_status = excluded.uc4_status, check_type = excluded.check_type, "
+    "verified_at = excluded.verified_at"
+)
+
+# A check that repeated the latest run only moves its verified time.
+_UPDATE_VERIFIED = (
+    "UPDATE process_status SET verified_at = COALESCE(?, datetime('now')) "
+    "WHERE tag_name = ? AND COALESCE(verified_at, '') < COALESCE(?, datetime('now'))"
+)
+
+RUN_COLUMNS = ("id", "tag_name", "run_time", "status", "reasons", "uc4_status", "check_type")
+FATAL_EVENT_COLUMNS = ("id", "tag_name", "event_time", "description")
+
+_batch = threading.local()
+
+_report_cache: tuple[tuple[int, int], list[dict]] | None = None
+_report_cache_lock = threading.Lock()
 
 
 def list_fatal_events(tag_name: str) -> list[dict]:
@@ -13,51 +50,134 @@ def list_fatal_events(tag_name: str) -> list[dict]:
     return [dict(row) for row in rows]
 
 
+def add_fatal_event(tag_name: str, description: str, event_time: str | None = None) -> None:
+    db.execute(
+        "INSERT INTO fatal_events (tag_name, event_time, description) "
+        "VALUES (?, COALESCE(?, datetime('now')), ?)",
+        [tag_name, event_time, description],
+    )
+    db.bump_generation()
+
+
+def list_recent_fatal_events(limit_per_tag: int | None = None) -> dict[str, dict]:
+    limit = config.REPORT_FATAL_EVENTS_PER_TAG if limit_per_tag is None else limit_per_tag
+    rows = db.query_all(
+        "SELECT fe.tag_name, fe.event_time, fe.description, counts.event_count "
+        "FROM (SELECT tag_name, COUNT(*) AS event_count FROM fatal_events GROUP BY tag_name) counts "
+        "JOIN fatal_events fe ON fe.id IN ("
+        "SELECT id FROM fatal_events WHERE tag_name = counts.tag_name "
+        "ORDER BY event_time DESC, id DESC LIMIT ?"
+        ") "
+        "ORDER BY fe.tag_name, fe.event_time DESC, fe.id DESC",
+        [limit],
+    )
+    events_by_tag: dict[str, dict] = {}
+    for row in rows:
+        entry = events_by_tag.setdefault(row["tag_name"], {"events": [], "count": row["event_count"]})
+        entry["events"].append({"event_time": row["event_time"], "description": row["description"]})
+    return events_by_tag
+
+
 def list_process_reports(processes: list[dict]) -> list[dict]:
     reports = []
     latest_runs = _list_latest_runs()
+    recent_fatal_events = list_recent_fatal_events()
 
     for process in processes:
         tag_name = process["tag_name"]
-        fatal_events = list_fatal_events(tag_name)
-        run = latest_runs.get(tag_name)
-
-        reasons = []
-        if run:
-            reasons.extend(run["reasons"])
-        if fatal_events:
-            reasons.append("Fatal event(s) recorded")
-
-        if run:
-            status = run["status"]
-            status_class = run["status_class"]
-            uc4_status = run["uc4_status"]
-            last_run_time = run["run_time"]
-        else:
-            status = "Pending"
-            status_class = "status-pending"
-            uc4_status = "Not yet run"
-            last_run_time = None
-
-        if fatal_events and status != "Failed":
-            status = "Failed"
-            status_class = "status-failed"
-
+        fatal_summary = recent_fatal_events.get(tag_name, {"events": [], "count": 0})
+        fatal_events = fatal_summary["events"]
         reports.append(
             {
                 "tag_name": tag_name,
                 "folder_path": process["folder_path"],
-                "reasons": reasons,
                 "fatal_events": fatal_events,
-                "uc4_status": uc4_status,
-                "status": status,
-                "status_class": status_class,
-                "last_run_time": last_run_time,
+                "fatal_event_count": fatal_summary["count"],
+                **_report_status(latest_runs.get(tag_name), bool(fatal_events)),
             }
         )
 
     return reports
 
+
+def latest_run_id() -> int:
+    rows = db.query_all("SELECT COALESCE(MAX(run_id), 0) AS run_id FROM process_status")
+    return rows[0]["run_id"]
+
+
+def list_report_changes(after_run_id: int, limit: int = 1000) -> list[dict]:
+    # Report rows of the processes whose latest run is newer than after_run_id,
+    # oldest first.
+    rows = db.query_all(
+        "SELECT s.run_id AS id, s.tag_name, s.run_time, s.status, s.reasons, s.uc4_status, s.check_type, "
+        "COALESCE(s.verified_at, s.run_time) AS verified_at, "
+        "EXISTS (SELECT 1 FROM fatal_events f WHERE f.tag_name = s.tag_name) AS has_fatal_events "
+        "FROM process_status s JOIN processes p ON p.tag_name = s.tag_name AND p.folder_path != '' "
+        "WHERE s.run_id > ? ORDER BY s.run_id LIMIT ?",
+        [after_run_id, limit],
+    )
+    changes = []
+    for row in rows:
+        run = {**_normalize_run(dict(row)), "verified_at": row["verified_at"]}
+        changes.append({"tag_name": run["tag_name"], **_report_status(run, bool(row["has_fatal_events"]))})
+    return changes
+
+
+def _report_status(run: dict | None, has_fatal_events: bool) -> dict:
+    reasons = []
+    if run:
+        reasons.extend(run["reasons"])
+    if has_fatal_events:
+        reasons.append("Fatal event(s) recorded")
+
+    if run:
+        status = run["status"]
+        status_class = run["status_class"]
+        uc4_status = run["uc4_status"]
+        last_run_time = run["run_time"]
+        last_verified_time = run["verified_at"]
+    else:
+        status = "Pending"
+        status_class = "status-pending"
+        uc4_status = "Not yet run"
+        last_run_time = None
+        last_verified_time = None
+
+    if has_fatal_events and status != "Failed":
+        status = "Failed"
+        status_class = "status-failed"
+
+    return {
+        "run_id": run["id"] if run else None,
+        "reasons": reasons,
+        "uc4_status": uc4_status,
+        "status": status,
+        "status_class": status_class,
+        "last_run_time": last_run_time,
+        # When a check last ran, including checks that only repeated the
+        # latest run.
+        "last_verified_time": last_verified_time,
+    }
+
+def report_version() -> int:
+    # Counted by triggers on every change to processes, process_status and
+    # fatal_events, whichever process made it.
+    rows = db.query_all("SELECT version FROM report_version WHERE id = 1")
+    return rows[0]["version"] if rows else 0
+
+
+def list_cached_process_reports() -> tuple[str, list[dict]]:
+    global _report_cache
+    # Rows are rebuilt only after a run, process edit or fatal event changes
+    # the report version, or this process bumps its data generation. Callers
+    # must treat the returned rows as read-only.
+    with _report_cache_lock:
+        generation, version = db.data_generation(), report_version()
+        if _report_cache is None or _report_cache[0] != (generation, version):
+            _report_cache = ((generation, version), list_process_reports(process_service.list_processes()))
+        return f"{generation}-{version}", _report_cache[1]
+
+
 def list_failed_processes(processes: list[dict]) -> list[dict]:
     reports = list_process_reports(processes)
     return [report for report in reports if report["status"] == "Failed"]
@@ -70,27 +190,90 @@ def record_run(
     uc4_status: str,
     check_type: str,
     run_time: str | None = None,
+    on_commit: Callable[[], None] | None = None,
 ) -> None:
-    serialized_reasons = json.dumps(reasons)
-    if run_time is None:
-        db.execute(
-            "INSERT INTO process_runs (tag_name, status, reasons, uc4_status, check_type) "
-            "VALUES (?, ?, ?, ?, ?)",
-            [tag_name, status, serialized_reasons, uc4_status, check_type],
-        )
+    # on_commit runs once the run is committed; never if the write fails.
+    params = (tag_name, run_time, status, json.dumps(reasons), uc4_status, check_type)
+    committed = [on_commit] if on_commit is not None else []
+    pending = getattr(_batch, "runs", None)
+    if pending is None:
+        _write_runs([params], committed=committed)
         return
 
-    db.execute(
-        "INSERT INTO process_runs (tag_name, run_time, status, reasons, uc4_status, check_type) "
-        "VALUES (?, ?, ?, ?, ?, ?)",
-        [tag_name, run_time, status, serialized_reasons, uc4_status, check_type],
-    )
+    pending.append(params)
+    _batch.committed.extend(committed)
+    if len(pending) >= config.RUN_BATCH_SIZE:
+        _write_runs(pending, committed=_batch.committed)
+        pending.clear()
+        _batch.committed.clear()
+
+
+def record_verified(tag_name: str, run_time: str | None = None) -> None:
+    params = (run_time, tag_name, run_time)
+    pending = getattr(_batch, "verified", None)
+    if pending is None:
+        _write_runs([], [params])
+        return
+
+    pending.append(params)
+    if len(pending) >= config.RUN_BATCH_SIZE:
+        _write_runs([], pending)
+        pending.clear()
+
+
+@contextmanager
+def batch_runs() -> Iterator[None]:
+    # Runs and verifications recorded on this thread inside the block are
+    # written together in a single transaction when it exits.
+    if getattr(_batch, "runs", None) is not None:
+        yield
+        return
+
+    _batch.runs = []
+    _batch.verified = []
+    _batch.committed = []
+    try:
+        yield
+    finally:
+        pending, verified, committed = _batch.runs, _batch.verified, _batch.committed
+        _batch.runs = _batch.verified = _batch.committed = None
+        if pending or verified:
+            _write_runs(pending, verified, committed)
+
+
+def _write_runs(
+    runs: list[tuple],
+    verified: list[tuple] | None = None,
+    committed: list[Callable[[], None]] | None = None,
+) -> None:
+    previous_status: dict[str, str] = {}
+    with db.transaction() as connection:
+        if runs:
+            previous_status = alert_service.previous_statuses(connection, (run[0] for run in runs))
+            last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM process_runs").fetchone()[0]
+            connection.executemany(_INSERT_RUN, runs)
+            connection.execute(_UPSERT_STATUS, [last_id])
+        if verified:
+            connection.executemany(_UPDATE_VERIFIED, verified)
+    if not runs:
+        # Verification alone has nothing to stream or alert on; cached
+        # reports notice it through the report version.
+        return
+    db.bump_generation()
+    alert_service.observe(runs, previous_status)
+    for callback in committed or ():
+        callback()
+
+
+def status_counts() -> dict[str, int]:
+    rows = db.query_all("SELECT status, COUNT(*) AS total FROM process_status GROUP BY status")
+    return {row["status"]: row["total"] for row in rows}
 
 
 def get_latest_run(tag_name: str) -> dict | None:
     rows = db.query_all(
-        "SELECT id, tag_name, run_time, status, reasons, uc4_status, check_type "
-        "FROM process_runs WHERE tag_name = ? ORDER BY run_time DESC, id DESC LIMIT 1",
+        "SELECT run_id AS id, tag_name, run_time, status, reasons, uc4_status, check_type "
+        "FROM process_status WHERE tag_name = ?",
         [tag_name],
     )
     if not rows:
@@ -99,20 +282,160 @@ def get_latest_run(tag_name: str) -> dict | None:
     return _normalize_run(row)
 
 
+def latest_run_times() -> dict[str, datetime]:
+    # When each process was last checked, including checks that only
+    # confirmed the latest run.
+    rows = db.query_all("SELECT tag_name, COALESCE(verified_at, run_time) AS checked_at FROM process_status")
+    return {row["tag_name"]: datetime.fromisoformat(row["checked_at"]) for row in rows if row["checked_at"]}
+
+
+def list_latest_runs_after(after_run_id: int) -> list[dict]:
+    rows = db.query_all(
+        "SELECT run_id AS id, tag_name, run_time, status, reasons, uc4_status, check_type "
+        "FROM process_status WHERE run_id > ? ORDER BY run_id",
+        [after_run_id],
+    )
+    return [_normalize_run(dict(row)) for row in rows]
+
+
 def _list_latest_runs() -> dict[str, dict]:
     rows = db.query_all(
-        "SELECT pr.id, pr.tag_name, pr.run_time, pr.status, pr.reasons, pr.uc4_status, pr.check_type "
-        "FROM process_runs pr "
-        "JOIN (SELECT tag_name, MAX(id) AS max_id FROM process_runs GROUP BY tag_name) latest "
-        "ON pr.id = latest.max_id"
+        "SELECT run_id AS id, tag_name, run_time, status, reasons, uc4_status, check_type, "
+        "COALESCE(verified_at, run_time) AS verified_at FROM process_status"
     )
     latest_runs = {}
     for row in rows:
-        run = _normalize_run(dict(row))
+        run = {**_normalize_run(dict(row)), "verified_at": row["verified_at"]}
         latest_runs[run["tag_name"]] = run
     return latest_runs
 
 
+def list_runs(
+    tag_prefix: str | None = None,
+    status: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    before_id: int | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    clauses, params = _filter_clauses("run_time", None, since, until, before_id)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    rows = db.query_all(*_newest_first("process_runs", RUN_COLUMNS, tag_prefix, clauses, params, limit))
+    return [_normalize_run(dict(row)) for row in rows]
+
+
+def list_fatal_event_page(
+    tag_prefix: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    before_id: int | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    clauses, params = _filter_clauses("event_time", None, since, until, before_id)
+    # Without statistics SQLite walks every newer event by id for a one-sided
+    # time range; the time index reads only the events inside it.
+    index = "idx_fatal_events_time_id" if since or until else None
+    rows = db.query_all(
+        *_newest_first("fatal_events", FATAL_EVENT_COLUMNS, tag_prefix, clauses, params, limit, index)
+    )
+    return [dict(row) for row in rows]
+
+
+def iter_runs(
+    tag_prefix: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> Iterator[dict]:
+    clauses, params = _filter_clauses("run_time", tag_prefix, since, until, None)
+    rows = db.iter_query(
+        "SELECT id, tag_name, run_time, status, reasons, uc4_status, check_type FROM process_runs"
+        f"{_where(clauses)} ORDER BY id",
+        params,
+    )
+    for row in rows:
+        yield dict(row)
+
+
+def iter_fatal_events(
+    tag_prefix: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> Iterator[dict]:
+    clauses, params = _filter_clauses("event_time", tag_prefix, since, until, None)
+    rows = db.iter_query(
+        f"SELECT id, tag_name, event_time, description FROM fatal_events{_where(clauses)} ORDER BY id",
+        params,
+    )
+    for row in rows:
+        yield dict(row)
+
+
+def _newest_first(
+    table: str,
+    columns: tuple[str, ...],
+    tag_prefix: str | None,
+    clauses: list[str],
+    params: list,
+    limit: int,
+    index: str | None = None,
+) -> tuple[str, list]:
+    if not tag_prefix:
+        indexed_by = f" INDEXED BY {index}" if index else ""
+        return (
+            f"SELECT {', '.join(columns)} FROM {table}{indexed_by}{_where(clauses)} ORDER BY id DESC LIMIT ?",
+            [*params, limit],
+        )
+
+    # A prefix spans several tags, and no index orders their rows by id. Each
+    # tag's newest rows are read from its (tag_name, id) index instead, so at
+    # most limit rows per tag are sorted rather than the prefix's whole history.
+    # The tag index is named because a status filter would otherwise win.
+    upper = tag_prefix + "\U0010ffff"
+    per_tag = " AND ".join(["tag_name = tags.tag_name", *clauses])
+    query = (
+        "WITH RECURSIVE tags(tag_name) AS ("
+        f"SELECT MIN(tag_name) FROM {table} WHERE tag_name >= ? AND tag_name < ? "
+        f"UNION ALL SELECT (SELECT MIN(tag_name) FROM {table} WHERE tag_name > tags.tag_name AND tag_name < ?) "
+        "FROM tags WHERE tags.tag_name IS NOT NULL) "
+        f"SELECT {', '.join(f'page.{column}' for column in columns)} FROM tags "
+        f"JOIN {table} page ON page.id IN (SELECT id FROM {table} INDEXED BY idx_{table}_tag_id "
+        f"WHERE {per_tag} ORDER BY id DESC LIMIT ?) "
+        "ORDER BY page.id DESC LIMIT ?"
+    )
+    return query, [tag_prefix, upper, upper, *params, limit, limit]
+
+
+def _filter_clauses(
+    time_column: str,
+    tag_prefix: str | None,
+    since: str | None,
+    until: str | None,
+    before_id: int | None,
+) -> tuple[list[str], list]:
+    clauses: list[str] = []
+    params: list = []
+    if tag_prefix:
+        # A range rather than LIKE so the tag_name indexes can be used.
+        clauses.append("tag_name >= ? AND tag_name < ?")
+        params.extend([tag_prefix, tag_prefix + "\U0010ffff"])
+    if since:
+        clauses.append(f"{time_column} >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{time_column} < ?")
+        params.append(until)
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    return clauses, params
+
+
+def _where(clauses: list[str]) -> str:
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
 def _normalize_run(run: dict) -> dict:
     reasons = json.loads(run.get("reasons") or "[]")
     status = run.get("status", "Pending")
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from monitoring_tool import config, db
+
+logger = logging.getLogger(__name__)
+
+_retention_thread: threading.Thread | None = None
+_stop_event = threading.Event()
+
+
+@dataclass(frozen=True)
+class RetentionResult:
+    cutoff: str
+    pruned_runs: int
+    rolled_up_days: int
+    archive_path: str | None
+    vacuumed_pages: int
+
+
+def start_retention_job(interval_seconds: int | None = None) -> None:
+    global _retention_thread
+    if not config.HISTORY_RETENTION_DAYS:
+        return
+    if _retention_thread and _retention_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _retention_thread = threading.Thread(
+        target=_run_retention_job,
+        args=(interval_seconds or config.RETENTION_INTERVAL_SECONDS,),
+        daemon=True,
+    )
+    _retention_thread.start()
+
+
+def stop_retention_job(timeout: float | None = None) -> None:
+    _stop_event.set()
+    if _retention_thread and _retention_thread.is_alive():
+        _retention_thread.join(timeout)
+
+
+def _run_retention_job(interval_seconds: int) -> None:
+    while not _stop_event.is_set():
+        try:
+            prune_history()
+        except Exception:  # noqa: BLE001
+            logger.exception("History retention failed")
+        _stop_event.wait(interval_seconds)
+
+
+def prune_history(
+    now: datetime | None = None,
+    retention_days: int | None = None,
+    archive_dir: str | Path | None = None,
+    batch_size: int | None = None,
+    vacuum_pages: int | None = None,
+) -> RetentionResult:
+    days = config.HISTORY_RETENTION_DAYS if retention_days is None else retention_days
+    if days <= 0:
+        raise ValueError("Retention window must be at least one day")
+
+    current_time = now or datetime.now()
+    cutoff = (current_time.date() - timedelta(days=days)).isoformat()
+    archive_root = config.HISTORY_ARCHIVE_DIR if archive_dir is None else archive_dir
+    limit = config.RETENTION_BATCH_SIZE if batch_size is None else batch_size
+
+    archive_path = None
+    archive = None
+    if archive_root:
+        archive_path = Path(archive_root) / f"process_runs-before-{cutoff}-{current_time:%Y%m%d%H%M%S}.ndjson.gz"
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        archive = gzip.open(archive_path, "wt", encoding="utf-8")
+
+    pruned_runs = 0
+    rolled_up: set[tuple[str, str]] = set()
+    try:
+        while True:
+            batch = _prune_batch(cutoff, limit, archive)
+            if not batch:
+                break
+            pruned_runs += len(batch["ids"])
+            rolled_up.update(batch["days"])
+    finally:
+        if archive is not None:
+            archive.close()
+
+    if archive_path is not None and not pruned_runs:
+        archive_path.unlink(missing_ok=True)
+        archive_path = None
+
+    pages = config.RETENTION_VACUUM_PAGES if vacuum_pages is None else vacuum_pages
+    return RetentionResult(
+        cutoff=cutoff,
+        pruned_runs=pruned_runs,
+        rolled_up_days=len(rolled_up),
+        archive_path=str(archive_path) if archive_path else None,
+        vacuumed_pages=incremental_vacuum(pages) if pages else 0,
+    )
+
+
+def _prune_batch(cutoff: str, limit: int, archive) -> dict | None:
+    with db.transaction() as connection:
+        rows = connection.execute(
+            "SELECT id, tag_name, run_time, status, reasons, uc4_status, check_type "
+            "FROM process_runs WHERE run_time < ? ORDER BY id LIMIT ?",
+            [cutoff, limit],
+        ).fetchall()
+        if not rows:
+            return None
+
+        summaries = _summarize(rows)
+        for (tag_name, day), summary in summaries.items():
+            _merge_daily_summary(connection, tag_name, day, summary)
+
+        if archive is not None:
+            for row in rows:
+                archive.write(json.dumps(dict(row)) + "\n")
+            archive.flush()
+
+        ids = [(row["id"],) for row in rows]
+        connection.executemany("DELETE FROM process_runs WHERE id = ?", ids)
+
+    return {"ids": ids, "days": set(summaries)}
+
+
+def _summarize(rows) -> dict[tuple[str, str], dict]:
+    summaries: dict[tuple[str, str], dict] = {}
+    for row in rows:
+        key = (row["tag_name"], row["run_time"][:10])
+        summary = summaries.setdefault(
+            key, {"success_count": 0, "failed_count": 0, "first_failure_time": None, "reasons": []}
+        )
+        if row["status"] == "Failed":
+            summary["failed_count"] += 1
+            if summary["first_failure_time"] is None or row["run_time"] < summary["first_failure_time"]:
+                summary["first_failure_time"] = row["run_time"]
+        else:
+            summary["success_count"] += 1
+        for reason in json.loads(row["reasons"] or "[]"):
+            if reason not in summary["reasons"]:
+                summary["reasons"].append(reason)
+    return summaries
+
+
+def _merge_daily_summary(connection, tag_name: str, day: str, summary: dict) -> None:
+    existing = connection.execute(
+        "SELECT success_count, failed_count, first_failure_time, reasons "
+        "FROM process_run_daily WHERE tag_name = ? AND day = ?",
+        [tag_name, day],
+    ).fetchone()
+
+    if existing:
+        reasons = json.loads(existing["reasons"])
+        reasons.extend(reason for reason in summary["reasons"] if reason not in reasons)
+        first_failure_times = [
+            value for value in (existing["first_failure_time"], summary["first_failure_time"]) if value
+        ]
+        summary = {
+            "success_count": existing["success_count"] + summary["success_count"],
+            "failed_count": existing["failed_count"] + summary["failed_count"],
+            "first_failure_time": min(first_failure_times) if first_failure_times else None,
+            "reasons": reasons,
+        }
+
+    connection.execute(
+        "INSERT OR REPLACE INTO process_run_daily "
+        "(tag_name, day, success_count, failed_count, first_failure_time, reasons) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            tag_name,
+            day,
+            summary["success_count"],
+            summary["failed_count"],
+            summary["first_failure_time"],
+            json.dumps(summary["reasons"]),
+        ],
+    )
+
+
+def list_daily_summaries(tag_name: str) -> list[dict]:
+    rows = db.query_all(
+        "SELECT tag_name, day, success_count, failed_count, first_failure_time, reasons "
+        "FROM process_run_daily WHERE tag_name = ? ORDER BY day DESC",
+        [tag_name],
+    )
+    summaries = []
+    for row in rows:
+        summary = dict(row)
+        summary["reasons"] = json.loads(summary["reasons"])
+        summaries.append(summary)
+    return summaries
+
+
+def incremental_vacuum(pages: int) -> int:
+    with db.pooled_connection() as connection:
+        if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        connection.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        after = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    return before - after
+
+
+def enable_incremental_vacuum() -> None:
+    # Switching an existing database to incremental auto-vacuum requires a
+    # full VACUUM, which rewrites the file and must run outside a transaction.
+    with db.pooled_connection() as connection:
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("VACUUM")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Iterator
+
+from monitoring_tool import config, db
+from monitoring_tool.services import report_service
+
+STREAM_FIELDS = ("tag_name", "status", "status_class", "reasons", "uc4_status", "last_run_time")
+# Browsers wait this long before reconnecting a closed stream.
+RETRY_MS = 3000
+
+
+def report_events(
+    after_run_id: int,
+    poll_seconds: float | None = None,
+    keepalive_seconds: float | None = None,
+    max_seconds: float | None = None,
+) -> Iterator[str]:
+    # Server-Sent Events for report rows that changed after after_run_id. Each
+    # event id is a run id, so a reconnecting browser resumes from its
+    # Last-Event-ID. The stream ends after max_seconds to free the worker
+    # thread; the browser reconnects on its own.
+    poll = config.REPORT_STREAM_POLL_SECONDS if poll_seconds is None else poll_seconds
+    keepalive = config.REPORT_STREAM_KEEPALIVE_SECONDS if keepalive_seconds is None else keepalive_seconds
+    lifetime = config.REPORT_STREAM_MAX_SECONDS if max_seconds is None else max_seconds
+
+    started = last_sent = time.monotonic()
+    cursor = after_run_id
+    # Rows already sent on this stream, so repeated identical runs are skipped.
+    sent: dict[str, tuple] = {}
+    yield f"retry: {RETRY_MS}\n\n"
+    while True:
+        generation = db.data_generation()
+        changes = report_service.list_report_changes(cursor)
+        for change in changes:
+            cursor = max(cursor, change["run_id"])
+            row = {field: change[field] for field in STREAM_FIELDS}
+            key = (row["status"], tuple(row["reasons"]), row["uc4_status"])
+            if sent.get(row["tag_name"]) == key:
+                continue
+            sent[row["tag_name"]] = key
+            last_sent = time.monotonic()
+            yield f"id: {change['run_id']}\nevent: run\ndata: {json.dumps(row)}\n\n"
+
+        now = time.monotonic()
+        if lifetime and now - started >= lifetime:
+            return
+        if now - last_sent >= keepalive:
+            # Comments keep proxies from closing an idle stream and surface a
+            # disconnected client as a write error.
+            last_sent = now
+            yield ": keepalive\n\n"
+        if changes:
+            # Look again straight away in case more than a page was waiting.
+            continue
+        wait_seconds = min(poll, keepalive - (now - last_sent))
+        if lifetime:
+            wait_seconds = min(wait_seconds, lifetime - (now - started))
+        db.wait_for_generation(generation, max(0.0, wait_seconds))
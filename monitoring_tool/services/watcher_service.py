@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from monitoring_tool import config
+from monitoring_tool.services import coordinator_service, filesystem_service, monitoring_service, process_service
+
+logger = logging.getLogger(__name__)
+
+WATCH_MODES = ("off", "auto", "inotify", "poll")
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "glusterfs", "ceph"}
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_WATCH_MASK = (
+    _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+_watcher_thread: threading.Thread | None = None
+_stop_event = threading.Event()
+
+
+class _Inotify:
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int | None:
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        return wd if wd >= 0 else None
+
+    def remove_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> list[tuple[int, int, str]]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def inotify_available() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    library = ctypes.util.find_library("c")
+    return bool(library) and hasattr(ctypes.CDLL(library), "inotify_init1")
+
+
+class FolderWatcher:
+    def __init__(self, mode: str, poll_seconds: float | None = None) -> None:
+        if mode not in ("auto", "inotify", "poll"):
+            raise ValueError(f"Unsupported watch mode: {mode}")
+        use_inotify = mode == "inotify" or (mode == "auto" and inotify_available())
+        self._inotify = _Inotify() if use_inotify else None
+        self._network_mounts = _network_mount_points() if mode == "auto" else []
+        self.poll_seconds = config.WATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._processes: dict[str, list[dict]] = {}
+        self._watches: dict[str, int] = {}
+        self._folders_by_wd: dict[int, str] = {}
+        self._signatures: dict[str, tuple] = {}
+        self._next_poll = 0.0
+
+    @property
+    def watched_folders(self) -> set[str]:
+        return set(self._watches)
+
+    @property
+    def polled_folders(self) -> set[str]:
+        return set(self._processes) - set(self._watches)
+
+    def processes_for(self, folder_path: str) -> list[dict]:
+        return self._processes.get(folder_path, [])
+
+    def sync(self, processes: list[dict]) -> None:
+        by_folder: dict[str, list[dict]] = {}
+        for process in processes:
+            by_folder.setdefault(process["folder_path"], []).append(process)
+        self._processes = by_folder
+
+        for folder_path in list(self._watches):
+            if folder_path not in by_folder:
+                self._unwatch(folder_path)
+        for folder_path in list(self._signatures):
+            if folder_path not in by_folder:
+                del self._signatures[folder_path]
+
+        for folder_path in by_folder:
+            if folder_path in self._watches:
+                continue
+            if self._inotify is not None and not self._is_network_path(folder_path):
+                wd = self._inotify.add_watch(folder_path)
+                if wd is not None:
+                    self._watches[folder_path] = wd
+                    self._folders_by_wd[wd] = folder_path
+                    self._signatures.pop(folder_path, None)
+                    continue
+            self._signatures.setdefault(folder_path, _folder_signature(folder_path))
+
+    def wait_for_changes(self, timeout: float) -> set[str]:
+        deadline = time.monotonic() + timeout
+        changed: set[str] = set()
+        while not changed:
+            now = time.monotonic()
+            if now >= self._next_poll:
+                changed.update(self._poll())
+                self._next_poll = now + self.poll_seconds
+                if changed:
+                    break
+
+            remaining = min(deadline, self._next_poll) - time.monotonic()
+            if now >= deadline:
+                break
+            if self._inotify is None:
+                time.sleep(max(0.0, remaining))
+                continue
+
+            readable, _, _ = select.select([self._inotify.fd], [], [], max(0.0, remaining))
+            if readable:
+                changed.update(self._drain_inotify())
+                # Markers are often written in bursts; collect the rest of it.
+                time.sleep(config.WATCH_DEBOUNCE_SECONDS)
+                changed.update(self._drain_inotify())
+        return changed
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _drain_inotify(self) -> set[str]:
+        changed = set()
+        for wd, mask, name in self._inotify.read_events():
+            folder_path = self._folders_by_wd.get(wd)
+            if folder_path is None:
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                # The folder itself went away; poll it until it comes back.
+                self._unwatch(folder_path)
+                self._signatures[folder_path] = _folder_signature(folder_path)
+                changed.add(folder_path)
+            elif name in filesystem_service.MARKERS:
+                changed.add(folder_path)
+        return changed
+
+    def _poll(self) -> set[str]:
+        changed = set()
+        for folder_path in self.polled_folders:
+            signature = _folder_signature(folder_path)
+            if self._signatures.get(folder_path) != signature:
+                self._signatures[folder_path] = signature
+                changed.add(folder_path)
+        return changed
+
+    def _unwatch(self, folder_path: str) -> None:
+        wd = self._watches.pop(folder_path)
+        self._folders_by_wd.pop(wd, None)
+        if self._inotify is not None:
+            self._inotify.remove_watch(wd)
+
+    def _is_network_path(self, folder_path: str) -> bool:
+        resolved = os.path.realpath(folder_path)
+        return any(resolved == mount or resolved.startswith(mount.rstrip("/") + "/") for mount in self._network_mounts)
+
+
+def start_watcher(
+    mode: str | None = None,
+    coordinator: coordinator_service.Coordinator | None = None,
+) -> None:
+    global _watcher_thread
+    watch_mode = config.WATCH_MODE if mode is None else mode
+    if watch_mode == "off":
+        return
+    if _watcher_thread and _watcher_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _watcher_thread = threading.Thread(target=_run_watcher, args=(watch_mode, coordinator), daemon=True)
+    _watcher_thread.start()
+
+
+def stop_watcher(timeout: float | None = None) -> None:
+    _stop_event.set()
+    if _watcher_thread and _watcher_thread.is_alive():
+        _watcher_thread.join(timeout)
+
+
+def _run_watcher(mode: str, coordinator: coordinator_service.Coordinator | None = None) -> None:
+    # With a coordinator only processes leased to this worker are watched, so
+    # a marker change is checked and alerted once across all workers.
+    watcher = FolderWatcher(mode)
+    processes: list[dict] = []
+    synced_version = None
+    next_refresh = 0.0
+    try:
+        while not _stop_event.is_set():
+            try:
+                refresh = time.monotonic() >= next_refresh
+                if refresh:
+                    # Picks up folder edits and retries watches on folders that
+                    # were missing or unreadable last time.
+                    processes = process_service.list_processes()
+                    next_refresh = time.monotonic() + config.WATCH_REFRESH_SECONDS
+                if coordinator is None:
+                    if refresh:
+                        watcher.sync(processes)
+                elif refresh or coordinator.version != synced_version:
+                    synced_version = coordinator.version
+                    owned = coordinator.owned()
+                    watcher.sync([process for process in processes if process["tag_name"] in owned])
+
+                changed = watcher.wait_for_changes(timeout=min(1.0, config.WATCH_REFRESH_SECONDS))
+                owned = coordinator.owned() if coordinator is not None else None
+            except Exception:  # noqa: BLE001
+                # One bad folder or a failed refresh must not end the watcher thread.
+                logger.exception("Watching folders failed")
+                _stop_event.wait(config.WATCH_POLL_SECONDS)
+                continue
+
+            for folder_path in changed:
+                filesystem_service.invalidate(folder_path)
+                for process in watcher.processes_for(folder_path):
+                    if owned is not None and process["tag_name"] not in owned:
+                        # The lease moved since the last sync.
+                        continue
+                    try:
+                        monitoring_service.check_process(process)
+                    except Exception:  # noqa: BLE001
+                        logger.exception("Watcher check failed for %s", process["tag_name"])
+    finally:
+        watcher.close()
+
+
+def _folder_signature(folder_path: str) -> tuple:
+    try:
+        snapshot = filesystem_service.scan_folder(folder_path)
+    except OSError as exc:
+        # An unreadable folder gets a signature of its own, so it is checked
+        # once when it breaks and again when it recovers.
+        return ("error", exc.errno)
+    return (snapshot.exists, sorted(snapshot.markers.items()))
+
+
+def _network_mount_points() -> list[str]:
+    try:
+        with open("/proc/mounts", encoding="utf-8") as mounts:
+            lines = mounts.read().splitlines()
+    except OSError:
+        return []
+
+    mount_points = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 3 and fields[2] in NETWORK_FILESYSTEMS:
+            mount_points.append(fields[1].replace("\\040", " "))
+    return mount_points
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+
+from monitoring_tool import config, db
+
+logger = logging.getLogger(__name__)
+
+# Heartbeats of workers gone for longer than this are removed.
+HEARTBEAT_RETENTION = timedelta(days=1)
+
+
+class Heartbeat:
+    # Written by a scheduler at most every WORKER_HEARTBEAT_SECONDS so the UI
+    # can tell whether anything is running checks.
+    def __init__(self, worker_id: str, role: str) -> None:
+        self.worker_id = worker_id
+        self.role = role
+        self.processes = 0
+        self.checks_run = 0
+        self.last_cycle_at: str | None = None
+        self.last_cycle_seconds: float | None = None
+        self._started_at = _format_time(datetime.now())
+        self._next_beat = datetime.min
+
+    def cycle(self, finished_at: datetime, seconds: float, checks: int) -> None:
+        self.checks_run += checks
+        self.last_cycle_at = _format_time(finished_at)
+        self.last_cycle_seconds = round(seconds, 3)
+
+    def beat(self, processes: int, now: datetime | None = None) -> None:
+        current_time = now or datetime.now()
+        self.processes = processes
+        if current_time < self._next_beat:
+            return
+        try:
+            self._write("running", current_time)
+        except Exception:  # noqa: BLE001
+            logger.exception("Writing heartbeat for %s failed", self.worker_id)
+            return
+        self._next_beat = current_time + timedelta(seconds=config.WORKER_HEARTBEAT_SECONDS)
+
+    def stopped(self) -> None:
+        try:
+            self._write("stopped", datetime.now())
+        except Exception:  # noqa: BLE001
+            logger.exception("Writing final heartbeat for %s failed", self.worker_id)
+
+    def _write(self, status: str, current_time: datetime) -> None:
+        now_text = _format_time(current_time)
+        with db.transaction() as connection:
+            connection.execute(
+                "INSERT INTO worker_heartbeats (worker_id, hostname, pid, role, status, started_at, heartbeat_at, "
+                "processes, checks_run, last_cycle_at, last_cycle_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET hostname = excluded.hostname, pid = excluded.pid, "
+                "role = excluded.role, status = excluded.status, started_at = excluded.started_at, "
+                "heartbeat_at = excluded.heartbeat_at, processes = excluded.processes, "
+                "checks_run = excluded.checks_run, last_cycle_at = excluded.last_cycle_at, "
+                "last_cycle_seconds = excluded.last_cycle_seconds",
+                [
+                    self.worker_id,
+                    socket.gethostname(),
+                    os.getpid(),
+                    self.role,
+                    status,
+                    self._started_at,
+                    now_text,
+                    self.processes,
+                    self.checks_run,
+                    self.last_cycle_at,
+                    self.last_cycle_seconds,
+                ],
+            )
+            connection.execute(
+                "DELETE FROM worker_heartbeats WHERE heartbeat_at < ?",
+                [_format_time(current_time - HEARTBEAT_RETENTION)],
+            )
+
+
+def list_workers(now: datetime | None = None) -> list[dict]:
+    current_time = now or datetime.now()
+    # A worker that missed three heartbeats is treated as down.
+    stale_before = current_time - timedelta(seconds=config.WORKER_HEARTBEAT_SECONDS * 3)
+    rows = db.query_all(
+        "SELECT worker_id, hostname, pid, role, status, started_at, heartbeat_at, processes, checks_run, "
+        "last_cycle_at, last_cycle_seconds FROM worker_heartbeats ORDER BY role, worker_id"
+    )
+    workers = []
+    for row in rows:
+        worker = dict(row)
+        heartbeat_at = datetime.fromisoformat(worker["heartbeat_at"])
+        worker["healthy"] = worker["status"] == "running" and heartbeat_at >= stale_before
+        worker["seconds_since_heartbeat"] = max(0, int((current_time - heartbeat_at).total_seconds()))
+        workers.append(worker)
+    return workers
+
+
+def _format_time(value: datetime) -> str:
+    return value.replace(microsecond=0).isoformat(sep=" ")
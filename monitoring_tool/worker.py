@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import threading
+
+from monitoring_tool import db
+from monitoring_tool.services import (
+    coordinator_service,
+    email_service,
+    monitoring_service,
+    retention_service,
+    watcher_service,
+)
+
+logger = logging.getLogger(__name__)
+
+# Background jobs get this long to finish after the scheduler has stopped.
+SHUTDOWN_TIMEOUT_SECONDS = 30
+
+_stopping = threading.Event()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run scheduled checks and background jobs outside the web app."
+    )
+    parser.add_argument("--worker-id", help="Stable worker name. Defaults to MONITORING_WORKER_ID or host-pid.")
+    parser.add_argument("--interval", type=int, help="Default seconds between checks of a process.")
+    parser.add_argument("--lease-seconds", type=float, help="Seconds before a silent worker's processes move.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    db.ensure_schema()
+    # Workers always coordinate so more can be started at any time without
+    # duplicating checks.
+    coordinator = coordinator_service.Coordinator(args.worker_id, args.lease_seconds)
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    email_service.start_email_worker()
+    retention_service.start_retention_job()
+    watcher_service.start_watcher(coordinator=coordinator)
+    logger.info("Worker %s starting", coordinator.worker_id)
+    try:
+        # Runs in the foreground until a signal sets the scheduler's stop event.
+        monitoring_service.run_scheduler(args.interval, coordinator)
+    finally:
+        watcher_service.stop_watcher(SHUTDOWN_TIMEOUT_SECONDS)
+        retention_service.stop_retention_job(SHUTDOWN_TIMEOUT_SECONDS)
+        email_service.stop_email_worker(SHUTDOWN_TIMEOUT_SECONDS)
+        db.close_pool()
+    logger.info("Worker stopped")
+
+
+def _request_stop(signum: int, frame: object) -> None:
+    if _stopping.is_set():
+        # A second signal skips waiting for in-flight checks.
+        raise SystemExit(1)
+    _stopping.set()
+    logger.info("Received %s, stopping after in-flight checks", signal.Signals(signum).name)
+    monitoring_service.stop_scheduler()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from monitoring_tool import db
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """Points the app at a fresh database in a temporary folder for each test."""
+
+    # Set to False to build the database by hand, e.g. as a legacy schema.
+    create_schema = True
+
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.tmp_path = Path(self._tmpdir.name)
+        self.db_path = self.tmp_path / "test.db"
+        db_patch = patch("monitoring_tool.db.config.DB_PATH", self.db_path)
+        db_patch.start()
+        self.addCleanup(db_patch.stop)
+        self.addCleanup(db.close_pool)
+        if self.create_schema:
+            db.init_db()
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool.services import alert_service, email_service, process_service, report_service
+
+
+class AlertServiceTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patches = [
+            patch("monitoring_tool.services.alert_service.config.ALERTS_ENABLED", True),
+            patch("monitoring_tool.services.alert_service.config.ALERT_DIGEST_WINDOW_SECONDS", 3600),
+        ]
+        for active_patch in patches:
+            active_patch.start()
+            self.addCleanup(active_patch.stop)
+        alert_service.reset()
+        self.addCleanup(alert_service.reset)
+        process_service.add_recipient("ops@example.com")
+
+    def record(self, tag_name: str, status: str, reasons: list[str] | None = None) -> None:
+        report_service.record_run(tag_name, status, reasons or [], "OK", "filesystem")
+
+    def test_only_transitions_are_alerted(self) -> None:
+        self.record("job-a", "Success")
+        self.record("job-a", "Failed", ["Missing success marker: success.flag"])
+        self.record("job-a", "Failed", ["Missing success marker: success.flag"])
+
+        self.assertEqual(alert_service.flush(), 1)
+        self.record("job-a", "Failed")
+        self.assertEqual(alert_service.flush(), 0)
+        self.record("job-a", "Success")
+        self.assertEqual(alert_service.flush(), 1)
+
+        subjects = [delivery["subject"] for delivery in reversed(email_service.list_deliveries())]
+        self.assertEqual(subjects, ["MonitoringTool: job-a failed", "MonitoringTool: job-a recovered"])
+
+    def test_burst_of_failures_becomes_one_digest(self) -> None:
+        with report_service.batch_runs():
+            for index in range(200):
+                self.record(f"job-{index:03d}", "Success")
+        alert_service.flush()
+
+        with report_service.batch_runs():
+            for index in range(200):
+                self.record(f"job-{index:03d}", "Failed", ["Folder missing: /mnt/storage"])
+
+        self.assertEqual(alert_service.flush(), 200)
+        deliveries = email_service.list_deliveries()
+        self.assertEqual(len(deliveries), 1)
+        self.assertEqual(deliveries[0]["subject"], "MonitoringTool: 200 failed")
+
+    def test_flap_within_window_is_not_reported(self) -> None:
+        self.record("job-a", "Success")
+        self.record("job-a", "Failed")
+        self.record("job-a", "Success")
+
+        self.assertEqual(alert_service.flush(), 0)
+        self.assertEqual(email_service.list_deliveries(), [])
+
+    def test_runs_written_by_other_processes_are_not_alerted_twice(self) -> None:
+        self.record("job-a", "Success")
+        # Another worker records the failure and sends its own alert.
+        with patch("monitoring_tool.services.alert_service.config.ALERTS_ENABLED", False):
+            self.record("job-a", "Failed")
+
+        self.record("job-a", "Failed")
+        self.record("job-b", "Failed")
+
+        self.assertEqual([transition.tag_name for transition in alert_service._pending.values()], ["job-b"])
+
+    def test_digest_lists_failures_and_recoveries(self) -> None:
+        subject, body = alert_service.format_digest(
+            [
+                alert_service.Transition("job-a", "Success", "Failed", "2024-01-01 09:00:00", ["boom"]),
+                alert_service.Transition("job-b", "Failed", "Success", "2024-01-01 09:00:00"),
+            ]
+        )
+
+        self.assertEqual(subject, "MonitoringTool: 1 failed, 1 recovered")
+        self.assertIn("- job-a at 2024-01-01 09:00:00:\n  * boom", body)
+        self.assertIn("The following processes recovered:\n- job-b", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
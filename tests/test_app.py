@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool.app import create_app
+from monitoring_tool.services import email_service, process_service, report_service, worker_service
+
+
+class ReportsRouteTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patches = [
+            patch("monitoring_tool.app.monitoring_service.start_scheduler"),
+            patch("monitoring_tool.app.retention_service.start_retention_job"),
+            patch("monitoring_tool.app.email_service.start_email_worker"),
+        ]
+        for active_patch in patches:
+            active_patch.start()
+            self.addCleanup(active_patch.stop)
+
+        self.client = create_app().test_client()
+        process_service.add_tag("job-a")
+        process_service.set_folder("job-a", "/tmp", False, None, None)
+
+    def test_reports_returns_not_modified_until_data_changes(self) -> None:
+        first = self.client.get("/reports")
+        etag = first.headers["ETag"]
+        self.assertEqual(first.status_code, 200)
+
+        unchanged = self.client.get("/reports", headers={"If-None-Match": etag})
+        self.assertEqual(unchanged.status_code, 304)
+
+        report_service.record_run("job-a", "Failed", ["Failure marker found: failure.flag"], "OK", "filesystem")
+        changed = self.client.get("/reports", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn(b"Failure marker found", changed.data)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    def test_repeated_reports_reuse_cached_rows(self) -> None:
+        self.client.get("/reports")
+
+        with patch(
+            "monitoring_tool.services.report_service.list_process_reports",
+            wraps=report_service.list_process_reports,
+        ) as list_process_reports:
+            self.client.get("/reports")
+            self.client.get("/reports")
+            report_service.add_fatal_event("job-a", "Loader crashed")
+            response = self.client.get("/reports")
+
+        self.assertEqual(list_process_reports.call_count, 1)
+        self.assertIn(b"Loader crashed", response.data)
+
+    def test_writes_from_other_processes_refresh_cached_reports(self) -> None:
+        etag = self.client.get("/reports").headers["ETag"]
+
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from monitoring_tool.services import report_service; "
+                "report_service.record_run('job-a', 'Failed', ['Written by worker'], 'OK', 'filesystem')",
+            ],
+            cwd=Path(__file__).resolve().parents[1],
+            env={**os.environ, "MONITORING_DB_PATH": str(self.db_path)},
+            check=True,
+        )
+        response = self.client.get("/reports", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Written by worker", response.data)
+
+        # Rows inserted by other tools without going through the app count too.
+        etag = response.headers["ETag"]
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO fatal_events (tag_name, description) VALUES ('job-a', 'Inserted externally')"
+            )
+        response = self.client.get("/reports", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Inserted externally", response.data)
+
+    def test_pending_flash_is_not_hidden_by_cached_response(self) -> None:
+        etag = self.client.get("/reports").headers["ETag"]
+        with self.client.session_transaction() as flask_session:
+            flask_session["_flashes"] = [("success", "Checks completed.")]
+
+        response = self.client.get("/reports", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Checks completed.", response.data)
+
+    def test_metrics_endpoint_reports_status_and_timings(self) -> None:
+        report_service.record_run("job-a", "Failed", ["boom"], "OK", "filesystem")
+        self.client.get("/reports")
+
+        response = self.client.get("/metrics")
+        text = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        self.assertIn('monitoring_process_status{status="Failed"} 1', text)
+        self.assertIn('monitoring_queue_depth{queue="email"} 0', text)
+        self.assertIn('monitoring_http_request_duration_seconds_count{endpoint="reports"}', text)
+        self.assertIn('monitoring_db_query_duration_seconds_bucket{operation="query_all",le="+Inf"}', text)
+
+    def test_metrics_endpoint_publishes_worker_heartbeats(self) -> None:
+        heartbeat = worker_service.Heartbeat("worker-1", "worker")
+        heartbeat.cycle(datetime.now(), 1.25, 3)
+        heartbeat.beat(3)
+
+        text = self.client.get("/metrics").get_data(as_text=True)
+
+        self.assertIn('monitoring_worker_up{worker_id="worker-1",role="worker"} 1', text)
+        self.assertIn('monitoring_worker_last_cycle_duration_seconds{worker_id="worker-1",role="worker"} 1.25', text)
+
+    def test_reports_stream_resumes_from_last_event_id(self) -> None:
+        report_service.record_run("job-a", "Success", [], "OK", "filesystem")
+        page = self.client.get("/reports").get_data(as_text=True)
+        self.assertIn('data-tag="job-a"', page)
+        last_event_id = report_service.latest_run_id()
+        report_service.record_run("job-a", "Failed", ["boom"], "OK", "filesystem")
+
+        with patch("monitoring_tool.services.stream_service.config.REPORT_STREAM_MAX_SECONDS", 0.05):
+            response = self.client.get("/reports/stream", headers={"Last-Event-ID": str(last_event_id)})
+            body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertIn("event: run", body)
+        self.assertIn('"status": "Failed"', body)
+        self.assertIn(f"id: {report_service.latest_run_id()}", body)
+
+    def test_workers_page_shows_heartbeats(self) -> None:
+        response = self.client.get("/workers")
+        self.assertIn(b"No healthy worker is running checks.", response.data)
+
+        worker_service.Heartbeat("checks-01", "worker").beat(12)
+        response = self.client.get("/workers")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"checks-01", response.data)
+        self.assertIn(b"Healthy", response.data)
+        self.assertNotIn(b"No healthy worker is running checks.", response.data)
+
+    def test_embedded_worker_can_be_disabled(self) -> None:
+        with patch("monitoring_tool.app.config.EMBEDDED_WORKER", False), patch(
+            "monitoring_tool.app.monitoring_service.start_scheduler"
+        ) as start_scheduler, patch("monitoring_tool.app.email_service.start_email_worker") as start_email_worker:
+            create_app()
+
+        start_scheduler.assert_not_called()
+        start_email_worker.assert_not_called()
+
+    def test_notify_queues_email_without_sending(self) -> None:
+        process_service.add_recipient("ops@example.com")
+
+        with patch("monitoring_tool.services.email_service.smtplib.SMTP") as smtp:
+            response = self.client.post(
+                "/reports/notify",
+                data={"recipients": ["ops@example.com"], "message": "Please look"},
+                follow_redirects=True,
+            )
+
+        smtp.assert_not_called()
+        self.assertIn(b"Notification email queued for delivery.", response.data)
+        deliveries = email_service.list_deliveries()
+        self.assertEqual(len(deliveries), 1)
+        self.assertEqual(deliveries[0]["recipients"], ["ops@example.com"])
+        self.assertEqual(deliveries[0]["status"], "queued")
+
+
+class ApiTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patches = [
+            patch("monitoring_tool.app.monitoring_service.start_scheduler"),
+            patch("monitoring_tool.app.retention_service.start_retention_job"),
+            patch("monitoring_tool.app.email_service.start_email_worker"),
+        ]
+        for active_patch in patches:
+            active_patch.start()
+            self.addCleanup(active_patch.stop)
+
+        self.client = create_app().test_client()
+        for tag_name in ("billing-a", "billing-b", "inventory"):
+            process_service.add_tag(tag_name)
+            process_service.set_folder(tag_name, "/tmp", False, None, None)
+        with report_service.batch_runs():
+            for hour in range(5):
+                report_service.record_run(
+                    "billing-a", "Failed" if hour % 2 else "Success", [], "OK", "filesystem", f"2024-01-01 0{hour}:00:00"
+                )
+            report_service.record_run("billing-b", "Success", [], "OK", "filesystem", "2024-01-01 05:00:00")
+            report_service.record_run("inventory", "Failed", ["boom"], "OK", "filesystem", "2024-01-01 05:00:00")
+
+    def test_runs_are_paginated_with_keyset_cursor(self) -> None:
+        first = self.client.get("/api/runs?tag_prefix=billing-a&limit=2").get_json()
+        second = self.client.get(f"/api/runs?tag_prefix=billing-a&limit=2&cursor={first['next_cursor']}").get_json()
+        third = self.client.get(f"/api/runs?tag_prefix=billing-a&limit=2&cursor={second['next_cursor']}").get_json()
+
+        run_times = [run["run_time"] for page in (first, second, third) for run in page["items"]]
+        self.assertEqual(run_times, [f"2024-01-01 0{hour}:00:00" for hour in range(4, -1, -1)])
+        self.assertIsNone(third["next_cursor"])
+
+    def test_runs_filter_by_status_time_range_and_fields(self) -> None:
+        payload = self.client.get(
+            "/api/runs?status=Failed&since=2024-01-01T02:00:00&until=2024-01-01 05:00:00&fields=tag_name,run_time"
+        ).get_json()
+
+        self.assertEqual(payload["items"], [{"tag_name": "billing-a", "run_time": "2024-01-01 03:00:00"}])
+
+    def test_reports_filter_by_status_and_prefix(self) -> None:
+        payload = self.client.get("/api/reports?status=Failed&fields=tag_name,status").get_json()
+        self.assertEqual(payload["items"], [{"tag_name": "inventory", "status": "Failed"}])
+
+        first = self.client.get("/api/reports?tag_prefix=billing&limit=1&fields=tag_name").get_json()
+        second = self.client.get(
+            f"/api/reports?tag_prefix=billing&limit=1&fields=tag_name&cursor={first['next_cursor']}"
+        ).get_json()
+        self.assertEqual(first["items"] + second["items"], [{"tag_name": "billing-a"}, {"tag_name": "billing-b"}])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_reports_since_counts_verified_checks(self) -> None:
+        report_service.record_verified("billing-b", "2024-01-01 07:00:00")
+
+        payload = self.client.get(
+            "/api/reports?since=2024-01-01T06:00:00&fields=tag_name,last_run_time,last_verified_time"
+        ).get_json()
+
+        self.assertEqual(
+            payload["items"],
+            [
+                {
+                    "tag_name": "billing-b",
+                    "last_run_time": "2024-01-01 05:00:00",
+                    "last_verified_time": "2024-01-01 07:00:00",
+                }
+            ],
+        )
+
+    def test_fatal_events_are_bounded_per_page(self) -> None:
+        for index in range(3):
+            report_service.add_fatal_event("inventory", f"event {index}")
+
+        payload = self.client.get("/api/fatal-events?tag_prefix=inventory&limit=2&fields=description").get_json()
+
+        self.assertEqual(payload["items"], [{"description": "event 2"}, {"description": "event 1"}])
+        self.assertIsNotNone(payload["next_cursor"])
+
+    def test_runs_export_streams_csv_and_ndjson(self) -> None:
+        csv_response = self.client.get("/export/runs?tag_prefix=billing&since=2024-01-01 04:00:00")
+        lines = csv_response.get_data(as_text=True).splitlines()
+        self.assertEqual(csv_response.mimetype, "text/csv")
+        self.assertEqual(lines[0], "id,tag_name,run_time,status,reasons,uc4_status,check_type")
+        self.assertEqual([line.split(",")[1] for line in lines[1:]], ["billing-a", "billing-b"])
+
+        ndjson_response = self.client.get("/export/runs?format=ndjson&tag_prefix=inventory")
+        records = [json.loads(line) for line in ndjson_response.get_data(as_text=True).splitlines()]
+        self.assertEqual([record["reasons"] for record in records], [["boom"]])
+
+    def test_export_rejects_unknown_format(self) -> None:
+        self.assertEqual(self.client.get("/export/runs?format=xml").status_code, 400)
+        self.assertEqual(self.client.get("/export/recipients").status_code, 404)
+
+    def test_invalid_parameters_are_rejected(self) -> None:
+        for url in ("/api/runs?limit=0", "/api/runs?fields=password", "/api/fatal-events?since=yesterday"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+
+
+if __name__ == "__main__":
+    unittest.main()
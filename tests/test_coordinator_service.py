@@ -0,0 +1,121 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool import db
+from monitoring_tool.services import coordinator_service, monitoring_service
+
+
+TAGS = [f"job-{index:03d}" for index in range(200)]
+
+
+class HashRingTests(unittest.TestCase):
+    def test_assignment_is_stable_and_moves_few_keys(self) -> None:
+        ring = coordinator_service.HashRing(["a", "b", "c"])
+        self.assertEqual(
+            [ring.owner(tag) for tag in TAGS],
+            [coordinator_service.HashRing(["c", "b", "a"]).owner(tag) for tag in TAGS],
+        )
+
+        grown = coordinator_service.HashRing(["a", "b", "c", "d"])
+        moved = [tag for tag in TAGS if ring.owner(tag) != grown.owner(tag)]
+        self.assertTrue(all(grown.owner(tag) == "d" for tag in moved))
+        self.assertLess(len(moved), len(TAGS) / 2)
+
+    def test_empty_ring_has_no_owner(self) -> None:
+        self.assertIsNone(coordinator_service.HashRing([]).owner("job"))
+
+
+class CoordinatorTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.now = datetime(2024, 1, 1, 9, 0, 0)
+
+    def worker(self, worker_id: str) -> coordinator_service.Coordinator:
+        return coordinator_service.Coordinator(worker_id, lease_seconds=30)
+
+    def test_workers_split_processes_without_overlap(self) -> None:
+        a, b = self.worker("a"), self.worker("b")
+        a.renew(TAGS, self.now)
+        b.renew(TAGS, self.now)
+        owned_a = a.renew(TAGS, self.now + timedelta(seconds=1))
+        owned_b = b.renew(TAGS, self.now + timedelta(seconds=1))
+
+        self.assertFalse(owned_a & owned_b)
+        self.assertEqual(owned_a | owned_b, set(TAGS))
+        self.assertTrue(owned_a and owned_b)
+
+    def test_joining_worker_waits_for_handover(self) -> None:
+        a = self.worker("a")
+        self.assertEqual(a.renew(TAGS, self.now), set(TAGS))
+
+        # b sees itself on the ring but a still holds the leases.
+        b = self.worker("b")
+        self.assertEqual(b.renew(TAGS, self.now), set())
+
+        owned_a = a.renew(TAGS, self.now + timedelta(seconds=5))
+        owned_b = b.renew(TAGS, self.now + timedelta(seconds=6))
+        self.assertTrue(owned_b)
+        self.assertFalse(owned_a & owned_b)
+        self.assertEqual(owned_a | owned_b, set(TAGS))
+
+    def test_lost_worker_processes_move_after_expiry(self) -> None:
+        a, b = self.worker("a"), self.worker("b")
+        a.renew(TAGS, self.now)
+        b.renew(TAGS, self.now)
+        a.renew(TAGS, self.now)
+
+        # a stops renewing; b takes over only once a's leases have run out.
+        self.assertNotEqual(b.renew(TAGS, self.now + timedelta(seconds=20)), set(TAGS))
+        self.assertEqual(b.renew(TAGS, self.now + timedelta(seconds=31)), set(TAGS))
+        self.assertEqual(a.owned(self.now + timedelta(seconds=31)), set())
+
+    def test_release_hands_processes_to_remaining_workers(self) -> None:
+        a, b = self.worker("a"), self.worker("b")
+        a.renew(TAGS, self.now)
+        b.renew(TAGS, self.now)
+        a.renew(TAGS, self.now)
+        a.release()
+
+        self.assertEqual(b.renew(TAGS, self.now + timedelta(seconds=1)), set(TAGS))
+        self.assertEqual(
+            [worker["worker_id"] for worker in coordinator_service.list_workers(self.now + timedelta(seconds=1))],
+            ["b"],
+        )
+
+    def test_lease_times_are_utc(self) -> None:
+        self.worker("a").renew(TAGS)
+
+        worker = coordinator_service.list_workers()[0]
+        renewed_at = datetime.fromisoformat(worker["renewed_at"]).replace(tzinfo=timezone.utc)
+        self.assertLess(abs((datetime.now(timezone.utc) - renewed_at).total_seconds()), 5)
+
+    def test_removed_processes_are_released(self) -> None:
+        a = self.worker("a")
+        a.renew(TAGS, self.now)
+        version = a.version
+
+        self.assertEqual(a.renew(TAGS[:10], self.now), set(TAGS[:10]))
+        self.assertGreater(a.version, version)
+        rows = db.query_all("SELECT COUNT(*) AS total FROM process_leases")
+        self.assertEqual(rows[0]["total"], 10)
+
+
+class CoordinatedSchedulerTests(unittest.TestCase):
+    def test_taken_over_process_keeps_its_interval(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        scheduler = monitoring_service.CheckScheduler(600, jitter_seconds=0)
+        scheduler.sync(
+            [{"tag_name": "recent"}, {"tag_name": "stale"}, {"tag_name": "new"}],
+            now,
+            {"recent": now - timedelta(seconds=100), "stale": now - timedelta(hours=2)},
+        )
+
+        self.assertEqual(
+            sorted(process["tag_name"] for process in scheduler.pop_due(now)), ["new", "stale"]
+        )
+        self.assertEqual(scheduler.seconds_until_next(now), 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from datetime import datetime
+
+from monitoring_tool import cron
+
+
+class CronTests(unittest.TestCase):
+    def test_next_after_steps_and_ranges(self) -> None:
+        schedule = cron.parse("*/15 6-20 * * 1-5")
+
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 1, 9, 7)), datetime(2024, 1, 1, 9, 15))
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 1, 20, 45)), datetime(2024, 1, 2, 6, 0))
+        # Friday evening rolls over to Monday morning.
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 5, 21, 0)), datetime(2024, 1, 8, 6, 0))
+
+    def test_next_after_is_strictly_later(self) -> None:
+        schedule = cron.parse("30 8 * * *")
+
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 1, 8, 30)), datetime(2024, 1, 2, 8, 30))
+
+    def test_day_of_month_or_weekday(self) -> None:
+        schedule = cron.parse("0 0 1 * 0")
+
+        # 2024-01-07 is a Sunday, before the first of February.
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 2)), datetime(2024, 1, 7))
+        self.assertEqual(cron.parse("0 0 * * 7").weekdays, frozenset({0}))
+
+    def test_month_rollover(self) -> None:
+        schedule = cron.parse("0 12 31 * *")
+
+        self.assertEqual(schedule.next_after(datetime(2024, 4, 1)), datetime(2024, 5, 31, 12, 0))
+
+    def test_rejects_invalid_expressions(self) -> None:
+        for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *", "a * * * *"):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    cron.parse(expression)
+
+
+if __name__ == "__main__":
+    unittest.main()
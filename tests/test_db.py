@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+import unittest
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool import db, migrations
+
+
+class ConnectionPoolTests(TempDatabaseTestCase):
+    def test_connections_are_reused(self) -> None:
+        for _ in range(5):
+            db.query_all("SELECT tag_name FROM processes")
+        db.execute("INSERT INTO notification_recipients (email) VALUES (?)", ["ops@example.com"])
+
+        stats = db.pool_stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertGreaterEqual(stats["reused"], 6)
+
+    def test_connections_use_wal_and_busy_timeout(self) -> None:
+        with db.pooled_connection() as connection:
+            journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+            busy_timeout = connection.execute("PRAGMA busy_timeout").fetchone()[0]
+
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(busy_timeout, db.config.DB_BUSY_TIMEOUT_MS)
+
+    def test_nested_use_on_one_thread_shares_connection(self) -> None:
+        with db.pooled_connection() as outer:
+            with db.pooled_connection() as inner:
+                self.assertIs(outer, inner)
+            self.assertEqual(db.pool_stats()["in_use"], 1)
+
+    def test_reads_proceed_while_write_transaction_is_open(self) -> None:
+        db.execute("INSERT INTO notification_recipients (email) VALUES (?)", ["a@example.com"])
+        results = []
+
+        with db.pooled_connection() as writer:
+            writer.execute("INSERT INTO notification_recipients (email) VALUES (?)", ["b@example.com"])
+            reader = threading.Thread(
+                target=lambda: results.append(db.query_all("SELECT email FROM notification_recipients"))
+            )
+            reader.start()
+            reader.join(2)
+            writer.commit()
+
+        self.assertEqual([row["email"] for row in results[0]], ["a@example.com"])
+
+    def test_iter_query_releases_connection_when_closed(self) -> None:
+        db.execute_many(
+            "INSERT INTO notification_recipients (email) VALUES (?)",
+            [(f"user{index}@example.com",) for index in range(10)],
+        )
+
+        rows = db.iter_query("SELECT email FROM notification_recipients ORDER BY email", chunk_size=3)
+        self.assertEqual(next(rows)["email"], "user0@example.com")
+        self.assertEqual(db.pool_stats()["in_use"], 1)
+        rows.close()
+
+        self.assertEqual(db.pool_stats()["in_use"], 0)
+
+    def test_pool_wait_times_out_when_exhausted(self) -> None:
+        with patch("monitoring_tool.db.config.DB_BUSY_TIMEOUT_MS", 50):
+            pool = db.ConnectionPool(self.db_path, max_size=1)
+            self.addCleanup(pool.close)
+            errors = []
+
+            def acquire_elsewhere() -> None:
+                try:
+                    with pool.connection():
+                        pass
+                except Exception as exc:  # noqa: BLE001
+                    errors.append(exc)
+
+            with pool.connection():
+                worker = threading.Thread(target=acquire_elsewhere)
+                worker.start()
+                worker.join(2)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Connection pool exhausted", str(errors[0]))
+
+
+class MigrationTests(TempDatabaseTestCase):
+    create_schema = False
+
+    def test_legacy_database_is_upgraded_to_latest_version(self) -> None:
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "CREATE TABLE processes (id INTEGER PRIMARY KEY AUTOINCREMENT, tag_name TEXT NOT NULL UNIQUE, "
+                "folder_path TEXT NOT NULL, check_uc4_file INTEGER NOT NULL DEFAULT 0, "
+                "created_at TEXT NOT NULL DEFAULT (datetime('now')))"
+            )
+            connection.execute("INSERT INTO processes (tag_name, folder_path) VALUES ('job-a', '/tmp')")
+
+        db.ensure_schema()
+
+        self.assertEqual(db.schema_version(), migrations.LATEST_VERSION)
+        rows = db.query_all("SELECT tag_name, scheduled_time, check_query FROM processes")
+        self.assertEqual(dict(rows[0]), {"tag_name": "job-a", "scheduled_time": None, "check_query": None})
+        indexes = {row["name"] for row in db.query_all("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue(
+            {"idx_process_runs_tag_id", "idx_process_runs_tag_run_time", "idx_fatal_events_tag_time"} <= indexes
+        )
+
+    def test_process_status_is_backfilled_from_history(self) -> None:
+        with sqlite3.connect(self.db_path) as connection:
+            migrations.migrate(connection)
+            connection.execute("DELETE FROM schema_migrations WHERE version >= 4")
+            connection.execute("DROP TABLE process_status")
+            connection.executemany(
+                "INSERT INTO process_runs (tag_name, run_time, status, reasons, uc4_status, check_type) "
+                "VALUES (?, ?, ?, '[]', 'OK', 'filesystem')",
+                [("job-a", "2024-01-01 09:00:00", "Failed"), ("job-a", "2024-01-01 09:10:00", "Success")],
+            )
+            connection.commit()
+
+        db.ensure_schema()
+
+        rows = db.query_all("SELECT tag_name, run_time, status FROM process_status")
+        self.assertEqual([tuple(row) for row in rows], [("job-a", "2024-01-01 09:10:00", "Success")])
+
+    def test_migrations_are_applied_once(self) -> None:
+        db.ensure_schema()
+        db.ensure_schema()
+
+        versions = [row["version"] for row in db.query_all("SELECT version FROM schema_migrations ORDER BY version")]
+        self.assertEqual(versions, [migration.version for migration in migrations.MIGRATIONS])
+
+    def test_latest_run_lookup_uses_index(self) -> None:
+        db.ensure_schema()
+
+        plan = db.query_all(
+            "EXPLAIN QUERY PLAN SELECT id FROM process_runs WHERE tag_name = ? "
+            "ORDER BY run_time DESC, id DESC LIMIT 1",
+            ["job-a"],
+        )
+        self.assertIn("idx_process_runs_tag_run_time", plan[0]["detail"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import socketserver
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool.services import email_service
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    # Just enough of SMTP for smtplib: records each message and can be told
+    # to answer a command with an error.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.messages: list[str] = []
+        self.connections = 0
+        self.replies: dict[str, list[str]] = {}
+        self.drop_after_message = False
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: SmtpSink = self.server
+        server.connections += 1
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().split(" ", 1)[0].upper()
+            queued = server.replies.get(command)
+            if queued:
+                self.reply(queued.pop(0))
+                continue
+            if command == "DATA":
+                self.reply("354 end with .")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(data.decode())
+                server.messages.append("".join(lines))
+                self.reply("250 queued")
+                if server.drop_after_message:
+                    server.drop_after_message = False
+                    return
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+    def reply(self, text: str) -> None:
+        self.wfile.write(f"{text}\r\n".encode())
+        self.wfile.flush()
+
+
+class EmailQueueTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.sink = SmtpSink()
+        threading.Thread(target=self.sink.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.sink.server_close)
+        self.addCleanup(self.sink.shutdown)
+        self.connection = email_service.SmtpConnection("127.0.0.1", self.sink.port, timeout=5)
+        self.addCleanup(self.connection.close)
+        self.now = datetime(2024, 1, 1, 9, 0, 0)
+
+    def statuses(self) -> list[tuple[str, int]]:
+        return [(delivery["status"], delivery["attempts"]) for delivery in reversed(email_service.list_deliveries())]
+
+    def test_batch_is_sent_over_one_connection(self) -> None:
+        for index in range(3):
+            email_service.queue_email([f"ops{index}@example.com"], f"Report {index}", "body", now=self.now)
+
+        processed = email_service.deliver_pending(self.connection, now=self.now)
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(len(self.sink.messages), 3)
+        self.assertIn("Subject: Report 0", self.sink.messages[0])
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(self.statuses(), [("sent", 1)] * 3)
+        self.assertEqual(email_service.deliver_pending(self.connection, now=self.now), 0)
+
+    def test_temporary_failure_is_retried_with_backoff(self) -> None:
+        self.sink.replies["MAIL"] = ["451 try again later"]
+        email_service.queue_email(["ops@example.com"], "Report", "body", now=self.now)
+
+        with patch("monitoring_tool.services.email_service.config.EMAIL_RETRY_BASE_SECONDS", 30):
+            email_service.deliver_pending(self.connection, now=self.now)
+            self.assertEqual(self.statuses(), [("queued", 1)])
+            self.assertEqual(email_service.deliver_pending(self.connection, now=self.now + timedelta(seconds=29)), 0)
+            email_service.deliver_pending(self.connection, now=self.now + timedelta(seconds=30))
+
+        self.assertEqual(self.statuses(), [("sent", 2)])
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_permanent_failure_is_not_retried(self) -> None:
+        self.sink.replies["RCPT"] = ["550 no such user"]
+        email_service.queue_email(["nobody@example.com"], "Report", "body", now=self.now)
+
+        email_service.deliver_pending(self.connection, now=self.now)
+
+        delivery = email_service.list_deliveries()[0]
+        self.assertEqual(delivery["status"], "failed")
+        self.assertIn("no such user", delivery["last_error"])
+
+    def test_gives_up_after_max_attempts(self) -> None:
+        self.sink.replies["MAIL"] = ["451 busy"] * 2
+        email_service.queue_email(["ops@example.com"], "Report", "body", now=self.now)
+
+        with patch("monitoring_tool.services.email_service.config.EMAIL_MAX_ATTEMPTS", 2):
+            email_service.deliver_pending(self.connection, now=self.now)
+            email_service.deliver_pending(self.connection, now=self.now + timedelta(hours=1))
+
+        self.assertEqual(self.statuses(), [("failed", 2)])
+
+    def test_reconnects_when_relay_drops_connection(self) -> None:
+        self.sink.drop_after_message = True
+        email_service.queue_email(["ops@example.com"], "First", "body", now=self.now)
+        email_service.deliver_pending(self.connection, now=self.now)
+        email_service.queue_email(["ops@example.com"], "Second", "body", now=self.now)
+        email_service.deliver_pending(self.connection, now=self.now)
+
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.connections, 2)
+        self.assertEqual(self.statuses(), [("sent", 1), ("sent", 1)])
+
+    def test_unreachable_relay_backs_off_whole_batch(self) -> None:
+        unreachable = email_service.SmtpConnection("127.0.0.1", 1, timeout=1)
+        for index in range(2):
+            email_service.queue_email(["ops@example.com"], f"Report {index}", "body", now=self.now)
+
+        with patch("monitoring_tool.services.email_service.config.EMAIL_RETRY_BASE_SECONDS", 30):
+            email_service.deliver_pending(unreachable, now=self.now)
+
+        # Only the message that was tried counts an attempt; both wait together.
+        self.assertEqual(self.statuses(), [("queued", 1), ("queued", 0)])
+        self.assertEqual(email_service.deliver_pending(unreachable, now=self.now + timedelta(seconds=29)), 0)
+
+    def test_refused_recipient_fails_only_its_message(self) -> None:
+        self.sink.replies["RCPT"] = ["250 ok", "550 no such user"]
+        for index in range(3):
+            email_service.queue_email([f"ops{index}@example.com"], f"Report {index}", "body", now=self.now)
+
+        email_service.deliver_pending(self.connection, now=self.now)
+
+        self.assertEqual(self.statuses(), [("sent", 1), ("failed", 1), ("sent", 1)])
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_unfinished_claim_is_picked_up_again(self) -> None:
+        email_service.queue_email(["ops@example.com"], "Report", "body", now=self.now)
+        email_service._claim_due(self.now, 10)
+
+        self.assertEqual(email_service.deliver_pending(self.connection, now=self.now), 0)
+        later = self.now + timedelta(seconds=email_service.CLAIM_SECONDS)
+        self.assertEqual(email_service.deliver_pending(self.connection, now=later), 1)
+        self.assertEqual(self.statuses(), [("sent", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from monitoring_tool.services import filesystem_service
+
+
+class FilesystemServiceTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.folder = Path(self._tmpdir.name)
+        filesystem_service.invalidate()
+        self.addCleanup(filesystem_service.invalidate)
+
+    def test_scan_folder_reports_marker_states(self) -> None:
+        (self.folder / "success.flag").write_text("ok", encoding="utf-8")
+        (self.folder / "data.csv").touch()
+
+        snapshot = filesystem_service.scan_folder(str(self.folder))
+
+        self.assertTrue(snapshot.exists)
+        self.assertEqual(set(snapshot.markers), {"success.flag"})
+        self.assertEqual(snapshot.markers["success.flag"].size, 2)
+
+    def test_scan_folder_skips_marker_gone_before_stat(self) -> None:
+        (self.folder / "failure.flag").touch()
+        (self.folder / "success.flag").symlink_to(self.folder / "deleted.flag")
+
+        snapshot = filesystem_service.scan_folder(str(self.folder))
+
+        self.assertTrue(snapshot.exists)
+        self.assertEqual(set(snapshot.markers), {"failure.flag"})
+
+    def test_scan_folder_missing(self) -> None:
+        snapshot = filesystem_service.scan_folder(str(self.folder / "missing"))
+        self.assertFalse(snapshot.exists)
+
+    def test_evaluate_folder_results(self) -> None:
+        missing = str(self.folder / "missing")
+        self.assertEqual(
+            filesystem_service.evaluate_folder(missing),
+            filesystem_service.FileCheckResult(True, f"Folder missing: {missing}"),
+        )
+        self.assertEqual(
+            filesystem_service.evaluate_folder(str(self.folder)),
+            filesystem_service.FileCheckResult(True, "Missing success marker: success.flag"),
+        )
+
+        (self.folder / "success.flag").touch()
+        filesystem_service.invalidate()
+        result = filesystem_service.evaluate_folder(str(self.folder))
+        self.assertFalse(result.is_failed)
+        self.assertEqual(result.marker_mtime, (self.folder / "success.flag").stat().st_mtime)
+        self.assertEqual(
+            filesystem_service.evaluate_uc4_file(str(self.folder)),
+            filesystem_service.FileCheckResult(True, "Missing UC4 file: uc4.flag"),
+        )
+
+        (self.folder / "failure.flag").touch()
+        filesystem_service.invalidate()
+        result = filesystem_service.evaluate_folder(str(self.folder))
+        self.assertEqual((result.is_failed, result.reason), (True, "Failure marker found: failure.flag"))
+
+    def test_folder_and_uc4_checks_share_one_scan(self) -> None:
+        (self.folder / "success.flag").touch()
+        (self.folder / "uc4.flag").touch()
+
+        with patch("monitoring_tool.services.filesystem_service.os.scandir", wraps=os.scandir) as scandir:
+            filesystem_service.evaluate_folder(str(self.folder))
+            filesystem_service.evaluate_uc4_file(str(self.folder))
+            filesystem_service.evaluate_folder(str(self.folder))
+
+        self.assertEqual(scandir.call_count, 1)
+
+    def test_expired_snapshot_is_rescanned(self) -> None:
+        with patch("monitoring_tool.services.filesystem_service.os.scandir", wraps=os.scandir) as scandir:
+            filesystem_service.get_snapshot(str(self.folder), max_age=0)
+            filesystem_service.get_snapshot(str(self.folder), max_age=0)
+
+        self.assertEqual(scandir.call_count, 2)
+
+    def test_stale_success_marker_fails_max_age(self) -> None:
+        marker = self.folder / "success.flag"
+        marker.touch()
+        modified = datetime.fromtimestamp(marker.stat().st_mtime)
+
+        fresh = filesystem_service.evaluate_folder(
+            str(self.folder), max_age_hours=24, now=modified + timedelta(hours=23)
+        )
+        stale = filesystem_service.evaluate_folder(
+            str(self.folder), max_age_hours=24, now=modified + timedelta(hours=25)
+        )
+
+        self.assertFalse(fresh.is_failed)
+        self.assertTrue(stale.is_failed)
+        self.assertTrue(stale.reason.startswith("Stale success marker: success.flag last modified"))
+
+    def test_success_marker_must_follow_scheduled_time(self) -> None:
+        marker = self.folder / "success.flag"
+        marker.touch()
+        modified = datetime.fromtimestamp(marker.stat().st_mtime)
+
+        result = filesystem_service.evaluate_folder(str(self.folder), fresh_after=modified + timedelta(minutes=1))
+
+        self.assertTrue(result.is_failed)
+        self.assertIn("predates scheduled run", result.reason)
+
+    def test_marker_content_is_parsed_and_cached(self) -> None:
+        (self.folder / "success.flag").write_text("exit_code=0\nrows: 1250\n", encoding="utf-8")
+
+        with patch("builtins.open", wraps=open) as opened:
+            first = filesystem_service.evaluate_folder(str(self.folder), parse_content=True)
+            filesystem_service.invalidate()
+            second = filesystem_service.evaluate_folder(str(self.folder), parse_content=True)
+
+        self.assertEqual(opened.call_count, 1)
+        self.assertFalse(first.is_failed)
+        self.assertEqual((first.exit_code, first.row_count), (0, 1250))
+        self.assertEqual(second, first)
+
+    def test_marker_content_with_nonzero_exit_code_fails(self) -> None:
+        (self.folder / "success.flag").write_text("exit_code=3\n", encoding="utf-8")
+        (self.folder / "other").mkdir()
+        (self.folder / "other" / "failure.flag").write_text("rc=9\n", encoding="utf-8")
+
+        success = filesystem_service.evaluate_folder(str(self.folder), parse_content=True)
+        failure = filesystem_service.evaluate_folder(str(self.folder / "other"), parse_content=True)
+
+        self.assertEqual(success.reason, "Success marker reports exit code 3")
+        self.assertEqual(failure.reason, "Failure marker found: failure.flag (exit code 9)")
+
+
+if __name__ == "__main__":
+    unittest.main()
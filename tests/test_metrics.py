@@ -0,0 +1,68 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from monitoring_tool import metrics
+from monitoring_tool.services import filesystem_service, monitoring_service
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        registry = patch("monitoring_tool.metrics.REGISTRY", [])
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def test_histogram_renders_cumulative_buckets(self) -> None:
+        histogram = metrics.Histogram("test_seconds", "Test latency.", ("kind",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, kind="a")
+
+        self.assertEqual(
+            metrics.render().splitlines(),
+            [
+                "# HELP test_seconds Test latency.",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{kind="a",le="0.1"} 2',
+                'test_seconds_bucket{kind="a",le="1"} 3',
+                'test_seconds_bucket{kind="a",le="+Inf"} 4',
+                'test_seconds_sum{kind="a"} 3.65',
+                'test_seconds_count{kind="a"} 4',
+            ],
+        )
+
+    def test_labels_are_escaped_and_checked(self) -> None:
+        gauge = metrics.Gauge("test_gauge", "Test gauge.", ("name",))
+        gauge.set(2, name='a "quoted"\\path')
+
+        self.assertIn('test_gauge{name="a \\"quoted\\"\\\\path"} 2', metrics.render())
+        with self.assertRaises(ValueError):
+            gauge.set(1, other="x")
+
+    def test_gauge_replace_drops_missing_labels(self) -> None:
+        gauge = metrics.Gauge("test_status", "Test status.", ("status",))
+        gauge.replace({("Failed",): 3, ("Success",): 5})
+        gauge.replace({("Success",): 8})
+
+        self.assertNotIn("Failed", metrics.render())
+        self.assertEqual(gauge.value(status="Success"), 8)
+
+    def test_cycle_and_checks_are_timed(self) -> None:
+        cycles = metrics.CYCLE_SECONDS.count(source="cycle")
+        checks = metrics.CHECK_SECONDS.count(check_type="filesystem")
+        processes = [{"tag_name": f"job-{index}", "folder_path": "/tmp"} for index in range(3)]
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=processes,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ), patch("monitoring_tool.services.monitoring_service.report_service.record_run"):
+            monitoring_service.run_monitoring_cycle(now=datetime(2024, 1, 1, 9, 0, 0))
+
+        self.assertEqual(metrics.CYCLE_SECONDS.count(source="cycle"), cycles + 1)
+        self.assertEqual(metrics.CHECK_SECONDS.count(check_type="filesystem"), checks + 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,27 @@
+import os
+import threading
+import time
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
-from monitoring_tool.services import filesystem_service, monitoring_service, query_service
+from helpers import TempDatabaseTestCase
+from monitoring_tool import db
+from monitoring_tool.services import (
+    filesystem_service,
+    monitoring_service,
+    process_service,
+    query_service,
+    report_service,
+)
 
 
 class MonitoringServiceTests(unittest.TestCase):
+    def setUp(self) -> None:
+        monitoring_service._last_query_runs.clear()
+        monitoring_service._in_flight.clear()
+        query_service.clear_cache()
+
     def test_scheduled_check_skips_before_time(self) -> None:
         process = {
             "tag_name": "job-b",
@@ -218,8 +234,444 @@ class MonitoringServiceTests(unittest.TestCase):
         self.assertEqual(args["status"], "Success")
         self.assertEqual(args["uc4_status"], "Not enabled")
 
+    def test_concurrent_cycle_records_every_process(self) -> None:
+        processes = [
+            {"tag_name": f"job-{index}", "folder_path": "/tmp", "check_uc4_file": False}
+            for index in range(10)
+        ]
+        now = datetime(2024, 1, 1, 9, 0, 0)
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=processes,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ), patch(
+            "monitoring_tool.services.monitoring_service.report_service.record_run"
+        ) as record_run:
+            monitoring_service.run_monitoring_cycle(now=now, max_workers=4)
+
+        recorded = sorted(call.kwargs["tag_name"] for call in record_run.call_args_list)
+        self.assertEqual(recorded, sorted(process["tag_name"] for process in processes))
+
+    def test_concurrent_cycle_times_out_slow_check(self) -> None:
+        processes = [
+            {"tag_name": "job-slow", "folder_path": "/slow", "check_uc4_file": False},
+            {"tag_name": "job-fast", "folder_path": "/tmp", "check_uc4_file": False},
+        ]
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        release = threading.Event()
+
+        def evaluate_folder(folder_path: str, **rules) -> filesystem_service.FileCheckResult:
+            if folder_path == "/slow":
+                release.wait(5)
+            return filesystem_service.FileCheckResult(False, None)
+
+        try:
+            with patch(
+                "monitoring_tool.services.monitoring_service.process_service.list_processes",
+                return_value=processes,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+                side_effect=evaluate_folder,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.report_service.record_run"
+            ) as record_run:
+                monitoring_service.run_monitoring_cycle(now=now, max_workers=2, check_timeout=0.2)
+        finally:
+            release.set()
+
+        runs = {call.kwargs["tag_name"]: call.kwargs for call in record_run.call_args_list}
+        self.assertEqual(runs["job-fast"]["status"], "Success")
+        self.assertEqual(runs["job-slow"]["status"], "Failed")
+        self.assertIn("Check timed out after 0.2 seconds", runs["job-slow"]["reasons"])
+
+    def test_single_check_is_timed_out(self) -> None:
+        process = {"tag_name": "job-slow", "folder_path": "/slow", "check_uc4_file": False}
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        release = threading.Event()
+
+        def evaluate_folder(folder_path: str, **rules) -> filesystem_service.FileCheckResult:
+            release.wait(5)
+            return filesystem_service.FileCheckResult(False, None)
+
+        started = time.monotonic()
+        try:
+            with patch(
+                "monitoring_tool.services.monitoring_service.process_service.list_processes",
+                return_value=[process],
+            ), patch(
+                "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+                side_effect=evaluate_folder,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.report_service.record_run"
+            ) as record_run:
+                monitoring_service.run_monitoring_cycle(now=now, max_workers=2, check_timeout=0.2)
+        finally:
+            release.set()
+
+        self.assertLess(time.monotonic() - started, 2)
+        record_run.assert_called_once()
+        self.assertEqual(record_run.call_args.kwargs["status"], "Failed")
+
+    def test_hung_checks_do_not_starve_queued_check(self) -> None:
+        processes = [
+            {"tag_name": "job-hung-1", "folder_path": "/hung", "check_uc4_file": False},
+            {"tag_name": "job-hung-2", "folder_path": "/hung", "check_uc4_file": False},
+            {"tag_name": "job-queued", "folder_path": "/tmp", "check_uc4_file": False},
+        ]
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        release = threading.Event()
+
+        def evaluate_folder(folder_path: str, **rules) -> filesystem_service.FileCheckResult:
+            if folder_path == "/hung":
+                release.wait(5)
+            return filesystem_service.FileCheckResult(False, None)
+
+        started = time.monotonic()
+        try:
+            with patch(
+                "monitoring_tool.services.monitoring_service.process_service.list_processes",
+                return_value=processes,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+                side_effect=evaluate_folder,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.report_service.record_run"
+            ) as record_run:
+                monitoring_service.run_monitoring_cycle(now=now, max_workers=2, check_timeout=0.2)
+        finally:
+            release.set()
+
+        self.assertLess(time.monotonic() - started, 2)
+        runs = {call.kwargs["tag_name"]: call.kwargs for call in record_run.call_args_list}
+        self.assertEqual(set(runs), {"job-hung-1", "job-hung-2", "job-queued"})
+        self.assertIn("Check timed out after 0.2 seconds", runs["job-queued"]["reasons"])
+
+    def test_hung_check_is_not_resubmitted(self) -> None:
+        process = {"tag_name": "job-hung", "folder_path": "/hung", "check_uc4_file": False}
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        release = threading.Event()
+        calls = []
+
+        def evaluate_folder(folder_path: str, **rules) -> filesystem_service.FileCheckResult:
+            calls.append(folder_path)
+            release.wait(5)
+            return filesystem_service.FileCheckResult(False, None)
+
+        try:
+            with patch(
+                "monitoring_tool.services.monitoring_service.process_service.list_processes",
+                return_value=[process],
+            ), patch(
+                "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+                side_effect=evaluate_folder,
+            ), patch(
+                "monitoring_tool.services.monitoring_service.report_service.record_run"
+            ) as record_run:
+                monitoring_service.run_monitoring_cycle(now=now, max_workers=2, check_timeout=0.2)
+                monitoring_service.run_monitoring_cycle(now=now, max_workers=2, check_timeout=0.2)
+        finally:
+            release.set()
+
+        self.assertEqual(calls, ["/hung"])
+        self.assertEqual(record_run.call_count, 2)
+        self.assertIn("Check still running from an earlier cycle", record_run.call_args.kwargs["reasons"])
+
+    def test_sequential_check_error_is_recorded_as_failure(self) -> None:
+        processes = [
+            {"tag_name": "job-broken", "folder_path": "/broken", "check_uc4_file": False},
+            {"tag_name": "job-ok", "folder_path": "/tmp", "check_uc4_file": False},
+        ]
+        now = datetime(2024, 1, 1, 9, 0, 0)
+
+        def evaluate_folder(folder_path: str, **rules) -> filesystem_service.FileCheckResult:
+            if folder_path == "/broken":
+                raise OSError("disk gone")
+            return filesystem_service.FileCheckResult(False, None)
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=processes,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            side_effect=evaluate_folder,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.report_service.record_run"
+        ) as record_run:
+            monitoring_service.run_monitoring_cycle(now=now, max_workers=1)
+
+        runs = {call.kwargs["tag_name"]: call.kwargs for call in record_run.call_args_list}
+        self.assertEqual(runs["job-ok"]["status"], "Success")
+        self.assertEqual(runs["job-broken"]["status"], "Failed")
+        self.assertIn("Check failed: disk gone", runs["job-broken"]["reasons"])
+
+    def test_check_process_records_single_run(self) -> None:
+        process = {
+            "tag_name": "job-watch",
+            "folder_path": "/tmp",
+            "check_uc4_file": False,
+            "scheduled_time": "23:59",
+            "check_query": "select 1",
+        }
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(True, "Failure marker found: failure.flag"),
+        ), patch(
+            "monitoring_tool.services.monitoring_service.query_service.evaluate_query"
+        ) as evaluate_query, patch(
+            "monitoring_tool.services.monitoring_service.report_service.record_run"
+        ) as record_run:
+            monitoring_service.check_process(process, now=datetime(2024, 1, 1, 9, 0, 0))
+
+        evaluate_query.assert_not_called()
+        args = record_run.call_args.kwargs
+        self.assertEqual(args["tag_name"], "job-watch")
+        self.assertEqual(args["reasons"], ["Failure marker found: failure.flag"])
+
+    def test_marker_rules_are_passed_to_folder_check(self) -> None:
+        process = {
+            "tag_name": "job-fresh",
+            "folder_path": "/tmp",
+            "check_uc4_file": False,
+            "scheduled_time": "10:30",
+            "marker_max_age_hours": 12,
+            "marker_fresh_since_schedule": 1,
+            "parse_marker_content": 1,
+        }
+        now = datetime(2024, 1, 2, 9, 0, 0)
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ) as evaluate_folder, patch("monitoring_tool.services.monitoring_service.report_service.record_run"):
+            monitoring_service.check_process(process, now=now)
+
+        evaluate_folder.assert_called_once_with(
+            "/tmp",
+            max_age_hours=12.0,
+            fresh_after=datetime(2024, 1, 1, 10, 30, 0),
+            parse_content=True,
+            now=now,
+        )
+
+
+class CheckSchedulerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        monitoring_service._last_query_runs.clear()
+
+    def test_pops_due_processes_and_reschedules_by_interval(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        scheduler = monitoring_service.CheckScheduler(600, jitter_seconds=0)
+        fast = {"tag_name": "fast", "check_interval_seconds": 60}
+        slow = {"tag_name": "slow", "check_interval_seconds": None}
+        scheduler.sync([fast, slow], now)
+
+        self.assertEqual(
+            sorted(process["tag_name"] for process in scheduler.pop_due(now)), ["fast", "slow"]
+        )
+        scheduler.reschedule(fast, now)
+        scheduler.reschedule(slow, now)
+
+        self.assertEqual(scheduler.seconds_until_next(now), 60)
+        self.assertEqual(scheduler.pop_due(now + timedelta(seconds=59)), [])
+        self.assertEqual(
+            [process["tag_name"] for process in scheduler.pop_due(now + timedelta(seconds=600))],
+            ["fast", "slow"],
+        )
+
+    def test_cron_schedule_overrides_interval(self) -> None:
+        now = datetime(2024, 1, 1, 9, 7, 30)
+        scheduler = monitoring_service.CheckScheduler(600, jitter_seconds=0)
+        process = {"tag_name": "cron", "check_interval_seconds": 60, "cron_schedule": "*/15 * * * *"}
+
+        self.assertEqual(scheduler.next_run_time(process, now), datetime(2024, 1, 1, 9, 15))
+
+    def test_interval_is_clamped_to_minimum(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        scheduler = monitoring_service.CheckScheduler(600, jitter_seconds=0)
+        process = {"tag_name": "tight", "check_interval_seconds": 1}
+
+        with patch("monitoring_tool.services.monitoring_service.config.SCHEDULER_MIN_INTERVAL_SECONDS", 10):
+            self.assertEqual(scheduler.next_run_time(process, now), now + timedelta(seconds=10))
+
+    def test_sync_drops_removed_and_reschedules_changed_processes(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        scheduler = monitoring_service.CheckScheduler(600, jitter_seconds=0)
+        scheduler.sync([{"tag_name": "a"}, {"tag_name": "b"}], now)
+        scheduler.pop_due(now)
+        scheduler.reschedule({"tag_name": "a"}, now)
+        scheduler.reschedule({"tag_name": "b"}, now)
+
+        scheduler.sync([{"tag_name": "a", "check_interval_seconds": 30}], now)
+
+        self.assertEqual(len(scheduler), 1)
+        due = scheduler.pop_due(now + timedelta(seconds=30))
+        self.assertEqual([process["tag_name"] for process in due], ["a"])
+        self.assertIsNone(scheduler.seconds_until_next(now))
+
+    def test_query_gate_uses_in_memory_last_run(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        with patch(
+            "monitoring_tool.services.monitoring_service.report_service.get_latest_run",
+            return_value=None,
+        ) as get_latest_run:
+            self.assertTrue(monitoring_service._should_run_scheduled_check("job", "08:00", now))
+            monitoring_service._last_query_runs["job"] = now
+            self.assertFalse(
+                monitoring_service._should_run_scheduled_check("job", "08:00", now + timedelta(minutes=5))
+            )
+            self.assertTrue(
+                monitoring_service._should_run_scheduled_check("job", "08:00", now + timedelta(days=1))
+            )
+
+        get_latest_run.assert_called_once_with("job")
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection") -> None:
+        self.connection = connection
+
+    def execute(self, query: str) -> None:
+        if self.connection.broken:
+            raise RuntimeError("connection reset")
+        if query != "SELECT 1":
+            self.connection.queries += 1
+            time.sleep(self.connection.delay)
+        if "missing_table" in query:
+            raise RuntimeError("invalid object name")
+        self.rows = [(1,)]
+
+    def fetchmany(self, size: int) -> list:
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self) -> list:
+        return [(1,)]
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.broken = False
+        self.closed = False
+        self.queries = 0
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class SqlServerPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        query_service.clear_cache()
+        self.addCleanup(query_service.clear_cache)
+        self.connections: list[FakeConnection] = []
+        self.delay = 0.0
+
+    def connect(self) -> FakeConnection:
+        connection = FakeConnection(self.delay)
+        self.connections.append(connection)
+        return connection
+
+    def test_reuses_connections_across_queries(self) -> None:
+        pool = query_service.SqlServerPool(self.connect, max_size=2, health_check_seconds=60)
+        with patch("monitoring_tool.services.query_service.get_pool", return_value=pool), patch(
+            "monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", "Driver=fake"
+        ):
+            for _ in range(3):
+                self.assertFalse(query_service.evaluate_query("select 1 from jobs").is_failed)
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(pool.stats()["reused"], 2)
+
+    def test_query_error_keeps_healthy_connection(self) -> None:
+        pool = query_service.SqlServerPool(self.connect, max_size=1, health_check_seconds=60)
+        with patch("monitoring_tool.services.query_service.get_pool", return_value=pool), patch(
+            "monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", "Driver=fake"
+        ):
+            result = query_service.evaluate_query("select * from missing_table")
+            query_service.evaluate_query("select 1 from jobs")
+
+        self.assertEqual(result.reason, "Query failed: invalid object name")
+        self.assertEqual(len(self.connections), 1)
+
+    def test_broken_connection_is_replaced(self) -> None:
+        pool = query_service.SqlServerPool(self.connect, max_size=1, health_check_seconds=60)
+        with pool.connection() as connection:
+            pass
+        connection.broken = True
+
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as reused:
+                reused.cursor().execute("select 1 from jobs")
+
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+    def test_idle_connection_is_health_checked(self) -> None:
+        pool = query_service.SqlServerPool(self.connect, max_size=1, health_check_seconds=0)
+        with pool.connection() as connection:
+            pass
+        connection.broken = True
+
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, connection)
+        self.assertEqual(len(self.connections), 2)
+
+    def test_exhausted_pool_times_out(self) -> None:
+        pool = query_service.SqlServerPool(self.connect, max_size=1, acquire_timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(query_service.QueryPoolExhausted):
+                with pool.connection():
+                    pass
+
+    def test_cycle_runs_query_checks_concurrently(self) -> None:
+        self.delay = 0.1
+        pool = query_service.SqlServerPool(self.connect, max_size=20, health_check_seconds=60)
+        processes = [
+            {"tag_name": f"job-{index}", "check_query": f"select {index} from jobs", "folder_path": "/tmp"}
+            for index in range(40)
+        ]
+
+        with patch("monitoring_tool.services.query_service.get_pool", return_value=pool), patch(
+            "monitoring_tool.services.monitoring_service.config.SQLSERVER_CONNECTION_STRING", "Driver=fake"
+        ), patch("monitoring_tool.services.monitoring_service.config.SQLSERVER_POOL_SIZE", 20), patch(
+            "monitoring_tool.services.monitoring_service.config.CHECK_MAX_WORKERS", 2
+        ), patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=processes,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ), patch(
+            "monitoring_tool.services.monitoring_service.report_service.record_run"
+        ) as record_run:
+            started = time.monotonic()
+            monitoring_service.run_monitoring_cycle(now=datetime(2024, 1, 1, 9, 0, 0))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(record_run.call_count, 40)
+        self.assertTrue(all(call.kwargs["status"] == "Success" for call in record_run.call_args_list))
+        # Sequentially this takes four seconds; twenty at a time takes about 0.2.
+        self.assertLess(elapsed, 1.5)
+        self.assertLessEqual(len(self.connections), 20)
+
 
 class QueryServiceTests(unittest.TestCase):
+    def setUp(self) -> None:
+        query_service.clear_cache()
+        self.addCleanup(query_service.clear_cache)
+
     def test_query_requires_select(self) -> None:
         result = query_service.evaluate_query("update table set value=1")
         self.assertTrue(result.is_failed)
@@ -232,7 +684,7 @@ class QueryServiceTests(unittest.TestCase):
 
     def test_query_error_propagates(self) -> None:
         with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch(
-            "monitoring_tool.services.query_service.db.query_all",
+            "monitoring_tool.services.query_service.db.iter_query",
             side_effect=RuntimeError("boom"),
         ):
             result = query_service.evaluate_query("select 1")
@@ -241,30 +693,228 @@ class QueryServiceTests(unittest.TestCase):
         self.assertEqual(result.reason, "Query failed: boom")
 
     def test_query_no_rows_fails(self) -> None:
-        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch("monitoring_tool.services.query_service.db.query_all", return_value=[]):
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch("monitoring_tool.services.query_service.db.iter_query", return_value=[]):
             result = query_service.evaluate_query("select 1")
 
         self.assertTrue(result.is_failed)
         self.assertEqual(result.reason, "Query returned no rows")
 
     def test_query_with_rows_succeeds(self) -> None:
-        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch("monitoring_tool.services.query_service.db.query_all", return_value=[{"id": 1}]):
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch("monitoring_tool.services.query_service.db.iter_query", return_value=[{"id": 1}]):
             result = query_service.evaluate_query("select 1")
 
         self.assertFalse(result.is_failed)
         self.assertIsNone(result.reason)
 
+    def test_identical_queries_run_once_per_cycle(self) -> None:
+        processes = [
+            {"tag_name": "load-a", "check_query": "select * from loads", "folder_path": "/tmp"},
+            {"tag_name": "load-b", "check_query": "  select *\n  from loads ", "folder_path": "/tmp"},
+            {"tag_name": "other", "check_query": "select * from other", "folder_path": "/tmp"},
+        ]
+
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch(
+            "monitoring_tool.services.query_service.db.iter_query", return_value=[{"id": 1}]
+        ) as query_all, patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=processes,
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ), patch("monitoring_tool.services.monitoring_service.report_service.record_run"):
+            monitoring_service.run_monitoring_cycle(now=datetime(2024, 1, 1, 9, 0, 0))
+            monitoring_service.run_monitoring_cycle(now=datetime(2024, 1, 1, 9, 10, 0))
+
+        # Whitespace differences still share a result; the second cycle runs again.
+        self.assertEqual(query_all.call_count, 4)
+        self.assertEqual(query_service.cache_stats()["hits"], 2)
+        self.assertEqual(query_service.cache_stats()["misses"], 4)
+
+    def test_whitespace_inside_literals_is_not_ignored(self) -> None:
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch(
+            "monitoring_tool.services.query_service.db.iter_query", return_value=[{"id": 1}]
+        ) as query_all, patch("monitoring_tool.services.query_service.config.QUERY_CACHE_TTL_SECONDS", 60):
+            query_service.evaluate_query("select * from loads where name = 'a  b'")
+            query_service.evaluate_query("select *\n  from loads where name = 'a b'")
+            query_service.evaluate_query("select *  from loads\nwhere name = 'a b'")
+
+        self.assertEqual(query_all.call_count, 2)
+        self.assertEqual(query_service.cache_stats()["hits"], 1)
+
+    def test_results_reused_within_ttl(self) -> None:
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch(
+            "monitoring_tool.services.query_service.db.iter_query", return_value=[]
+        ) as query_all, patch("monitoring_tool.services.query_service.config.QUERY_CACHE_TTL_SECONDS", 60):
+            first = query_service.evaluate_query("select 1")
+            second = query_service.evaluate_query("select 1")
+
+        self.assertEqual(first, second)
+        query_all.assert_called_once()
+        self.assertEqual(query_service.cache_stats()["hits"], 1)
+
+    def test_results_not_reused_outside_cycle_without_ttl(self) -> None:
+        with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", ""), patch(
+            "monitoring_tool.services.query_service.db.iter_query", return_value=[{"id": 1}]
+        ) as query_all:
+            with query_service.cycle():
+                query_service.evaluate_query("select 1")
+            query_service.evaluate_query("select 1")
+
+        self.assertEqual(query_all.call_count, 2)
+
+    def test_parse_assertion(self) -> None:
+        self.assertEqual(query_service.parse_assertion(None), query_service.DEFAULT_ASSERTION)
+        self.assertEqual(query_service.parse_assertion(" No  Rows "), query_service.NO_ROWS)
+        self.assertEqual(
+            query_service.parse_assertion("value>=2.5"), query_service.QueryAssertion("value", ">=", 2.5)
+        )
+        for text in ("rows >= 1.5", "rows > -1", "count > 3", "value ~ 1"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    query_service.parse_assertion(text)
+
+    def test_row_count_assertion_stops_reading_once_decided(self) -> None:
+        fetched = []
+
+        def rows(query, chunk_size):
+            for index in range(10_000):
+                fetched.append(index)
+                yield {"id": index}
+
+        with patch("monitoring_tool.services.query_service._run_query", side_effect=rows):
+            failed = query_service.evaluate_query("select * from big_table", "rows <= 3")
+            passed = query_service.evaluate_query("select * from big_table", "rows >= 100")
+
+        self.assertEqual(failed.reason, "Query returned at least 4 rows, expected rows <= 3")
+        self.assertFalse(passed.is_failed)
+        self.assertEqual(len(fetched), 104)
+
+    def test_assertion_results(self) -> None:
+        cases = [
+            ("no rows", [], None),
+            ("no rows", [{"id": 1}], "Query returned rows, expected none"),
+            ("rows == 3", [{"id": 1}, {"id": 2}], "Query returned 2 rows, expected rows == 3"),
+            ("rows > 0", [], "Query returned 0 rows, expected rows > 0"),
+            ("value >= 10", [{"total": 12}], None),
+            ("value >= 10", [(4,)], "Query value 4 failed assertion value >= 10"),
+            ("value = 1", [{"status": "ok"}], "Query value 'ok' is not a number"),
+            ("value < 1", [], "Query returned no rows"),
+            ("rows >> 1", [{"id": 1}], "Invalid query assertion: Query assertion must look like "
+             "'rows >= 10', 'value < 5' or 'no rows'"),
+        ]
+        for assertion, rows, reason in cases:
+            with self.subTest(assertion=assertion, rows=rows):
+                query_service.clear_cache()
+                with patch("monitoring_tool.services.query_service._run_query", return_value=rows):
+                    result = query_service.evaluate_query("select 1", assertion)
+                self.assertEqual(result.reason, reason)
+                self.assertEqual(result.is_failed, reason is not None)
+
+    def test_assertion_reason_recorded_with_run(self) -> None:
+        process = {
+            "tag_name": "job-assert",
+            "check_query": "select count(*) from loads",
+            "check_assertion": "value >= 5",
+            "folder_path": "/tmp",
+        }
+
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=[process],
+        ), patch(
+            "monitoring_tool.services.monitoring_service.filesystem_service.evaluate_folder",
+            return_value=filesystem_service.FileCheckResult(False, None),
+        ), patch(
+            "monitoring_tool.services.query_service._run_query", return_value=[(2,)]
+        ), patch(
+            "monitoring_tool.services.monitoring_service.report_service.record_run"
+        ) as record_run:
+            monitoring_service.run_monitoring_cycle(now=datetime(2024, 1, 1, 9, 0, 0))
+
+        args = record_run.call_args.kwargs
+        self.assertEqual(args["status"], "Failed")
+        self.assertEqual(args["reasons"], ["Query value 2 failed assertion value >= 5"])
+
     def test_query_uses_sqlserver_when_configured(self) -> None:
         with patch("monitoring_tool.services.query_service.config.SQLSERVER_CONNECTION_STRING", "Driver=mock"), patch(
             "monitoring_tool.services.query_service._query_sqlserver",
             return_value=[{"id": 1}],
-        ) as query_sqlserver, patch("monitoring_tool.services.query_service.db.query_all") as sqlite_query:
+        ) as query_sqlserver, patch("monitoring_tool.services.query_service.db.iter_query") as sqlite_query:
             result = query_service.evaluate_query("select 1")
 
         self.assertFalse(result.is_failed)
-        query_sqlserver.assert_called_once_with("select 1")
+        query_sqlserver.assert_called_once_with("select 1", 1)
         sqlite_query.assert_not_called()
 
 
+class IncrementalRunTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patches = [
+            patch("monitoring_tool.services.monitoring_service.config.INCREMENTAL_RUNS", True),
+            patch.object(monitoring_service, "_outcomes_run_id", None),
+        ]
+        for active_patch in patches:
+            active_patch.start()
+            self.addCleanup(active_patch.stop)
+        monitoring_service._last_outcomes.clear()
+        self.addCleanup(monitoring_service._last_outcomes.clear)
+
+        self.folder = self.tmp_path / "job-a"
+        self.folder.mkdir()
+        self.marker = self.folder / "success.flag"
+        self.marker.write_text("ok")
+        process_service.add_tag("job-a")
+        process_service.set_folder("job-a", str(self.folder), False, None, None)
+        self.now = datetime(2024, 1, 1, 9, 0, 0)
+
+    def cycle(self, minutes: int) -> None:
+        monitoring_service.run_monitoring_cycle(now=self.now + timedelta(minutes=minutes), max_workers=1)
+
+    def run_count(self) -> int:
+        return db.query_all("SELECT COUNT(*) AS total FROM process_runs")[0]["total"]
+
+    def test_unchanged_outcomes_only_move_verified_time(self) -> None:
+        for minute in range(3):
+            self.cycle(minute)
+
+        self.assertEqual(self.run_count(), 1)
+        row = db.query_all("SELECT run_time, verified_at FROM process_status WHERE tag_name = 'job-a'")[0]
+        self.assertEqual(row["run_time"], "2024-01-01 09:00:00")
+        self.assertEqual(row["verified_at"], "2024-01-01 09:02:00")
+        self.assertEqual(report_service.latest_run_times()["job-a"], datetime(2024, 1, 1, 9, 2))
+
+    def test_transitions_and_marker_updates_are_written(self) -> None:
+        self.cycle(0)
+        self.marker.unlink()
+        self.cycle(1)
+        self.cycle(2)
+        self.marker.write_text("ok")
+        self.cycle(3)
+        mtime = self.marker.stat().st_mtime + 60
+        os.utime(self.marker, (mtime, mtime))
+        self.cycle(4)
+
+        statuses = [row["status"] for row in db.query_all("SELECT status FROM process_runs ORDER BY id")]
+        self.assertEqual(statuses, ["Success", "Failed", "Success", "Success"])
+
+    def test_runs_written_elsewhere_invalidate_remembered_outcome(self) -> None:
+        self.cycle(0)
+        report_service.record_run("job-a", "Failed", ["Checked by hand"], "Not enabled", "filesystem")
+        self.cycle(1)
+
+        self.assertEqual(self.run_count(), 3)
+        self.assertEqual(report_service.get_latest_run("job-a")["status"], "Success")
+
+    def test_outcome_of_failed_write_is_not_remembered(self) -> None:
+        with patch("monitoring_tool.services.report_service._UPSERT_STATUS", "SELECT * FROM missing_table WHERE ?"):
+            with self.assertRaises(Exception):
+                self.cycle(0)
+        self.cycle(1)
+
+        self.assertEqual(self.run_count(), 1)
+        self.assertEqual(report_service.get_latest_run("job-a")["run_time"], "2024-01-01 09:01:00")
+
+
 if __name__ == "__main__":
     unittest.main()
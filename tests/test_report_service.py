@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool import db
+from monitoring_tool.services import report_service
+
+
+class ReportServiceTests(TempDatabaseTestCase):
+    def test_record_run_writes_immediately_outside_batch(self) -> None:
+        report_service.record_run("job-a", "Success", [], "Not enabled", "filesystem")
+
+        run = report_service.get_latest_run("job-a")
+        self.assertEqual(run["status"], "Success")
+        self.assertIsNotNone(run["run_time"])
+
+    def test_batch_runs_writes_once_on_exit(self) -> None:
+        with patch("monitoring_tool.services.report_service._write_runs", wraps=report_service._write_runs) as write_runs:
+            with report_service.batch_runs():
+                report_service.record_run("job-a", "Success", [], "Not enabled", "filesystem", "2024-01-01 09:00:00")
+                report_service.record_run("job-b", "Failed", ["boom"], "OK", "filesystem", "2024-01-01 09:00:00")
+                self.assertIsNone(report_service.get_latest_run("job-a"))
+
+        write_runs.assert_called_once()
+        self.assertEqual(report_service.get_latest_run("job-b")["reasons"], ["boom"])
+
+    def test_batch_runs_flushes_at_batch_size(self) -> None:
+        with patch("monitoring_tool.services.report_service.config.RUN_BATCH_SIZE", 2):
+            with report_service.batch_runs():
+                for tag_name in ("job-a", "job-b", "job-c"):
+                    report_service.record_run(tag_name, "Success", [], "Not enabled", "filesystem")
+                self.assertIsNotNone(report_service.get_latest_run("job-b"))
+                self.assertIsNone(report_service.get_latest_run("job-c"))
+
+        self.assertIsNotNone(report_service.get_latest_run("job-c"))
+
+    def test_process_reports_use_constant_query_count(self) -> None:
+        def count_queries(process_count: int) -> int:
+            processes = [{"tag_name": f"job-{index}", "folder_path": "/tmp"} for index in range(process_count)]
+            with patch("monitoring_tool.services.report_service.db.query_all", wraps=db.query_all) as query_all:
+                report_service.list_process_reports(processes)
+            return query_all.call_count
+
+        self.assertEqual(count_queries(1), count_queries(25))
+
+    def test_process_reports_bound_recent_fatal_events(self) -> None:
+        db.execute_many(
+            "INSERT INTO fatal_events (tag_name, event_time, description) VALUES (?, ?, ?)",
+            [("job-a", f"2024-01-01 09:0{minute}:00", f"event {minute}") for minute in range(7)],
+        )
+
+        with patch("monitoring_tool.services.report_service.config.REPORT_FATAL_EVENTS_PER_TAG", 3):
+            reports = report_service.list_process_reports(
+                [{"tag_name": "job-a", "folder_path": "/tmp"}, {"tag_name": "job-b", "folder_path": "/tmp"}]
+            )
+
+        job_a, job_b = reports
+        self.assertEqual(job_a["status"], "Failed")
+        self.assertEqual(job_a["fatal_event_count"], 7)
+        self.assertEqual([event["description"] for event in job_a["fatal_events"]], ["event 6", "event 5", "event 4"])
+        self.assertEqual(job_b["fatal_event_count"], 0)
+        self.assertEqual(job_b["status"], "Pending")
+
+    def test_record_run_maintains_process_status(self) -> None:
+        with report_service.batch_runs():
+            report_service.record_run("job-a", "Failed", ["first"], "OK", "filesystem", "2024-01-01 09:00:00")
+            report_service.record_run("job-a", "Success", [], "OK", "filesystem", "2024-01-01 09:10:00")
+        report_service.record_run("job-b", "Failed", ["second"], "OK", "filesystem", "2024-01-01 09:10:00")
+
+        status_rows = db.query_all("SELECT tag_name, status FROM process_status ORDER BY tag_name")
+        self.assertEqual([tuple(row) for row in status_rows], [("job-a", "Success"), ("job-b", "Failed")])
+        history_count = db.query_all("SELECT COUNT(*) AS total FROM process_runs")[0]["total"]
+        self.assertEqual(history_count, 3)
+
+        reports = report_service.list_process_reports([{"tag_name": "job-a", "folder_path": "/tmp"}])
+        self.assertEqual(reports[0]["status"], "Success")
+        self.assertEqual(reports[0]["last_run_time"], "2024-01-01 09:10:00")
+
+    def test_failed_write_leaves_status_and_history_untouched(self) -> None:
+        with patch("monitoring_tool.services.report_service._UPSERT_STATUS", "SELECT * FROM missing_table WHERE ?"):
+            with self.assertRaises(Exception):
+                report_service.record_run("job-a", "Success", [], "OK", "filesystem")
+
+        self.assertEqual(db.query_all("SELECT COUNT(*) AS total FROM process_runs")[0]["total"], 0)
+        self.assertIsNone(report_service.get_latest_run("job-a"))
+
+    def test_status_upsert_reads_only_new_runs_without_statistics(self) -> None:
+        self.assertEqual(db.query_all("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"), [])
+
+        plan = [row["detail"] for row in db.query_all(f"EXPLAIN QUERY PLAN {report_service._UPSERT_STATUS}", [0])]
+        self.assertIn("SEARCH process_runs USING INTEGER PRIMARY KEY (rowid>?)", plan)
+        self.assertFalse([detail for detail in plan if detail.startswith("SCAN process_runs")])
+
+    def explain_page(self, list_page, **filters) -> list[str]:
+        with patch("monitoring_tool.services.report_service.db.query_all", wraps=db.query_all) as query_all:
+            list_page(**filters)
+        query, params = query_all.call_args.args
+        return [row["detail"] for row in db.query_all(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    def test_history_pages_use_indexes(self) -> None:
+        self.assertEqual(
+            self.explain_page(report_service.list_runs, status="Failed"),
+            ["SEARCH process_runs USING INDEX idx_process_runs_status_id (status=?)"],
+        )
+        self.assertIn(
+            "SEARCH fatal_events USING INDEX idx_fatal_events_time_id (event_time>?)",
+            self.explain_page(report_service.list_fatal_event_page, since="2024-01-01 00:00:00"),
+        )
+        pages = ((report_service.list_runs, "process_runs"), (report_service.list_fatal_event_page, "fatal_events"))
+        for list_page, table in pages:
+            plan = self.explain_page(list_page, tag_prefix="job", before_id=10)
+            self.assertIn(f"SEARCH {table} USING COVERING INDEX idx_{table}_tag_id (tag_name=? AND id<?)", plan)
+            self.assertFalse([detail for detail in plan if detail.startswith(f"SCAN {table}")])
+
+    def test_tag_prefix_pages_merge_tags_newest_first(self) -> None:
+        with report_service.batch_runs():
+            for minute in range(6):
+                tag_name = ("job-a", "job-b", "other")[minute % 3]
+                report_service.record_run(tag_name, "Failed", [], "OK", "filesystem", f"2024-01-01 09:0{minute}:00")
+        report_service.record_run("job-b", "Success", [], "OK", "filesystem", "2024-01-01 09:06:00")
+
+        first = report_service.list_runs(tag_prefix="job", status="Failed", limit=3)
+        second = report_service.list_runs(tag_prefix="job", status="Failed", before_id=first[-1]["id"], limit=3)
+
+        self.assertEqual(
+            [(run["tag_name"], run["run_time"][-5:]) for run in first + second],
+            [("job-b", "04:00"), ("job-a", "03:00"), ("job-b", "01:00"), ("job-a", "00:00")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
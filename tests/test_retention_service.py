@@ -0,0 +1,77 @@
+import gzip
+import json
+import unittest
+from datetime import datetime
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool import db
+from monitoring_tool.services import report_service, retention_service
+
+
+class RetentionServiceTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        runs = [
+            ("job-a", "Success", [], "2024-01-01 08:00:00"),
+            ("job-a", "Failed", ["Missing success marker: success.flag"], "2024-01-01 09:00:00"),
+            ("job-a", "Failed", ["Failure marker found: failure.flag"], "2024-01-01 10:00:00"),
+            ("job-a", "Failed", ["Missing success marker: success.flag"], "2024-01-02 09:00:00"),
+            ("job-a", "Success", [], "2024-01-10 09:00:00"),
+        ]
+        with report_service.batch_runs():
+            for tag_name, status, reasons, run_time in runs:
+                report_service.record_run(tag_name, status, reasons, "OK", "filesystem", run_time)
+
+    def test_old_runs_are_rolled_up_and_pruned(self) -> None:
+        result = retention_service.prune_history(
+            now=datetime(2024, 1, 10, 12, 0, 0), retention_days=7, archive_dir="", batch_size=2
+        )
+
+        self.assertEqual(result.cutoff, "2024-01-03")
+        self.assertEqual(result.pruned_runs, 4)
+        self.assertEqual(result.rolled_up_days, 2)
+        remaining = db.query_all("SELECT run_time FROM process_runs")
+        self.assertEqual([row["run_time"] for row in remaining], ["2024-01-10 09:00:00"])
+
+        summaries = retention_service.list_daily_summaries("job-a")
+        self.assertEqual([summary["day"] for summary in summaries], ["2024-01-02", "2024-01-01"])
+        first_day = summaries[1]
+        self.assertEqual(first_day["success_count"], 1)
+        self.assertEqual(first_day["failed_count"], 2)
+        self.assertEqual(first_day["first_failure_time"], "2024-01-01 09:00:00")
+        self.assertEqual(
+            first_day["reasons"],
+            ["Missing success marker: success.flag", "Failure marker found: failure.flag"],
+        )
+        self.assertEqual(report_service.get_latest_run("job-a")["run_time"], "2024-01-10 09:00:00")
+
+    def test_pruned_runs_are_archived(self) -> None:
+        archive_dir = self.tmp_path / "archive"
+
+        result = retention_service.prune_history(
+            now=datetime(2024, 1, 10, 12, 0, 0), retention_days=7, archive_dir=archive_dir
+        )
+
+        with gzip.open(result.archive_path, "rt", encoding="utf-8") as archive:
+            archived = [json.loads(line) for line in archive]
+        self.assertEqual(len(archived), 4)
+        self.assertEqual(archived[0]["run_time"], "2024-01-01 08:00:00")
+
+    def test_nothing_to_prune_leaves_no_archive(self) -> None:
+        archive_dir = self.tmp_path / "archive"
+
+        result = retention_service.prune_history(
+            now=datetime(2024, 1, 1, 12, 0, 0), retention_days=7, archive_dir=archive_dir
+        )
+
+        self.assertEqual(result.pruned_runs, 0)
+        self.assertIsNone(result.archive_path)
+        self.assertEqual(list(archive_dir.iterdir()), [])
+
+    def test_new_database_reclaims_pages_incrementally(self) -> None:
+        self.assertEqual(db.query_all("PRAGMA auto_vacuum")[0][0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
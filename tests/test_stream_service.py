@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+import unittest
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool.services import process_service, report_service, stream_service
+
+
+def parse_events(chunks: list[str]) -> list[dict]:
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":"))
+        if fields.get("event") == "run":
+            events.append({"id": int(fields["id"]), **json.loads(fields["data"])})
+    return events
+
+
+class ReportStreamTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for tag_name in ("job-a", "job-b"):
+            process_service.add_tag(tag_name)
+            process_service.set_folder(tag_name, "/tmp", False, None, None)
+
+    def record(self, tag_name: str, status: str, reasons: list[str] | None = None) -> None:
+        report_service.record_run(tag_name, status, reasons or [], "OK", "filesystem")
+
+    def test_report_changes_after_run_id(self) -> None:
+        self.record("job-a", "Success")
+        cursor = report_service.latest_run_id()
+        self.record("job-b", "Failed", ["boom"])
+        report_service.add_fatal_event("job-b", "Crashed")
+
+        changes = report_service.list_report_changes(cursor)
+
+        self.assertEqual([change["tag_name"] for change in changes], ["job-b"])
+        self.assertEqual(changes[0]["reasons"], ["boom", "Fatal event(s) recorded"])
+        self.assertEqual(changes[0]["status_class"], "status-failed")
+        self.assertEqual(changes[0]["run_id"], report_service.latest_run_id())
+
+    def test_stream_sends_changed_rows_once(self) -> None:
+        self.record("job-a", "Success")
+        cursor = report_service.latest_run_id()
+        self.record("job-a", "Failed", ["boom"])
+        self.record("job-b", "Success")
+
+        events = stream_service.report_events(cursor, poll_seconds=0.01, max_seconds=0.05)
+        sent = parse_events(list(events))
+        self.assertEqual([(event["tag_name"], event["status"]) for event in sent], [("job-a", "Failed"), ("job-b", "Success")])
+        self.assertEqual(set(sent[0]), {"id", *stream_service.STREAM_FIELDS})
+
+    def test_identical_runs_are_not_resent(self) -> None:
+        cursor = report_service.latest_run_id()
+        events = stream_service.report_events(cursor, poll_seconds=0.01, max_seconds=0.2)
+        self.assertTrue(next(events).startswith("retry:"))
+
+        self.record("job-a", "Failed", ["boom"])
+        first = next(events)
+        self.record("job-a", "Failed", ["boom"])
+        self.record("job-a", "Success")
+
+        sent = parse_events([first, *events])
+        self.assertEqual([event["status"] for event in sent], ["Failed", "Success"])
+
+    def test_stream_wakes_on_run_recorded_in_process(self) -> None:
+        events = stream_service.report_events(report_service.latest_run_id(), poll_seconds=30, max_seconds=30)
+        next(events)
+        timer = threading.Timer(0.1, self.record, args=("job-a", "Failed", ["boom"]))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        started = time.monotonic()
+        sent = parse_events([next(events)])
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(sent[0]["tag_name"], "job-a")
+        events.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
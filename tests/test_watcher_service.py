@@ -0,0 +1,149 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from monitoring_tool.services import watcher_service
+
+
+class FolderWatcherTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.folder = Path(self._tmpdir.name) / "job-a"
+        self.folder.mkdir()
+        self.processes = [{"tag_name": "job-a", "folder_path": str(self.folder)}]
+        debounce = patch("monitoring_tool.services.watcher_service.config.WATCH_DEBOUNCE_SECONDS", 0)
+        debounce.start()
+        self.addCleanup(debounce.stop)
+
+    def _watcher(self, mode: str) -> watcher_service.FolderWatcher:
+        watcher = watcher_service.FolderWatcher(mode, poll_seconds=0.05)
+        self.addCleanup(watcher.close)
+        watcher.sync(self.processes)
+        watcher.wait_for_changes(timeout=0)
+        return watcher
+
+    def test_polling_detects_marker_changes(self) -> None:
+        watcher = self._watcher("poll")
+        self.assertEqual(watcher.polled_folders, {str(self.folder)})
+
+        (self.folder / "failure.flag").touch()
+
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+        self.assertEqual(watcher.wait_for_changes(timeout=0.1), set())
+
+    @unittest.skipUnless(watcher_service.inotify_available(), "inotify is not available")
+    def test_inotify_reports_only_marker_files(self) -> None:
+        watcher = self._watcher("inotify")
+        self.assertEqual(watcher.watched_folders, {str(self.folder)})
+
+        (self.folder / "data.csv").touch()
+        self.assertEqual(watcher.wait_for_changes(timeout=0.2), set())
+
+        (self.folder / "success.flag").touch()
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+        self.assertEqual(watcher.processes_for(str(self.folder)), self.processes)
+
+    @unittest.skipUnless(watcher_service.inotify_available(), "inotify is not available")
+    def test_removed_folder_falls_back_to_polling(self) -> None:
+        watcher = self._watcher("inotify")
+
+        self.folder.rmdir()
+
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+        self.assertEqual(watcher.polled_folders, {str(self.folder)})
+
+        self.folder.mkdir()
+        (self.folder / "success.flag").touch()
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+
+    def test_missing_folder_is_polled_until_it_appears(self) -> None:
+        self.folder.rmdir()
+        watcher = self._watcher("auto")
+        self.assertEqual(watcher.polled_folders, {str(self.folder)})
+
+        self.folder.mkdir()
+
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+
+    def test_unreadable_folder_does_not_stop_polling(self) -> None:
+        self.folder.rmdir()
+        self.folder.symlink_to(self.folder)
+        watcher = self._watcher("poll")
+        self.assertEqual(watcher.polled_folders, {str(self.folder)})
+
+        self.folder.unlink()
+        self.folder.mkdir()
+
+        self.assertEqual(watcher.wait_for_changes(timeout=1), {str(self.folder)})
+
+
+class FakeCoordinator:
+    version = 1
+
+    def __init__(self, owned: set[str]) -> None:
+        self._owned = frozenset(owned)
+
+    def owned(self, now=None) -> frozenset[str]:
+        return self._owned
+
+
+class CoordinatedWatcherTests(unittest.TestCase):
+    def test_only_leased_processes_are_checked(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        processes = []
+        for tag_name in ("job-a", "job-b"):
+            folder = Path(tmpdir.name) / tag_name
+            folder.mkdir()
+            processes.append({"tag_name": tag_name, "folder_path": str(folder)})
+
+        checked = threading.Event()
+        with patch(
+            "monitoring_tool.services.watcher_service.process_service.list_processes", return_value=processes
+        ), patch("monitoring_tool.services.watcher_service.config.WATCH_POLL_SECONDS", 0.05), patch(
+            "monitoring_tool.services.watcher_service.monitoring_service.check_process",
+            side_effect=lambda process: checked.set(),
+        ) as check_process:
+            watcher_service.start_watcher("poll", FakeCoordinator({"job-a"}))
+            self.addCleanup(watcher_service.stop_watcher, 5)
+            # Give the watcher time to take its first snapshot.
+            time.sleep(0.2)
+            for process in processes:
+                (Path(process["folder_path"]) / "failure.flag").touch()
+            self.assertTrue(checked.wait(5))
+            time.sleep(0.2)
+            watcher_service.stop_watcher(5)
+
+        self.assertEqual([call.args[0]["tag_name"] for call in check_process.call_args_list], ["job-a"])
+
+
+class WatcherLoopTests(unittest.TestCase):
+    def test_failed_refresh_is_retried(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        folder = Path(tmpdir.name) / "job-a"
+        folder.mkdir()
+        processes = [{"tag_name": "job-a", "folder_path": str(folder)}]
+
+        checked = threading.Event()
+        with patch(
+            "monitoring_tool.services.watcher_service.process_service.list_processes",
+            side_effect=[OSError("database is locked"), processes, processes],
+        ), patch("monitoring_tool.services.watcher_service.config.WATCH_POLL_SECONDS", 0.05), patch(
+            "monitoring_tool.services.watcher_service.monitoring_service.check_process",
+            side_effect=lambda process: checked.set(),
+        ), self.assertLogs("monitoring_tool.services.watcher_service", level="ERROR"):
+            watcher_service.start_watcher("poll")
+            self.addCleanup(watcher_service.stop_watcher, 5)
+            time.sleep(0.3)
+            (folder / "failure.flag").touch()
+            self.assertTrue(checked.wait(5))
+            watcher_service.stop_watcher(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from helpers import TempDatabaseTestCase
+from monitoring_tool.services import monitoring_service, worker_service
+
+
+class WorkerServiceTests(TempDatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        heartbeat_patch = patch("monitoring_tool.services.worker_service.config.WORKER_HEARTBEAT_SECONDS", 10)
+        heartbeat_patch.start()
+        self.addCleanup(heartbeat_patch.stop)
+
+    def test_heartbeat_is_throttled_and_health_derived(self) -> None:
+        now = datetime(2024, 1, 1, 9, 0, 0)
+        heartbeat = worker_service.Heartbeat("w1", "worker")
+        heartbeat.beat(5, now)
+        heartbeat.cycle(now + timedelta(seconds=2), 1.5, 5)
+        heartbeat.beat(5, now + timedelta(seconds=5))
+
+        workers = worker_service.list_workers(now + timedelta(seconds=5))
+        self.assertEqual(len(workers), 1)
+        self.assertEqual(workers[0]["checks_run"], 0)
+        self.assertTrue(workers[0]["healthy"])
+
+        heartbeat.beat(5, now + timedelta(seconds=10))
+        worker = worker_service.list_workers(now + timedelta(seconds=10))[0]
+        self.assertEqual(worker["checks_run"], 5)
+        self.assertEqual(worker["last_cycle_seconds"], 1.5)
+
+        self.assertFalse(worker_service.list_workers(now + timedelta(seconds=41))[0]["healthy"])
+
+    def test_stopped_scheduler_records_final_heartbeat(self) -> None:
+        monitoring_service._stop_event.clear()
+        self.addCleanup(monitoring_service._stop_event.clear)
+        process = {"tag_name": "job-a", "folder_path": "/tmp"}
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=[process],
+        ), patch(
+            "monitoring_tool.services.monitoring_service.config.SCHEDULER_JITTER_SECONDS", 0
+        ), patch(
+            "monitoring_tool.services.monitoring_service.run_checks"
+        ) as run_checks:
+            checked = threading.Event()
+            run_checks.side_effect = lambda processes, now: checked.set()
+            thread = threading.Thread(target=monitoring_service.run_scheduler, args=(600, None, "worker"))
+            thread.start()
+            self.assertTrue(checked.wait(5))
+            monitoring_service.stop_scheduler()
+            thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        run_checks.assert_called_once()
+        workers = worker_service.list_workers()
+        self.assertEqual([(worker["role"], worker["status"]) for worker in workers], [("worker", "stopped")])
+        self.assertEqual(workers[0]["checks_run"], 1)
+        self.assertFalse(workers[0]["healthy"])
+
+    def test_scheduler_survives_failing_batch(self) -> None:
+        monitoring_service._stop_event.clear()
+        self.addCleanup(monitoring_service._stop_event.clear)
+        process = {"tag_name": "job-a", "folder_path": "/tmp"}
+        with patch(
+            "monitoring_tool.services.monitoring_service.process_service.list_processes",
+            return_value=[process],
+        ), patch(
+            "monitoring_tool.services.monitoring_service.config.SCHEDULER_JITTER_SECONDS", 0
+        ), patch(
+            "monitoring_tool.services.monitoring_service.run_checks"
+        ) as run_checks:
+            failed = threading.Event()
+
+            def fail(processes, now):
+                failed.set()
+                raise RuntimeError("database is locked")
+
+            run_checks.side_effect = fail
+            thread = threading.Thread(target=monitoring_service.run_scheduler, args=(600, None, "worker"))
+            with self.assertLogs("monitoring_tool.services.monitoring_service", "ERROR"):
+                thread.start()
+                self.assertTrue(failed.wait(5))
+                # The loop carries on to its heartbeat instead of dying.
+                monitoring_service.stop_scheduler()
+                thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        workers = worker_service.list_workers()
+        self.assertEqual([worker["status"] for worker in workers], ["stopped"])
+        self.assertEqual(workers[0]["checks_run"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()